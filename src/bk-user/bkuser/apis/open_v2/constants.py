@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+# 全量拉取（no_page）时，每批从数据库读取 & 编码输出的数据条数
+NO_PAGE_STREAMING_CHUNK_SIZE = 1000
+
+# 批量 IN 查询时，单条 SQL 中的 ID 数量上限，避免全量拉取时 SQL 过长（超过 MySQL max_allowed_packet 等限制）
+ID_LOOKUP_CHUNK_SIZE = 1000
+
+# 批量 MPTT 范围查询（tree_id, lft, rght）时，单条 SQL 中的部门数量上限，避免 OR 条件过多导致 SQL 表达式过深
+MPTT_RANGE_LOOKUP_CHUNK_SIZE = 100
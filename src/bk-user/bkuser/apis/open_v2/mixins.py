@@ -25,6 +25,7 @@ from bkuser.apis.open_v2.authentications import ESBAuthentication
 from bkuser.apis.open_v2.renderers import BkLegacyApiJSONRenderer
 from bkuser.apps.data_source.constants import DataSourceTypeEnum
 from bkuser.apps.data_source.models import DataSource
+from bkuser.apps.tenant.caches import get_or_set_tenant_metadata
 from bkuser.apps.tenant.constants import CollaborationStrategyStatus
 from bkuser.apps.tenant.models import CollaborationStrategy, Tenant, TenantUserIDGenerateConfig
 
@@ -36,19 +37,27 @@ class LegacyOpenApiCommonMixin:
 
 
 class DefaultTenantMixin:
-    """默认租户 Mixin"""
+    """
+    默认租户 Mixin
+
+    Note: 默认租户，协同策略等元数据变更频率很低，因此都会通过进程内缓存获取，避免每次请求都需要查询 DB
+    """
 
     @cached_property
     def default_tenant(self) -> Tenant:
-        return Tenant.objects.filter(is_default=True).first()
+        return get_or_set_tenant_metadata("v2:default_tenant", lambda: Tenant.objects.filter(is_default=True).first())
 
     def get_real_user_data_sources(self) -> QuerySet[DataSource]:
         """获取默认租户真实用户数据源（含自己的 + 协同过来的），兼容 V2 的 OpenAPI 专用"""
-        # 接受方确认过的数据源，就是认为是有数据的
-        collaboration_tenant_ids = (
-            CollaborationStrategy.objects.filter(target_tenant=self.default_tenant)
-            .exclude(target_status=CollaborationStrategyStatus.UNCONFIRMED)
-            .values_list("source_tenant_id", flat=True)
+        # 接受方确认过的数据源，就是认为是有数据的（删除中的策略，其数据正在被清理，不再对外提供）
+        collaboration_tenant_ids = get_or_set_tenant_metadata(
+            f"v2:collaboration_tenant_ids:{self.default_tenant.id}",
+            lambda: list(
+                CollaborationStrategy.objects.filter(target_tenant=self.default_tenant)
+                .exclude(target_status=CollaborationStrategyStatus.UNCONFIRMED)
+                .exclude(source_status=CollaborationStrategyStatus.DELETING)
+                .values_list("source_tenant_id", flat=True)
+            ),
         )
         return DataSource.objects.filter(
             Q(owner_tenant_id=self.default_tenant.id) | Q(owner_tenant_id__in=collaboration_tenant_ids)
@@ -60,6 +69,11 @@ class DefaultTenantMixin:
 
         :return: {(collaboration_tenant_id, source_field): target_field}
         """
+        return get_or_set_tenant_metadata(
+            f"v2:collaboration_field_mapping:{self.default_tenant.id}", self._get_collaboration_field_mapping
+        )
+
+    def _get_collaboration_field_mapping(self) -> Dict[Tuple[str, str], str]:
         strategies = CollaborationStrategy.objects.filter(target_tenant_id=self.default_tenant.id)
 
         return {
@@ -74,9 +88,16 @@ class DataSourceDomainMixin:
 
     @cached_property
     def data_source_to_domain_map(self) -> Dict[Tuple[int, str], str]:
-        return {
-            (cfg.data_source_id, cfg.target_tenant.id): cfg.domain for cfg in TenantUserIDGenerateConfig.objects.all()
-        }
+        # Note: 直接取外键 ID，避免逐条配置查询 target_tenant；配置变更频率很低，通过进程内缓存获取
+        return get_or_set_tenant_metadata(
+            "v2:data_source_to_domain_map",
+            lambda: {
+                (data_source_id, target_tenant_id): domain
+                for data_source_id, target_tenant_id, domain in TenantUserIDGenerateConfig.objects.values_list(
+                    "data_source_id", "target_tenant_id", "domain"
+                )
+            },
+        )
 
     def get_domain(self, data_source_id: int, target_tenant_id: str) -> str:
         return self.data_source_to_domain_map.get((data_source_id, target_tenant_id), "")
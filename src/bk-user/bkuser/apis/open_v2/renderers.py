@@ -14,8 +14,18 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+import logging
+from typing import Any, Iterable
+
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from bkuser.apis.open_v2.constants import NO_PAGE_STREAMING_CHUNK_SIZE
+from bkuser.utils.std_iter import chunked
+
+logger = logging.getLogger(__name__)
 
 
 class BkLegacyApiJSONRenderer(JSONRenderer):
@@ -33,3 +43,41 @@ class BkLegacyApiJSONRenderer(JSONRenderer):
 
         # For status codes other than (2xx, 4xx, 5xx), do not wrap data
         return super().render(data, accepted_media_type=None, renderer_context=None)
+
+
+def make_legacy_json_streaming_response(
+    items: Iterable[Any], chunk_size: int = NO_PAGE_STREAMING_CHUNK_SIZE
+) -> StreamingHttpResponse:
+    """
+    以流式响应的方式输出列表数据，响应内容与 BkLegacyApiJSONRenderer 渲染的成功响应逐字节一致
+
+    Q: 为什么全量拉取（no_page）需要流式响应？
+    A: 一次性构建全部数据再渲染，内存中会同时存在所有数据的 dict 列表以及完整的 JSON 内容，
+       全量拉取大规模组织架构时会导致 Web 进程内存暴涨；流式响应按批编码输出，内存占用只与单批数据量相关
+
+    Note: 响应头（状态码 200）在输出首批数据前就已经发送，若后续读取 / 构建数据时发生异常，无法再返回错误响应，
+          此时只能记录异常日志并中断输出，客户端将收到被截断（非法）的 JSON 内容，需要据此判断拉取失败并重试
+
+    :param items: 列表数据（支持生成器，会按批消费）
+    :param chunk_size: 每批编码输出的数据条数
+    """
+    renderer = BkLegacyApiJSONRenderer()
+    # 以空列表渲染出响应外层结构，再将 data 的 [] 拆分为首尾两部分，中间按批填充数据
+    envelope = renderer.render([], renderer_context={"response": Response()})
+    head, tail = envelope.rsplit(b"[]", 1)
+
+    def _stream():
+        yield head + b"["
+        try:
+            for idx, chunk in enumerate(chunked(items, chunk_size)):
+                # 复用 JSONRenderer 编码每批数据（去除首尾的 []），保证编码规则（如中文、分隔符等）一致
+                content = JSONRenderer().render(chunk)[1:-1]
+                yield content if idx == 0 else b"," + content
+        except Exception:
+            # 响应已经开始输出，异常不会再经过 DRF 的异常处理，因此需要在这里记录日志，并继续抛出以中断响应
+            logger.exception("failed to stream legacy json response, the response body is truncated")
+            raise
+
+        yield b"]" + tail
+
+    return StreamingHttpResponse(_stream(), content_type=renderer.media_type)
@@ -16,16 +16,23 @@
 # to the current version of the project delivered to anyone in the future.
 
 import operator
+from collections import defaultdict
 from functools import reduce
-from typing import Any, Dict, List
+from typing import Any, Collection, Dict, Iterator, List
 
 from django.db.models import Q, QuerySet
 from django.http import Http404
 from rest_framework import generics
 from rest_framework.response import Response
 
+from bkuser.apis.open_v2.constants import (
+    ID_LOOKUP_CHUNK_SIZE,
+    MPTT_RANGE_LOOKUP_CHUNK_SIZE,
+    NO_PAGE_STREAMING_CHUNK_SIZE,
+)
 from bkuser.apis.open_v2.mixins import DefaultTenantMixin, LegacyOpenApiCommonMixin
 from bkuser.apis.open_v2.pagination import LegacyOpenApiPagination
+from bkuser.apis.open_v2.renderers import make_legacy_json_streaming_response
 from bkuser.apis.open_v2.serializers.departments import (
     DepartmentListInputSLZ,
     DepartmentRetrieveInputSLZ,
@@ -33,13 +40,67 @@ from bkuser.apis.open_v2.serializers.departments import (
 )
 from bkuser.apps.data_source.constants import DataSourceTypeEnum
 from bkuser.apps.data_source.models import (
-    DataSourceDepartment,
     DataSourceDepartmentRelation,
     DataSourceDepartmentUserRelation,
 )
 from bkuser.apps.tenant.models import TenantDepartment, TenantUser
 from bkuser.common.error_codes import error_codes
-from bkuser.utils.tree import Tree
+from bkuser.utils.django import iter_queryset_in_batches
+from bkuser.utils.std_iter import chunked
+
+
+def _get_dept_ancestor_relations_map(
+    dept_relations: List[DataSourceDepartmentRelation],
+) -> Dict[int, List[DataSourceDepartmentRelation]]:
+    """
+    基于 MPTT 的 tree_id / lft / rght 字段，批量查询多个部门的祖先
+
+    :return: {数据源部门 ID: 祖先部门关系列表（含自身，从根部门开始排序）}
+    """
+    # {数据源部门 ID: 部门关系}，包含所有部门的祖先（含自身）
+    relation_map: Dict[int, DataSourceDepartmentRelation] = {}
+    for relations in chunked(dept_relations, MPTT_RANGE_LOOKUP_CHUNK_SIZE):
+        # 祖先节点满足：同一棵树，且 lft <= 节点 lft，rght >= 节点 rght
+        relation_map.update(
+            (rel.department_id, rel)
+            for rel in DataSourceDepartmentRelation.objects.filter(
+                reduce(
+                    operator.or_,
+                    [Q(tree_id=rel.tree_id, lft__lte=rel.lft, rght__gte=rel.rght) for rel in relations],
+                )
+            ).select_related("department")
+        )
+
+    # 查询结果中仅包含祖先，因此沿着 parent 向上即可得到祖先链，无需逐个比较 lft / rght
+    ancestor_relations_map = {}
+    for rel in dept_relations:
+        ancestors: List[DataSourceDepartmentRelation] = []
+        dept_id = rel.department_id
+        while dept_id in relation_map:
+            ancestors.append(relation_map[dept_id])
+            dept_id = relation_map[dept_id].parent_id
+
+        ancestors.reverse()
+        ancestor_relations_map[rel.department_id] = ancestors
+
+    return ancestor_relations_map
+
+
+def _get_tenant_dept_id_map(data_source_dept_ids: Collection[int], tenant_id: str) -> Dict[int, int]:
+    """
+    批量获取数据源部门在指定租户下对应的租户部门 ID
+
+    :return: {数据源部门 ID: 租户部门 ID}
+    """
+    dept_id_map: Dict[int, int] = {}
+    for dept_ids in chunked(list(data_source_dept_ids), ID_LOOKUP_CHUNK_SIZE):
+        dept_id_map.update(
+            TenantDepartment.objects.filter(data_source_department_id__in=dept_ids, tenant_id=tenant_id).values_list(
+                "data_source_department_id", "id"
+            )
+        )
+
+    return dept_id_map
 
 
 class DepartmentListApi(LegacyOpenApiCommonMixin, DefaultTenantMixin, generics.ListAPIView):
@@ -54,86 +115,104 @@ class DepartmentListApi(LegacyOpenApiCommonMixin, DefaultTenantMixin, generics.L
         no_page = params["no_page"]
 
         tenant_depts = self._filter_queryset(params)
-        if not no_page:
-            tenant_depts = self.paginate_queryset(tenant_depts)
+        # 全量拉取时，按主键分批读取部门，并流式输出
+        if no_page:
+            return make_legacy_json_streaming_response(
+                self._iter_dept_infos(tenant_depts, params.get("fields", []), params["with_ancestors"])
+            )
 
-        dept_infos = self._build_dept_infos(tenant_depts, params.get("fields", []), params["with_ancestors"])
-        if not no_page:
-            return self.get_paginated_response(dept_infos)
+        dept_infos = self._build_dept_infos(
+            self.paginate_queryset(tenant_depts), params.get("fields", []), params["with_ancestors"]
+        )
+        return self.get_paginated_response(dept_infos)
 
-        return Response(dept_infos)
+    def _iter_dept_infos(
+        self, tenant_depts: QuerySet[TenantDepartment], fields: List[str], with_ancestors: bool
+    ) -> Iterator[Dict[str, Any]]:
+        # 全量拉取时分批构造，每批仅查询该批部门相关的数据
+        for depts in iter_queryset_in_batches(tenant_depts, NO_PAGE_STREAMING_CHUNK_SIZE):
+            yield from self._build_dept_infos(depts, fields, with_ancestors)
 
     def _build_dept_infos(
-        self, tenant_depts: QuerySet[TenantDepartment], fields: List[str], with_ancestors: bool
+        self, tenant_depts: List[TenantDepartment], fields: List[str], with_ancestors: bool
     ) -> List[Dict[str, Any]]:
-        # 部门 ID 映射：{(数据源部门 ID, 租户 ID)：租户部门 ID}
-        tenant_dept_id_map = {
-            (data_source_dept_id, tenant_id): dept_id
-            for (data_source_dept_id, tenant_id, dept_id) in TenantDepartment.objects.values_list(
-                "data_source_department_id", "tenant_id", "id"
-            )
-        }
-        # {数据源部门 ID: 数据源部门名称}
-        dept_id_name_map = dict(DataSourceDepartment.objects.values_list("id", "name"))
-        rel_tree = Tree(DataSourceDepartmentRelation.objects.values_list("department_id", "parent_id"))
-
-        resp_data = []
-        for dept in tenant_depts:
+        """
+        构造一批部门的信息
+
+        Q: 为什么不直接加载全量的部门名称 & 部门关系树？
+        A: 分页时每页仅几十个部门，全量加载的开销与组织规模成正比；这里只查询当前批次的部门，
+           其祖先（MPTT 范围查询）及子部门，开销只与批次大小 & 部门层级有关
+        """
+        # 批量查询的部门均属于默认租户
+        tenant_id = self.default_tenant.id
+        dept_relations = [dept.data_source_department.department_relation for dept in tenant_depts]
+
+        # 没有指定 fields 的时候，额外返回 full_name & children 字段，需要查询祖先部门（含自身）
+        ancestor_relations_map = {} if fields else _get_dept_ancestor_relations_map(dept_relations)
+        # {数据源部门 ID: 子部门关系列表}，仅 with_ancestors 时需要返回子部门信息
+        child_relations_map: Dict[int, List[DataSourceDepartmentRelation]] = defaultdict(list)
+        if not fields and with_ancestors:
+            for rel in (
+                DataSourceDepartmentRelation.objects.filter(
+                    parent_id__in=[rel.department_id for rel in dept_relations]
+                )
+                .select_related("department")
+                .order_by("tree_id", "lft")
+            ):
+                child_relations_map[rel.parent_id].append(rel)
+
+        # {数据源部门 ID：租户部门 ID}，父部门，祖先部门，子部门都需要转换为同租户的租户部门 ID
+        data_source_dept_ids = {rel.parent_id for rel in dept_relations if rel.parent_id}
+        for relations in [*ancestor_relations_map.values(), *child_relations_map.values()]:
+            data_source_dept_ids.update(rel.department_id for rel in relations)
+        dept_id_map = _get_tenant_dept_id_map(data_source_dept_ids, tenant_id)
+
+        dept_infos = []
+        for dept, dept_relation in zip(tenant_depts, dept_relations):
             dept_info = {
                 "id": dept.id,
                 "name": dept.data_source_department.name,
                 "extras": dept.data_source_department.extras,
                 "category_id": dept.data_source_department.data_source_id,
-                "parent": tenant_dept_id_map.get(
-                    (dept.data_source_department.department_relation.parent_id, dept.tenant_id)
-                ),
-                "level": dept.data_source_department.department_relation.level,
+                "parent": dept_id_map.get(dept_relation.parent_id),
+                "level": dept_relation.level,
                 "order": 0,
                 "enabled": True,
             }
             # 特殊指定 fields 的情况下仅返回指定的字段
             if fields:
-                dept_info = {k: v for k, v in dept_info.items() if k in fields}
-                resp_data.append(dept_info)
+                dept_infos.append({k: v for k, v in dept_info.items() if k in fields})
                 continue
 
             # 没有指定 fields 的时候，额外返回 full_name & children 字段
-            dept_full_name = "/".join(
-                [
-                    dept_id_name_map[x]
-                    for x in rel_tree.get_ancestors(dept.data_source_department_id, include_self=True)
-                ]
-            )
+            ancestor_relations = ancestor_relations_map[dept.data_source_department_id]
+            dept_full_name = "/".join(rel.department.name for rel in ancestor_relations)
             dept_info["full_name"] = dept_full_name
-            dept_info["has_children"] = bool(rel_tree.get_children(dept.data_source_department_id))
+            # MPTT 中非叶子节点即存在子部门，无需额外查询子部门
+            dept_info["has_children"] = not dept_relation.is_leaf_node()
 
             # 若指定 with_ancestors == True，则额外返回祖先 & 孩子部门信息（为什么需要孩子信息？总之老的逻辑是这样的）
             if with_ancestors:
+                # 最后一个为部门自身，需要排除
                 dept_info["ancestors"] = [
-                    {"id": tenant_dept_id_map[(id, dept.tenant_id)], "name": dept_id_name_map.get(id, "--")}
-                    for id in rel_tree.get_ancestors(dept.data_source_department_id)
-                    if (id, dept.tenant_id) in tenant_dept_id_map
+                    {"id": dept_id_map[rel.department_id], "name": rel.department.name}
+                    for rel in ancestor_relations[:-1]
+                    if rel.department_id in dept_id_map
+                ]
+                dept_info["children"] = [
+                    {
+                        "id": dept_id_map[rel.department_id],
+                        "name": rel.department.name,
+                        "full_name": f"{dept_full_name}/{rel.department.name}",
+                        "has_children": not rel.is_leaf_node(),
+                    }
+                    for rel in child_relations_map[dept.data_source_department_id]
+                    if rel.department_id in dept_id_map
                 ]
-                children = []
-                for child_dept_id in rel_tree.get_children(dept.data_source_department_id):
-                    if (child_dept_id, dept.tenant_id) not in tenant_dept_id_map:
-                        continue
-
-                    child_dept_name = dept_id_name_map.get(child_dept_id, "--")
-                    children.append(
-                        {
-                            "id": tenant_dept_id_map[(child_dept_id, dept.tenant_id)],
-                            "name": child_dept_name,
-                            "full_name": f"{dept_full_name}/{child_dept_name}",
-                            "has_children": bool(rel_tree.get_children(child_dept_id)),
-                        }
-                    )
-
-                dept_info["children"] = children
 
-            resp_data.append(dept_info)
+            dept_infos.append(dept_info)
 
-        return resp_data
+        return dept_infos
 
     def _filter_queryset(self, params: Dict[str, Any]) -> QuerySet:
         # 注：兼容 v2 的 OpenAPI 只提供默认租户的数据（包括默认租户本身数据源的数据 & 其他租户协同过来的数据）
@@ -224,77 +303,72 @@ class DepartmentRetrieveApi(LegacyOpenApiCommonMixin, DefaultTenantMixin, generi
 
         # fields 为空时，额外返回字段 full_name（即部门组织路径），has_children（是否拥有子部门）
         # children（子部门信息列表）[{id, name, full_name, has_children}]
-        resp_data["parent"] = self._get_dept_parent_id(tenant_dept, dept_relation)
+        # 祖先（含自身）& 子部门均批量查询，再统一转换为同租户的租户部门 ID，查询次数与部门所在层级无关
+        ancestor_relations = (
+            _get_dept_ancestor_relations_map([dept_relation])[dept_relation.department_id] if dept_relation else []
+        )
+        child_relations = list(
+            DataSourceDepartmentRelation.objects.filter(
+                parent_id=tenant_dept.data_source_department_id,
+            ).select_related("department")
+        )
+        dept_id_map = _get_tenant_dept_id_map(
+            [rel.department_id for rel in ancestor_relations + child_relations], tenant_dept.tenant_id
+        )
+
+        # 父部门即为祖先之一，父租户部门必须是同租户的
+        resp_data["parent"] = dept_id_map.get(dept_relation.parent_id) if dept_relation else None
         resp_data["level"] = self._get_dept_tree_level(dept_relation)
 
-        tenant_dept_full_name = self._get_dept_full_name(tenant_dept, dept_relation)
-        children = self._get_dept_children(tenant_dept, tenant_dept_full_name)
+        tenant_dept_full_name = self._get_dept_full_name(tenant_dept, ancestor_relations)
+        children = self._get_dept_children(child_relations, dept_id_map, tenant_dept_full_name)
         resp_data["full_name"] = tenant_dept_full_name
         resp_data["has_children"] = bool(children)
         resp_data["children"] = children
 
         if params.get("with_ancestors"):
-            resp_data["ancestors"] = self._get_dept_ancestors(tenant_dept, dept_relation)
+            resp_data["ancestors"] = self._get_dept_ancestors(ancestor_relations, dept_id_map)
 
         return Response(resp_data)
 
     @staticmethod
-    def _get_dept_full_name(tenant_dept: TenantDepartment, dept_relation: DataSourceDepartmentRelation) -> str:
+    def _get_dept_full_name(
+        tenant_dept: TenantDepartment, ancestor_relations: List[DataSourceDepartmentRelation]
+    ) -> str:
         """获取部门组织路径信息"""
         # TODO 协同后续支持指定组织范围的话，不能直接吐出到根部门的路径
-        if not dept_relation:
+        if not ancestor_relations:
             return tenant_dept.data_source_department.name
 
-        return "/".join(dept_relation.get_ancestors(include_self=True).values_list("department__name", flat=True))
+        return "/".join(rel.department.name for rel in ancestor_relations)
 
     @staticmethod
-    def _get_dept_ancestors(tenant_dept: TenantDepartment, dept_relation: DataSourceDepartmentRelation) -> List[Dict]:
+    def _get_dept_ancestors(
+        ancestor_relations: List[DataSourceDepartmentRelation], dept_id_map: Dict[int, int]
+    ) -> List[Dict]:
         """获取租户部门的所有祖先部门信息"""
-        if not dept_relation:
-            return []
-
-        ancestors = [
-            {"id": rel.department.id, "name": rel.department.name}
-            for rel in dept_relation.get_ancestors(include_self=False).select_related("department")
-        ]
-        dept_id_map = dict(
-            TenantDepartment.objects.filter(
-                data_source_department_id__in=[dept["id"] for dept in ancestors], tenant_id=tenant_dept.tenant_id
-            ).values_list("data_source_department_id", "id")
-        )
-        # 如果 dept["id"] 不在 dept_id_map 中，说明该部门未同步成租户部门（可能是协同的部分同步的情况）
+        # 最后一个为部门自身，需要排除
+        # 如果部门 ID 不在 dept_id_map 中，说明该部门未同步成租户部门（可能是协同的部分同步的情况）
         return [
-            {"id": dept_id_map[dept["id"]], "name": dept["name"]} for dept in ancestors if dept["id"] in dept_id_map
+            {"id": dept_id_map[rel.department_id], "name": rel.department.name}
+            for rel in ancestor_relations[:-1]
+            if rel.department_id in dept_id_map
         ]
 
     @staticmethod
-    def _get_dept_children(tenant_dept: TenantDepartment, dept_full_name: str) -> List[Dict]:
+    def _get_dept_children(
+        child_relations: List[DataSourceDepartmentRelation], dept_id_map: Dict[int, int], dept_full_name: str
+    ) -> List[Dict]:
         """获取租户部门子部门信息"""
-        child_dept_relations = DataSourceDepartmentRelation.objects.filter(
-            parent_id=tenant_dept.data_source_department_id,
-        ).select_related("department")
-
-        if not child_dept_relations.exists():
-            return []
-
-        grandchild_dept_relations = DataSourceDepartmentRelation.objects.filter(
-            parent_id__in=[rel.department_id for rel in child_dept_relations],
-        )
-        has_grand_child_map = {rel.parent_id: True for rel in grandchild_dept_relations}
-        dept_id_map = dict(
-            TenantDepartment.objects.filter(
-                data_source_department_id__in=[rel.department_id for rel in child_dept_relations],
-                tenant_id=tenant_dept.tenant_id,
-            ).values_list("data_source_department_id", "id")
-        )
         return [
             {
                 "id": dept_id_map[rel.department_id],
                 "name": rel.department.name,
                 "full_name": f"{dept_full_name}/{rel.department.name}",
-                "has_children": has_grand_child_map.get(rel.department_id, False),
+                # MPTT 中非叶子节点即存在子部门，无需额外查询孙子部门
+                "has_children": not rel.is_leaf_node(),
             }
-            for rel in child_dept_relations
+            for rel in child_relations
             if rel.department_id in dept_id_map
         ]
 
@@ -395,66 +469,56 @@ class ProfileDepartmentListApi(LegacyOpenApiCommonMixin, DefaultTenantMixin, gen
         departments = [
             rel.department
             for rel in DataSourceDepartmentUserRelation.objects.filter(
-                user=tenant_user.data_source_user,
-            )
+                user_id=tenant_user.data_source_user_id,
+            ).select_related("department__department_relation")
         ]
         if not departments:
             return []
 
-        dept_id_map = dict(
-            TenantDepartment.objects.filter(
-                data_source_department__in=departments, tenant_id=tenant_user.tenant_id
-            ).values_list("data_source_department_id", "id")
+        # 用户所有部门的祖先（含自身）一次性批量查询，查询次数与用户所属部门数量无关
+        # Note: 部门可能不存在部门关系（MPTT 树节点），此时只有部门自身
+        dept_relations = [rel for dept in departments if (rel := getattr(dept, "department_relation", None))]
+        ancestors_map = _get_dept_ancestor_relations_map(dept_relations)
+        dept_id_map = _get_tenant_dept_id_map(
+            {dept.id for dept in departments}
+            | {rel.department_id for relations in ancestors_map.values() for rel in relations},
+            tenant_user.tenant_id,
         )
+
         user_dept_infos = []
         for idx, dept in enumerate(departments, start=1):
             if dept.id not in dept_id_map:
                 continue
 
+            # TODO 协同后续支持指定组织范围的话，不能直接吐出到根部门的路径
+            ancestor_relations = ancestors_map.get(dept.id, [])
             dept_info = {
                 "id": dept_id_map[dept.id],
                 "name": dept.name,
-                "full_name": self._get_dept_full_name(dept),
+                "full_name": "/".join(rel.department.name for rel in ancestor_relations) or dept.name,
                 "order": idx,
             }
             if with_ancestors:
-                dept_info["family"] = self._get_dept_ancestors(dept, dept_info["full_name"], tenant_user.tenant_id)
+                dept_info["family"] = self._get_dept_ancestors(ancestor_relations, dept_id_map)
 
             user_dept_infos.append(dept_info)
 
         return user_dept_infos
 
     @staticmethod
-    def _get_dept_ancestors(dept: DataSourceDepartment, dept_full_name: str, tenant_id: str) -> List[Dict]:
+    def _get_dept_ancestors(
+        ancestor_relations: List[DataSourceDepartmentRelation], dept_id_map: Dict[int, int]
+    ) -> List[Dict]:
         """获取某个部门祖先信息"""
-        dept_relation = DataSourceDepartmentRelation.objects.filter(department=dept).first()
-        if not dept_relation:
-            return []
-
-        ancestors = dept_relation.get_ancestors().select_related("department")
-        dept_id_map = dict(
-            TenantDepartment.objects.filter(
-                data_source_department_id__in=[rel.department_id for rel in ancestors], tenant_id=tenant_id
-            ).values_list("data_source_department_id", "id")
-        )
-        ancestor_count = ancestors.count()
+        # 最后一个为部门自身，需要排除
+        ancestor_names = [rel.department.name for rel in ancestor_relations]
         return [
             {
-                "id": dept_id_map[dept.department_id],
-                "name": dept.department.name,
-                "full_name": dept_full_name.rsplit("/", ancestor_count - idx + 1)[0],
+                "id": dept_id_map[rel.department_id],
+                "name": rel.department.name,
+                "full_name": "/".join(ancestor_names[:idx]),
                 "order": idx,
             }
-            for idx, dept in enumerate(ancestors, start=1)
-            if dept.department_id in dept_id_map
+            for idx, rel in enumerate(ancestor_relations[:-1], start=1)
+            if rel.department_id in dept_id_map
         ]
-
-    @staticmethod
-    def _get_dept_full_name(dept: DataSourceDepartment) -> str:
-        """获取部门组织路径信息"""
-        dept_relation = DataSourceDepartmentRelation.objects.filter(department=dept).first()
-        if not dept_relation:
-            return dept.name
-
-        # TODO 协同后续支持指定组织范围的话，不能直接吐出到根部门的路径
-        return "/".join(dept_relation.get_ancestors(include_self=True).values_list("department__name", flat=True))
@@ -18,10 +18,11 @@ from typing import Dict, List
 
 from django.db.models import QuerySet
 from rest_framework import generics
-from rest_framework.response import Response
 
+from bkuser.apis.open_v2.constants import ID_LOOKUP_CHUNK_SIZE, NO_PAGE_STREAMING_CHUNK_SIZE
 from bkuser.apis.open_v2.mixins import DefaultTenantMixin, LegacyOpenApiCommonMixin
 from bkuser.apis.open_v2.pagination import LegacyOpenApiPagination
+from bkuser.apis.open_v2.renderers import make_legacy_json_streaming_response
 from bkuser.apis.open_v2.serializers.edges import (
     DepartmentProfileRelationListInputSLZ,
     DepartmentProfileRelationListOutputSLZ,
@@ -31,6 +32,8 @@ from bkuser.apis.open_v2.serializers.edges import (
 from bkuser.apps.data_source.models import DataSourceDepartmentUserRelation, DataSourceUserLeaderRelation
 from bkuser.apps.tenant.models import TenantDepartment
 from bkuser.common.cache import Cache, CacheEnum, CacheKeyPrefixEnum
+from bkuser.utils.django import iter_queryset_in_batches
+from bkuser.utils.std_iter import chunked
 
 
 class DepartmentProfileRelationListApi(LegacyOpenApiCommonMixin, DefaultTenantMixin, generics.ListAPIView):
@@ -66,28 +69,39 @@ class DepartmentProfileRelationListApi(LegacyOpenApiCommonMixin, DefaultTenantMi
         return self.get_paginated_response(DepartmentProfileRelationListOutputSLZ(relations, many=True).data)
 
     def _get_with_no_page(self):
-        """支持不分页的数据拉取，需要支持 Redis 缓存结果，出于性能考虑，不使用 OutputSLZ"""
+        """
+        支持不分页的数据拉取，需要支持 Redis 缓存结果，出于性能考虑，不使用 OutputSLZ
+
+        Note: 关系数据需要整体写入缓存，因此仍需构建完整列表，但不再持有 Model 实例，且响应按批编码流式输出
+        """
         cache = Cache(CacheEnum.REDIS, CacheKeyPrefixEnum.V2_API)
         # 如果缓存中存在，则直接返回
         if relations := cache.get(self.cache_key):
-            return Response(relations)
+            return make_legacy_json_streaming_response(relations)
 
         relations = self._convert(
             [
                 {"id": rel.id, "department_id": rel.department_id, "profile_id": rel.user_id}
-                for rel in self.get_queryset()
+                for rels in iter_queryset_in_batches(self.get_queryset(), NO_PAGE_STREAMING_CHUNK_SIZE)
+                for rel in rels
             ]
         )
         cache.set(self.cache_key, relations, timeout=self.cache_timeout)
-        return Response(relations)
+        return make_legacy_json_streaming_response(relations)
 
     def _convert(self, data_source_dept_user_relations: List[Dict]) -> List[Dict]:
         """将数据源部门 ID 转换成租户部门 ID 注：在兼容 v2 的 OpenAPI 中，用户 ID 即为数据源用户 ID，无需转换"""
-        dept_id_map = dict(
-            TenantDepartment.objects.filter(
-                data_source_department_id__in=[rel["department_id"] for rel in data_source_dept_user_relations],
-            ).values_list("data_source_department_id", "id")
-        )
+        # Note: 全量拉取时部门 ID 数量与整个组织架构规模相当，因此需要去重后分批查询，避免单条 SQL 过长
+        data_source_dept_ids = {rel["department_id"] for rel in data_source_dept_user_relations}
+        dept_id_map: Dict[int, int] = {}
+        for dept_ids in chunked(data_source_dept_ids, ID_LOOKUP_CHUNK_SIZE):
+            dept_id_map.update(
+                TenantDepartment.objects.filter(
+                    tenant_id=self.default_tenant.id, data_source_department_id__in=dept_ids
+                ).values_list("data_source_department_id", "id")
+            )
+
+        # Note: 协同策略已确认但数据尚未同步到默认租户时，数据源部门没有对应的租户部门，这部分关系需要跳过
         return [
             {"id": rel["id"], "department_id": dept_id_map[rel["department_id"]], "profile_id": rel["profile_id"]}
             for rel in data_source_dept_user_relations
@@ -127,15 +141,20 @@ class ProfileLeaderRelationListApi(LegacyOpenApiCommonMixin, DefaultTenantMixin,
         return self.get_paginated_response(ProfileLeaderRelationListOutputSLZ(relations, many=True).data)
 
     def _get_with_no_page(self):
-        """支持不分页的数据拉取，需要支持 Redis 缓存结果，出于性能考虑，不使用 OutputSLZ"""
+        """
+        支持不分页的数据拉取，需要支持 Redis 缓存结果，出于性能考虑，不使用 OutputSLZ
+
+        Note: 关系数据需要整体写入缓存，因此仍需构建完整列表，但不再持有 Model 实例，且响应按批编码流式输出
+        """
         cache = Cache(CacheEnum.REDIS, CacheKeyPrefixEnum.V2_API)
         # 如果缓存中存在，则直接返回
         if relations := cache.get(self.cache_key):
-            return Response(relations)
+            return make_legacy_json_streaming_response(relations)
 
         relations = [
             {"id": rel.id, "from_profile_id": rel.user_id, "to_profile_id": rel.leader_id}
-            for rel in self.get_queryset()
+            for rels in iter_queryset_in_batches(self.get_queryset(), NO_PAGE_STREAMING_CHUNK_SIZE)
+            for rel in rels
         ]
         cache.set(self.cache_key, relations, timeout=self.cache_timeout)
-        return Response(relations)
+        return make_legacy_json_streaming_response(relations)
@@ -18,18 +18,20 @@
 import datetime
 import operator
 from collections import defaultdict
-from functools import reduce
-from typing import Any, Dict, List, Tuple
+from functools import cached_property, reduce
+from typing import Any, Dict, Iterator, List, Sequence, Set, Tuple
 
 import phonenumbers
 from blue_krill.data_types.enum import EnumField, StrStructuredEnum
-from django.db.models import Q, QuerySet
+from django.db.models import Count, Q, QuerySet
 from django.http import Http404
 from rest_framework import generics
 from rest_framework.response import Response
 
+from bkuser.apis.open_v2.constants import NO_PAGE_STREAMING_CHUNK_SIZE
 from bkuser.apis.open_v2.mixins import DataSourceDomainMixin, DefaultTenantMixin, LegacyOpenApiCommonMixin
 from bkuser.apis.open_v2.pagination import LegacyOpenApiPagination
+from bkuser.apis.open_v2.renderers import make_legacy_json_streaming_response
 from bkuser.apis.open_v2.serializers.profilers import (
     DepartmentProfileListInputSLZ,
     ProfileLanguageUpdateInputSLZ,
@@ -41,11 +43,14 @@ from bkuser.apps.data_source.models import (
     DataSourceDepartmentRelation,
     DataSourceDepartmentUserRelation,
     DataSourceUserLeaderRelation,
+    DataSourceUserLookupGram,
 )
 from bkuser.apps.tenant.constants import TenantUserStatus
-from bkuser.apps.tenant.models import DataSourceDepartment, TenantDepartment, TenantUser
+from bkuser.apps.tenant.models import DataSourceDepartment, TenantDepartment, TenantUser, TenantUserLookupGram
 from bkuser.common.error_codes import error_codes
 from bkuser.common.views import ExcludePatchAPIViewMixin
+from bkuser.utils.django import iter_queryset_in_batches
+from bkuser.utils.ngram import NGRAM_SIZE, normalize, split_full_ngrams
 from bkuser.utils.tree import Tree
 
 
@@ -76,19 +81,60 @@ def _phone_country_code_to_iso_code(phone_country_code: str) -> str:
     return ""
 
 
+def _filter_lookup_gram_owner_ids(grams: QuerySet, owner_field: str, keyword: str) -> QuerySet | None:
+    """
+    根据模糊搜索的关键字，从 gram 表中筛选出可能包含该关键字的所属对象 ID（子查询）
+
+    :param grams: 已按字段过滤的 gram 查询集
+    :param owner_field: gram 所属对象的字段，如 user_id / tenant_user_id
+    :param keyword: 模糊搜索的关键字
+    :return: 候选对象 ID 子查询，None 表示无法通过 gram 粗筛（关键字归一化后为空）
+    """
+    normalized_keyword = normalize(keyword)
+    if not normalized_keyword:
+        return None
+
+    # 关键字不超过 gram 长度，则必定是某个 gram 的前缀（前缀匹配可以走索引）
+    if len(normalized_keyword) <= NGRAM_SIZE:
+        return grams.filter(gram__startswith=normalized_keyword).values(owner_field)
+
+    # 否则关键字的所有完整 gram 都需要存在
+    keyword_grams = split_full_ngrams(normalized_keyword)
+    return (
+        grams.filter(gram__in=keyword_grams)
+        .values(owner_field)
+        .annotate(gram_count=Count("id"))
+        .filter(gram_count=len(keyword_grams))
+        .values(owner_field)
+    )
+
+
 class TenantUserListToUserInfosMixin(DefaultTenantMixin, DataSourceDomainMixin):
     """将 TenantUser 列表转换 对外的用户信息"""
 
-    def build_user_infos(self, tenant_users: QuerySet[TenantUser], fields: List[str]) -> List[Dict[str, Any]]:
+    def iter_user_infos(self, tenant_users: QuerySet[TenantUser], fields: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        按主键分批读取租户用户，并逐批构建对外用户信息，用于全量拉取（no_page）的流式响应
+        :param tenant_users: 租户用户 Queryset，要求同 build_user_infos
+        :param fields: 对外的用户字段列表，空时表示所有用户字段都对外
+        """
+        for users in iter_queryset_in_batches(tenant_users, NO_PAGE_STREAMING_CHUNK_SIZE):
+            yield from self.build_user_infos(users, fields)
+
+    def build_user_infos(self, tenant_users: Sequence[TenantUser], fields: List[str]) -> List[Dict[str, Any]]:
         """
         构建对外用户信息列表
-        :param tenant_users: 租户用户 Queryset，即已经经过 filter 等后的 QuerySet
-                             且必须保证 select_related("data_source_user")
+        :param tenant_users: 租户用户列表，即已经经过 filter，分页等后的租户用户
+                             且必须保证 select_related("data_source_user", "data_source")
         :param fields: 对外的用户字段列表，空时表示所有用户字段都对外
+
+        Note: 循环内只允许访问已 select_related 的关联对象或外键 ID（如 tenant_id / data_source_user_id），
+              避免逐行触发额外的 SQL 查询（N+1）
         """
         # 按需提前获取用户 Leader 信息 和 用户部门信息
-        data_source_user_ids = [i.data_source_user.id for i in tenant_users]
-        leader_map = self._get_leader_map(data_source_user_ids) if not fields or "leader" in fields else {}
+        data_source_user_ids = [i.data_source_user_id for i in tenant_users]
+        tenant_ids = {i.tenant_id for i in tenant_users}
+        leader_map = self._get_leader_map(data_source_user_ids, tenant_ids) if not fields or "leader" in fields else {}
         department_map = (
             self._get_department_map(data_source_user_ids) if not fields or "departments" in fields else {}
         )
@@ -113,6 +159,9 @@ class TenantUserListToUserInfosMixin(DefaultTenantMixin, DataSourceDomainMixin):
             else:
                 extras = source_extras
 
+            # (tenant_id, data_source_user_id) 为 leader_map / department_map 的 key
+            relation_key = (tenant_user.tenant_id, tenant_user.data_source_user_id)
+
             # 不会放大查询的字段
             user_info = {
                 "id": tenant_user.data_source_user.id,
@@ -143,26 +192,26 @@ class TenantUserListToUserInfosMixin(DefaultTenantMixin, DataSourceDomainMixin):
                 user_info = {k: v for k, v in user_info.items() if k in fields}
                 # 由于 leader 需要额外计算，因此特殊分支处理
                 if "leader" in fields:
-                    user_info["leader"] = leader_map.get((tenant_user.tenant.id, tenant_user.data_source_user.id))
+                    user_info["leader"] = leader_map.get(relation_key)
                 # 由于 department 需要额外计算，因此特殊分支处理
                 if "departments" in fields:
-                    user_info["departments"] = department_map.get(
-                        (tenant_user.tenant.id, tenant_user.data_source_user.id)
-                    )
+                    user_info["departments"] = department_map.get(relation_key)
 
                 user_infos.append(user_info)
                 continue
 
             # 未指定字段，则关联字段也要返回
-            user_info["leader"] = leader_map.get((tenant_user.tenant.id, tenant_user.data_source_user.id))
-            user_info["departments"] = department_map.get((tenant_user.tenant.id, tenant_user.data_source_user.id))
+            user_info["leader"] = leader_map.get(relation_key)
+            user_info["departments"] = department_map.get(relation_key)
 
             user_infos.append(user_info)
 
         return user_infos
 
     @staticmethod
-    def _get_leader_map(data_source_user_ids: List[int]) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
+    def _get_leader_map(
+        data_source_user_ids: List[int], tenant_ids: Set[str]
+    ) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
         """
         通过数据源用户 ID 获取其在租户下的 Leader 列表
         : return:
@@ -172,36 +221,49 @@ class TenantUserListToUserInfosMixin(DefaultTenantMixin, DataSourceDomainMixin):
               然后返回数据源用户在每个租户下的 Leader 信息列表
         """
         # 数据源用户 Leader 关系查询
-        relations = DataSourceUserLeaderRelation.objects.filter(user_id__in=data_source_user_ids).only(
-            "user_id", "leader_id"
+        relations = list(
+            DataSourceUserLeaderRelation.objects.filter(user_id__in=data_source_user_ids).values_list(
+                "user_id", "leader_id"
+            )
         )
-        leader_ids = [i.leader_id for i in relations]
+        leader_ids = {leader_id for _, leader_id in relations}
         if not leader_ids:
             return {}
 
-        # 查询 Leader 对应的租户用户
-        leaders = TenantUser.objects.filter(data_source_user_id__in=leader_ids).select_related("data_source_user")
+        # 查询 Leader 对应的租户用户，只需要查询当前批次用户所在的租户（leader 必须与用户同一个租户才是有效的）
+        # Q: 为什么需要限制租户 & 字段？
+        # A: 协同场景下，一个数据源用户会对应多个租户的租户用户，若不限制租户，协同的租户越多，查询的行数越多
+        leaders = TenantUser.objects.filter(tenant_id__in=tenant_ids, data_source_user_id__in=leader_ids).values_list(
+            "id", "tenant_id", "data_source_user_id", "data_source_user__full_name"
+        )
         # { "数据源 Leader ID": List[租户 Leader ] }， 协同场景下，会出现一个 data_source_user 可以对应多个租户用户
         tenant_leader_map = defaultdict(list)
-        for i in leaders:
-            tenant_leader_map[i.data_source_user_id].append(i)
+        for tenant_user_id, tenant_id, data_source_user_id, full_name in leaders:
+            tenant_leader_map[data_source_user_id].append(
+                (tenant_id, {"id": data_source_user_id, "username": tenant_user_id, "display_name": full_name})
+            )
 
-        # 基于 leader 必须与用户同一个租户才是有效的，这里以 (tenant_id, data_source_user_id) 作为 key
+        # 这里以 (tenant_id, data_source_user_id) 作为 key
         # { (tenant_id, data_source_user_id) : List[Tenant Leader Info] }
         leader_map = defaultdict(list)
-        for rel in relations:
-            for tenant_leader in tenant_leader_map[rel.leader_id]:
-                leader_map[(tenant_leader.tenant_id, rel.user_id)].append(
-                    {
-                        "id": tenant_leader.data_source_user.id,
-                        "username": tenant_leader.id,
-                        "display_name": tenant_leader.data_source_user.full_name,
-                    }
-                )
+        for user_id, leader_id in relations:
+            for tenant_id, leader_info in tenant_leader_map[leader_id]:
+                leader_map[(tenant_id, user_id)].append(leader_info)
         return leader_map
 
-    @staticmethod
-    def _get_department_map(data_source_user_ids: List[int]) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
+    @cached_property
+    def _department_name_tree(self) -> Tuple[Dict[int, str], Tree]:
+        """
+        用于计算部门 full_name 的 数据源部门名称映射 & 部门树
+
+        Note: 全量拉取时 build_user_infos 会被分批调用多次，这里缓存以避免每批都全量查询部门数据
+        """
+        # {数据源部门 ID: 数据源部门名称}
+        dept_id_name_map = dict(DataSourceDepartment.objects.values_list("id", "name"))
+        rel_tree = Tree(DataSourceDepartmentRelation.objects.values_list("department_id", "parent_id"))
+        return dept_id_name_map, rel_tree
+
+    def _get_department_map(self, data_source_user_ids: List[int]) -> Dict[Tuple[str, int], List[Dict[str, Any]]]:
         """
         通过数据源用户 ID 获取其在租户下的（直属）部门 列表
         """
@@ -223,9 +285,7 @@ class TenantUserListToUserInfosMixin(DefaultTenantMixin, DataSourceDomainMixin):
             tenant_dept_map[i.data_source_department_id].append(i)
 
         # dept_id_name_map 和 rel_tree 用于计算部门 full_name
-        # {数据源部门 ID: 数据源部门名称}
-        dept_id_name_map = dict(DataSourceDepartment.objects.values_list("id", "name"))
-        rel_tree = Tree(DataSourceDepartmentRelation.objects.values_list("department_id", "parent_id"))
+        dept_id_name_map, rel_tree = self._department_name_tree
 
         # 基于 部门 必须与用户同一个租户才是有效的，这里以 (tenant_id, data_source_user_id) 作为 key
         dept_map: Dict[Tuple[str, int], List[Dict]] = defaultdict(list)
@@ -265,29 +325,27 @@ class ProfileListApi(LegacyOpenApiCommonMixin, TenantUserListToUserInfosMixin, g
 
         # 根据参数过滤
         tenant_users = self._filter_queryset(params)
-        if not no_page:
-            tenant_users = self.paginate_queryset(tenant_users)
+        # 全量拉取时，分批构造用户信息并流式输出
+        if no_page:
+            return make_legacy_json_streaming_response(self.iter_user_infos(tenant_users, params.get("fields")))
 
         # 根据 fields 构造对外的用户信息
-        user_infos = self.build_user_infos(tenant_users, params.get("fields"))
-        if not no_page:
-            return self.get_paginated_response(user_infos)
-
-        return Response(user_infos)
+        user_infos = self.build_user_infos(self.paginate_queryset(tenant_users), params.get("fields"))
+        return self.get_paginated_response(user_infos)
 
     def _filter_queryset(self, params: Dict[str, Any]) -> QuerySet[TenantUser]:
         """根据参数过滤, 生成 TenantUser QuerySet"""
         # Note: 由于对外很多字段都是继承于数据源用户字段，所以这里直接关联查询 data_source_user
         # 注：兼容 v2 的 OpenAPI 只提供默认租户的数据（包括默认租户本身数据源的数据 & 其他租户协同过来的数据）
-        queryset = (
-            TenantUser.objects.select_related("data_source_user", "data_source")
-            .filter(
-                Q(tenant=self.default_tenant),
-                # Note: 兼容 v2 仅仅允许默认租户下的虚拟账号输出
-                Q(data_source__type=DataSourceTypeEnum.REAL)
-                | Q(data_source__owner_tenant_id=self.default_tenant.id, data_source__type=DataSourceTypeEnum.VIRTUAL),
-            )
-            .distinct()
+        # Q: 为什么不需要 distinct？
+        # A: 基础查询只关联了 data_source / data_source_user（多对一），而各 lookup_field 也只会过滤多对一关联字段，
+        #    部门这类一对多关系则是通过 data_source_user_id__in 子查询（半连接）过滤，都不会产生重复的行，
+        #    使用 distinct 反而会导致 MySQL 在每次分页查询时都需要创建临时表并进行 filesort
+        queryset = TenantUser.objects.select_related("data_source_user", "data_source").filter(
+            Q(tenant=self.default_tenant),
+            # Note: 兼容 v2 仅仅允许默认租户下的虚拟账号输出
+            Q(data_source__type=DataSourceTypeEnum.REAL)
+            | Q(data_source__owner_tenant_id=self.default_tenant.id, data_source__type=DataSourceTypeEnum.VIRTUAL),
         )
         # 过滤查询的字段
         lookup_field = params.get("lookup_field")
@@ -346,6 +404,10 @@ class ProfileListApi(LegacyOpenApiCommonMixin, TenantUserListToUserInfosMixin, g
             domain_query = self._convert_domain_lookup_to_query(lookup_values, is_exact)
             return None if domain_query is None else [domain_query]
 
+        # 姓名模糊查询，需要先通过 gram 粗筛
+        if lookup_field == "display_name" and not is_exact:
+            return [self._convert_display_name_fuzzy_lookup_to_query(value) for value in lookup_values]
+
         # 先将部门（3.x 版本中的租户部门）转换为 3.x 版本中的数据源部门 ID，再查询出对应的数据源用户 ID
         if lookup_field == "departments":
             department_query = self._convert_department_lookup_to_query(lookup_values, is_exact)
@@ -404,9 +466,10 @@ class ProfileListApi(LegacyOpenApiCommonMixin, TenantUserListToUserInfosMixin, g
         ).values_list("user_id", flat=True)
 
         # 不存在，则说明查询不到任何用户
-        if not data_source_user_ids:
+        if not data_source_user_ids.exists():
             return None
 
+        # 以子查询（半连接）的方式过滤，避免关联一对多的部门关系导致重复的行
         return Q(data_source_user_id__in=data_source_user_ids)
 
     @staticmethod
@@ -497,14 +560,49 @@ class ProfileListApi(LegacyOpenApiCommonMixin, TenantUserListToUserInfosMixin, g
             )
 
         # 模糊查询
-        return Q(
+        inherited_query = Q(
             # 继承
             **{f"is_inherited_{lookup_field}": True, f"data_source_user__{lookup_field}__icontains": value},
-        ) | Q(
+        )
+        custom_query = Q(
             # 自定义
             **{f"is_inherited_{lookup_field}": False, f"custom_{lookup_field}__icontains": value},
         )
 
+        # 继承的使用数据源用户的 gram 粗筛，自定义的使用租户用户的 gram 粗筛，原始条件用于复核
+        data_source_user_ids = _filter_lookup_gram_owner_ids(
+            DataSourceUserLookupGram.objects.filter(field=lookup_field), "user_id", value
+        )
+        tenant_user_ids = _filter_lookup_gram_owner_ids(
+            TenantUserLookupGram.objects.filter(field=lookup_field), "tenant_user_id", value
+        )
+        if data_source_user_ids is None or tenant_user_ids is None:
+            return inherited_query | custom_query
+
+        return (inherited_query & Q(data_source_user_id__in=data_source_user_ids)) | (
+            custom_query & Q(id__in=tenant_user_ids)
+        )
+
+    @staticmethod
+    def _convert_display_name_fuzzy_lookup_to_query(value: str) -> Q:
+        """
+        对于姓名字段的模糊查询，通过 gram 粗筛出候选的数据源用户，再复核原始的模糊匹配条件
+
+        Q: 为什么粗筛后还需要复核原始条件？
+        A: gram 匹配只是包含关键字的必要条件（如 abcd 的 gram 都在 abcxbcd 中），且归一化比数据库的
+           大小写不敏感匹配更宽松，复核后结果与原来的 icontains 查询保持一致，而复核只需要作用于候选集
+        """
+        # Note: display_name 在旧版本实际上是姓名，所以这里直接使用 full_name，同 _convert_lookup_field
+        query = Q(data_source_user__full_name__icontains=value)
+
+        data_source_user_ids = _filter_lookup_gram_owner_ids(
+            DataSourceUserLookupGram.objects.filter(field="full_name"), "user_id", value
+        )
+        if data_source_user_ids is None:
+            return query
+
+        return query & Q(data_source_user_id__in=data_source_user_ids)
+
 
 class ProfileRetrieveApi(
     LegacyOpenApiCommonMixin, DefaultTenantMixin, DataSourceDomainMixin, generics.RetrieveAPIView
@@ -525,7 +623,7 @@ class ProfileRetrieveApi(
 
         # 注：兼容 v2 的 OpenAPI 只提供默认租户的数据（包括默认租户本身数据源的数据 & 其他租户协同过来的数据）
         tenant_user = (
-            TenantUser.objects.select_related("data_source_user")
+            TenantUser.objects.select_related("data_source_user", "data_source")
             .filter(
                 Q(**lookup_filter),
                 Q(tenant_id=self.default_tenant.id),
@@ -557,7 +655,7 @@ class ProfileRetrieveApi(
 
         # 查询 Leader 对应的租户用户
         leaders = TenantUser.objects.filter(
-            tenant=tenant_user.tenant, data_source_user_id__in=leader_ids
+            tenant_id=tenant_user.tenant_id, data_source_user_id__in=leader_ids
         ).select_related("data_source_user")
 
         return [
@@ -691,33 +789,37 @@ class DepartmentProfileListApi(LegacyOpenApiCommonMixin, TenantUserListToUserInf
 
         # 根据部门、是否递归，过滤出 部门下的用户
         tenant_users = self._filter_queryset(tenant_dept, params.get("recursive"))
-        if not no_page:
-            tenant_users = self.paginate_queryset(tenant_users)
+        # 全量拉取时，分批构造用户信息并流式输出（不指定用户字段）
+        if no_page:
+            return make_legacy_json_streaming_response(self.iter_user_infos(tenant_users, []))
 
         # 不指定用户字段
-        user_infos = self.build_user_infos(tenant_users, [])
-        if not no_page:
-            return self.get_paginated_response(user_infos)
-
-        return Response(user_infos)
+        user_infos = self.build_user_infos(self.paginate_queryset(tenant_users), [])
+        return self.get_paginated_response(user_infos)
 
     @staticmethod
     def _filter_queryset(tenant_dept: TenantDepartment, recursive: bool) -> QuerySet[TenantUser]:
         """根据部门、是否递归，过滤出 部门下的租户用户"""
-        # 数据源部门 ID 列表
-        dept_ids = [tenant_dept.data_source_department_id]
+        dept_user_relations = DataSourceDepartmentUserRelation.objects.filter(
+            department_id=tenant_dept.data_source_department_id
+        )
         if recursive:
-            # 根据部门关系，查询部门子孙（包括自身）
+            # 根据部门关系，查询部门子孙（包括自身）下的用户
+            # Q: 为什么不通过 get_descendants 获取子孙部门 ID 列表？
+            # A: 根部门的子孙部门即为整个组织，子孙部门 ID 列表 & 成员 ID 列表会随着组织规模增长，
+            #    这里通过 MPTT 的 (tree_id, lft, rght) 范围直接关联部门用户关系，交由数据库完成分页
             rel = DataSourceDepartmentRelation.objects.filter(
                 department_id=tenant_dept.data_source_department_id
             ).first()
             if rel:
-                dept_ids = rel.get_descendants(include_self=True).values_list("department_id", flat=True)
+                dept_user_relations = DataSourceDepartmentUserRelation.objects.filter(
+                    department__department_relation__tree_id=rel.tree_id,
+                    department__department_relation__lft__gte=rel.lft,
+                    department__department_relation__rght__lte=rel.rght,
+                )
 
         # 查询部门下的用户 ID 列表
-        user_ids = DataSourceDepartmentUserRelation.objects.filter(department_id__in=dept_ids).values_list(
-            "user_id", flat=True
-        )
+        user_ids = dept_user_relations.values("user_id")
 
         # 租户用户
         # Note: 由于虚拟账号不存在部门关系，所以这里不需要查询虚拟账号情况
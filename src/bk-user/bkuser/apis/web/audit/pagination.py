@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from typing import List, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.response import Response
+
+from bkuser.apps.audit.models import OperationAuditRecord
+from bkuser.common.error_codes import error_codes
+from bkuser.common.pagination import CustomPageNumberPagination
+
+
+class AuditRecordPagination(CustomPageNumberPagination):
+    """
+    审计记录分页器
+
+    默认为页码分页（兼容前端页面）；若请求参数中包含 cursor，则使用基于 (created_at, id) 的游标（Keyset）分页，
+    游标分页不需要 OFFSET & COUNT，无论翻到多深的页面，查询开销都是稳定的
+
+    游标分页：首页请求时 cursor 为空字符串，后续使用响应中的 next_cursor 请求下一页，
+    next_cursor 为 None 表示没有更多数据
+    """
+
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.use_cursor = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.use_cursor = True
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by("-created_at", "-id")
+
+        if cursor := request.query_params[self.cursor_query_param]:
+            created_at, record_id = self._decode_cursor(cursor)
+            # 注：created_at__lte 作为单独的条件，便于数据库利用 (tenant_id, created_at) 联合索引进行范围扫描
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=record_id)
+            )
+
+        # 多查询一条，用于判断是否还有下一页
+        records: List[OperationAuditRecord] = list(queryset[: page_size + 1])
+        self.next_cursor = self._encode_cursor(records[page_size - 1]) if len(records) > page_size else None
+        return records[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([("next_cursor", self.next_cursor), ("results", data)]))
+
+    @staticmethod
+    def _encode_cursor(record: OperationAuditRecord) -> str:
+        raw = json.dumps([record.created_at.isoformat(), record.id])
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("utf-8")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple:
+        try:
+            created_at, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+            created_at = parse_datetime(created_at)
+        except (binascii.Error, ValueError, TypeError):
+            raise error_codes.VALIDATION_ERROR.f(f"invalid cursor {cursor}")
+
+        if not (created_at and isinstance(record_id, str)):
+            raise error_codes.VALIDATION_ERROR.f(f"invalid cursor {cursor}")
+
+        return created_at, record_id
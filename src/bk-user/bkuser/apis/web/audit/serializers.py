@@ -30,6 +30,11 @@ class AuditRecordListInputSLZ(serializers.Serializer):
     object_name = serializers.CharField(help_text="操作对象名称", required=False, allow_blank=True)
     creator = serializers.CharField(help_text="操作人", required=False, allow_blank=True)
     created_at = serializers.DateTimeField(help_text="操作时间", required=False)
+    cursor = serializers.CharField(
+        help_text="游标（首页为空字符串，后续页为上一页返回的 next_cursor），提供该参数时使用游标分页",
+        required=False,
+        allow_blank=True,
+    )
 
 
 class AuditRecordListOutputSLZ(serializers.Serializer):
@@ -15,7 +15,6 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 from datetime import timedelta
-from typing import Any, Dict
 
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, status
@@ -27,6 +26,7 @@ from bkuser.apps.permission.constants import PermAction
 from bkuser.apps.permission.permissions import perm_class
 from bkuser.biz.tenant import TenantUserHandler
 
+from .pagination import AuditRecordPagination
 from .serializers import AuditRecordListInputSLZ, AuditRecordListOutputSLZ
 
 
@@ -36,6 +36,7 @@ class AuditRecordListAPIView(CurrentUserTenantMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated, perm_class(PermAction.MANAGE_TENANT)]
 
     serializer_class = AuditRecordListOutputSLZ
+    pagination_class = AuditRecordPagination
 
     def get_queryset(self):
         slz = AuditRecordListInputSLZ(data=self.request.query_params)
@@ -64,14 +65,6 @@ class AuditRecordListAPIView(CurrentUserTenantMixin, generics.ListAPIView):
 
         return OperationAuditRecord.objects.filter(**filters)
 
-    def get_serializer_context(self) -> Dict[str, Any]:
-        # 对于 tenant_user_id 的查询也采取分页的方式，不需要全表查询
-        tenant_user_ids = self.paginate_queryset(self.get_queryset().values_list("creator", flat=True))
-
-        return {
-            "user_display_name_map": TenantUserHandler.get_tenant_user_display_name_map_by_ids(tenant_user_ids),
-        }
-
     @swagger_auto_schema(
         tags=["audit"],
         operation_description="操作审计列表",
@@ -79,4 +72,11 @@ class AuditRecordListAPIView(CurrentUserTenantMixin, generics.ListAPIView):
         responses={status.HTTP_200_OK: AuditRecordListOutputSLZ(many=True)},
     )
     def get(self, request, *args, **kwargs):
-        return self.list(request, *args, **kwargs)
+        records = self.paginate_queryset(self.get_queryset())
+        # 操作人展示名称只需要根据当前页的记录获取，不需要再次查询审计记录
+        context = {
+            "user_display_name_map": TenantUserHandler.get_tenant_user_display_name_map_by_ids(
+                list({r.creator for r in records})
+            )
+        }
+        return self.get_paginated_response(AuditRecordListOutputSLZ(records, many=True, context=context).data)
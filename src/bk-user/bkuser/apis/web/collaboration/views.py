@@ -16,7 +16,6 @@
 # to the current version of the project delivered to anyone in the future.
 from typing import Any, Dict
 
-from django.db import transaction
 from django.db.models import QuerySet
 from django.utils.translation import gettext_lazy as _
 from drf_yasg.utils import swagger_auto_schema
@@ -49,10 +48,9 @@ from bkuser.apps.tenant.constants import CollaborationStrategyStatus, TenantStat
 from bkuser.apps.tenant.models import (
     CollaborationStrategy,
     Tenant,
-    TenantDepartment,
-    TenantUser,
     TenantUserCustomField,
 )
+from bkuser.apps.tenant.tasks import delete_collaboration_strategy
 from bkuser.biz.tenant import TenantUserHandler
 from bkuser.common.error_codes import error_codes
 from bkuser.common.views import ExcludePatchAPIViewMixin
@@ -69,7 +67,9 @@ class CollaborationToStrategyListCreateApi(CurrentUserTenantMixin, generics.List
     pagination_class = None
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(source_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(source_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     def get_serializer_context(self) -> Dict[str, Any]:
         tenant_user_ids = self.get_queryset().values_list("creator", flat=True)
@@ -119,7 +119,9 @@ class CollaborationToStrategyUpdateDestroyApi(
     lookup_url_kwarg = "id"
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(source_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(source_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     @swagger_auto_schema(
         tags=["collaboration"],
@@ -156,18 +158,14 @@ class CollaborationToStrategyUpdateDestroyApi(
         if strategy.source_status != CollaborationStrategyStatus.DISABLED:
             raise error_codes.COLLABORATION_STRATEGY_DELETE_FAILED.f(_("删除前需要先停用协同策略"))
 
-        with transaction.atomic():
-            # 删除策略时，需要一并删除掉通过该策略产生的 TenantUser & TenantDepartment
-            TenantUser.objects.filter(
-                tenant=strategy.target_tenant,
-                data_source__owner_tenant_id=strategy.source_tenant_id,
-            ).delete()
-            TenantDepartment.objects.filter(
-                tenant=strategy.target_tenant,
-                data_source__owner_tenant_id=strategy.source_tenant_id,
-            ).delete()
-            # 最后才是删除策略
-            strategy.delete()
+        # Q: 为什么不在请求中直接删除？
+        # A: 策略产生的租户用户 & 部门可能非常多（如数十万），在请求中删除容易超时且会产生长事务，
+        #    因此先将策略标记为删除中（不再参与协同 & 不在页面展示），由后台任务分批清理数据后再删除策略
+        strategy.source_status = CollaborationStrategyStatus.DELETING
+        strategy.updater = request.user.username
+        strategy.save(update_fields=["source_status", "updater", "updated_at"])
+
+        delete_collaboration_strategy.delay(strategy.id)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -182,7 +180,9 @@ class CollaborationToStrategySourceStatusUpdateApi(
     lookup_url_kwarg = "id"
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(source_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(source_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     @swagger_auto_schema(
         tags=["collaboration"],
@@ -260,7 +260,9 @@ class CollaborationFromStrategyListApi(CurrentUserTenantMixin, generics.ListAPIV
     pagination_class = None
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     def get_serializer_context(self) -> Dict[str, Any]:
         return {"tenant_name_map": {t.id: t.name for t in Tenant.objects.all()}}
@@ -284,7 +286,9 @@ class CollaborationStrategySourceTenantCustomFieldListApi(
     lookup_url_kwarg = "id"
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     @swagger_auto_schema(
         tags=["collaboration"],
@@ -309,7 +313,9 @@ class CollaborationFromStrategyUpdateApi(CurrentUserTenantMixin, ExcludePatchAPI
     lookup_url_kwarg = "id"
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     @swagger_auto_schema(
         tags=["collaboration"],
@@ -350,7 +356,9 @@ class CollaborationFromStrategyConfirmApi(CurrentUserTenantMixin, ExcludePatchAP
     lookup_url_kwarg = "id"
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     @swagger_auto_schema(
         tags=["collaboration"],
@@ -399,7 +407,9 @@ class CollaborationFromStrategyTargetStatusUpdateApi(
     lookup_url_kwarg = "id"
 
     def get_queryset(self) -> QuerySet[CollaborationStrategy]:
-        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id())
+        return CollaborationStrategy.objects.filter(target_tenant_id=self.get_current_tenant_id()).exclude(
+            source_status=CollaborationStrategyStatus.DELETING
+        )
 
     @swagger_auto_schema(
         tags=["collaboration"],
@@ -378,13 +378,26 @@ class DataSourceSyncRecordListOutputSLZ(serializers.Serializer):
         return duration_string(duration)
 
 
+class DataSourceSyncRecordRetrieveInputSLZ(serializers.Serializer):
+    log_offset = serializers.IntegerField(
+        help_text="日志分片起始序号（增量读取日志）", required=False, default=0, min_value=0
+    )
+
+
 class DataSourceSyncRecordRetrieveOutputSLZ(serializers.Serializer):
     id = serializers.IntegerField(help_text="同步记录 ID")
     status = serializers.SerializerMethodField(help_text="数据源同步状态")
     has_warning = serializers.BooleanField(help_text="是否有警告")
     start_at = serializers.DateTimeField(help_text="开始时间")
     duration = serializers.SerializerMethodField(help_text="持续时间")
-    logs = serializers.CharField(help_text="同步日志")
+    logs = serializers.SerializerMethodField(help_text="同步日志")
+    next_log_offset = serializers.SerializerMethodField(help_text="下次增量读取日志的分片起始序号")
+
+    def get_logs(self, obj: DataSourceSyncTask) -> str:
+        return self.context["logs"]
+
+    def get_next_log_offset(self, obj: DataSourceSyncTask) -> int:
+        return self.context["next_log_offset"]
 
     # 由于数据源同步分为两个阶段同步任务（数据源同步任务 & 租户同步任务），因此同步状态与持续时间需要做兼容
     def get_status(self, obj: DataSourceSyncTask) -> str:
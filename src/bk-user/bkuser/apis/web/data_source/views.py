@@ -43,6 +43,7 @@ from bkuser.apis.web.data_source.serializers import (
     DataSourceRelatedResourceStatsOutputSLZ,
     DataSourceRetrieveOutputSLZ,
     DataSourceSyncRecordListOutputSLZ,
+    DataSourceSyncRecordRetrieveInputSLZ,
     DataSourceSyncRecordRetrieveOutputSLZ,
     DataSourceSyncRecordSearchInputSLZ,
     DataSourceTestConnectionInputSLZ,
@@ -54,10 +55,8 @@ from bkuser.apis.web.mixins import CurrentUserTenantMixin
 from bkuser.apps.data_source.constants import DataSourceTypeEnum
 from bkuser.apps.data_source.models import (
     DataSource,
-    DataSourceDepartment,
     DataSourcePlugin,
     DataSourceSensitiveInfo,
-    DataSourceUser,
 )
 from bkuser.apps.idp.constants import INVALID_REAL_DATA_SOURCE_ID, IdpStatus
 from bkuser.apps.idp.models import Idp, IdpSensitiveInfo
@@ -67,7 +66,7 @@ from bkuser.apps.sync.constants import SyncTaskTrigger
 from bkuser.apps.sync.data_models import DataSourceSyncOptions
 from bkuser.apps.sync.managers import DataSourceSyncManager
 from bkuser.apps.sync.models import DataSourceSyncTask, TenantSyncTask
-from bkuser.apps.tenant.models import TenantDepartment, TenantUser
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler
 from bkuser.biz.auditor import DataSourceAuditor
 from bkuser.biz.data_source import DataSourceHandler
 from bkuser.biz.exporters import DataSourceUserExporter
@@ -333,31 +332,10 @@ class DataSourceRelatedResourceStatsApi(CurrentUserTenantDataSourceMixin, generi
     def get(self, request, *args, **kwargs):
         data_source = self.get_object()
 
-        # 本租户自有的部门数量，即数据源部门数量，用户数量同理（会一比一同步成租户部门/用户）
-        own_department_count = DataSourceDepartment.objects.filter(data_source=data_source).count()
-        own_user_count = DataSourceUser.objects.filter(data_source=data_source).count()
-
-        # 本租户分享给其他租户的：任意不属于本租户的租户部门/用户，但是数据源是本租户的
-        shared_to_departments = TenantDepartment.objects.filter(
-            data_source=data_source,
-        ).exclude(tenant_id=data_source.owner_tenant_id)
-        shared_to_users = TenantUser.objects.filter(
-            data_source=data_source,
-        ).exclude(tenant_id=data_source.owner_tenant_id)
-        shared_to_tenant_count = len(
-            set(shared_to_departments.values_list("tenant_id", flat=True))
-            | set(shared_to_users.values_list("tenant_id", flat=True))
-        )
-
-        resources = {
-            # own
-            "own_department_count": own_department_count,
-            "own_user_count": own_user_count,
-            # shared to
-            "shared_to_tenant_count": shared_to_tenant_count,
-            "shared_to_department_count": shared_to_departments.count(),
-            "shared_to_user_count": shared_to_users.count(),
-        }
+        # Q: 为什么不直接 count 各资源表？
+        # A: 大规模数据源下，多次全表 count & 按租户去重开销很大，这里读取预先维护的计数器，
+        #    计数器由变更接口增量更新，同步任务结束后 & 定时任务按实际数据校准
+        resources = DataSourceResourceStatsHandler.get(data_source)
         return Response(DataSourceRelatedResourceStatsOutputSLZ(resources).data)
 
 
@@ -627,12 +605,18 @@ class DataSourceSyncRecordRetrieveApi(CurrentUserTenantMixin, generics.RetrieveA
     @swagger_auto_schema(
         tags=["data_source"],
         operation_description="数据源更新日志",
+        query_serializer=DataSourceSyncRecordRetrieveInputSLZ(),
         responses={status.HTTP_200_OK: DataSourceSyncRecordRetrieveOutputSLZ()},
     )
     def get(self, request, *args, **kwargs):
+        slz = DataSourceSyncRecordRetrieveInputSLZ(data=request.query_params)
+        slz.is_valid(raise_exception=True)
+
         data_source_sync_task = self.get_object()
         tenant_sync_task = TenantSyncTask.objects.filter(data_source_sync_task_id=data_source_sync_task.id).first()
-        context = {"tenant_sync_task": tenant_sync_task}
+        # 同步过程中日志是分片写入的，可以通过 log_offset 增量读取日志
+        logs, next_log_offset = data_source_sync_task.read_logs(slz.validated_data["log_offset"])
+        context = {"tenant_sync_task": tenant_sync_task, "logs": logs, "next_log_offset": next_log_offset}
         return Response(DataSourceSyncRecordRetrieveOutputSLZ(instance=data_source_sync_task, context=context).data)
 
 
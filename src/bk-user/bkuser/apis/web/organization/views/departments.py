@@ -15,7 +15,7 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
-from collections import defaultdict
+from collections import Counter, defaultdict
 from typing import Dict
 
 from django.conf import settings
@@ -51,7 +51,7 @@ from bkuser.apps.permission.constants import PermAction
 from bkuser.apps.permission.permissions import perm_class
 from bkuser.apps.tenant.constants import CollaborationStrategyStatus
 from bkuser.apps.tenant.models import CollaborationStrategy, Tenant, TenantDepartment, TenantDepartmentIDRecord
-from bkuser.apps.tenant.utils import TenantDeptIDGenerator
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler, TenantDeptIDGenerator
 from bkuser.biz.auditor import TenantDepartmentAuditor
 from bkuser.common.error_codes import error_codes
 from bkuser.common.views import ExcludePatchAPIViewMixin
@@ -230,6 +230,10 @@ class TenantDepartmentListCreateApi(CurrentUserTenantMixin, generics.ListCreateA
             if collaboration_tenant_depts:
                 TenantDepartment.objects.bulk_create(collaboration_tenant_depts)
 
+            # 更新数据源关联资源数量统计
+            for tenant_id in [current_tenant_id, *[d.tenant_id for d in collaboration_tenant_depts]]:
+                DataSourceResourceStatsHandler.incr(data_source, tenant_id, department_delta=1)
+
             # 刚创建的租户部门，需要捞出来，记录 ID 以便后续复用
             records = [
                 TenantDepartmentIDRecord(
@@ -335,6 +339,15 @@ class TenantDepartmentUpdateDestroyApi(
         auditor = TenantDepartmentAuditor(request.user.username, self.get_current_tenant_id())
         auditor.batch_pre_record_data_before(data_before_tenant_departments)
 
+        # 按租户统计待删除的部门数量（数据源所属租户统计的是数据源部门数量）
+        data_source = tenant_dept.data_source
+        tenant_dept_counts = Counter(
+            tenant_id
+            for tenant_id in data_before_tenant_departments.values_list("tenant_id", flat=True)
+            if tenant_id != data_source.owner_tenant_id
+        )
+        tenant_dept_counts[data_source.owner_tenant_id] += len(data_source_dept_ids)
+
         with transaction.atomic():
             # 连带协同产生的租户部门还有子部门都给你删咯
             TenantDepartment.objects.filter(data_source_department_id__in=data_source_dept_ids).delete()
@@ -344,6 +357,10 @@ class TenantDepartmentUpdateDestroyApi(
             DataSourceDepartmentRelation.objects.filter(department_id__in=data_source_dept_ids).delete()
             DataSourceDepartmentRelation.objects.partial_rebuild(dept_relation.tree_id)
 
+            # 更新数据源关联资源数量统计
+            for tenant_id, cnt in tenant_dept_counts.items():
+                DataSourceResourceStatsHandler.incr(data_source, tenant_id, department_delta=-cnt)
+
         # 【审计】将审计记录保存至数据库
         auditor.record_delete()
 
@@ -128,14 +128,25 @@ class TenantDeptUserRelationBatchUpdateApi(CurrentUserTenantDataSourceMixin, gen
         )
         auditor.pre_record_data_before()
 
-        # 移动操作：为数据源部门 & 用户添加关联边，但是会删除这批用户所有的存量关联边
+        # 移动操作：这批用户最终只会属于目标部门，为避免无意义的删除 & 重建，只会处理变化的关联边
+        target_relations = set(itertools.product(data_source_user_ids, data_source_dept_ids))
         with transaction.atomic():
-            # 先删除
-            DataSourceDepartmentUserRelation.objects.filter(user_id__in=data_source_user_ids).delete()
-            # 再添加
+            # (user_id, department_id) -> relation_id
+            exists_relation_map = {
+                (user_id, dept_id): rel_id
+                for rel_id, user_id, dept_id in DataSourceDepartmentUserRelation.objects.filter(
+                    user_id__in=data_source_user_ids
+                ).values_list("id", "user_id", "department_id")
+            }
+            # 先删除不在目标部门中的关联边
+            waiting_delete_relation_ids = [
+                rel_id for key, rel_id in exists_relation_map.items() if key not in target_relations
+            ]
+            DataSourceDepartmentUserRelation.objects.filter(id__in=waiting_delete_relation_ids).delete()
+            # 再添加尚不存在的关联边
             relations = [
                 DataSourceDepartmentUserRelation(user_id=user_id, department_id=dept_id, data_source=data_source)
-                for dept_id, user_id in itertools.product(data_source_dept_ids, data_source_user_ids)
+                for user_id, dept_id in target_relations - exists_relation_map.keys()
             ]
             DataSourceDepartmentUserRelation.objects.bulk_create(relations)
 
@@ -16,7 +16,7 @@
 # to the current version of the project delivered to anyone in the future.
 
 import itertools
-from collections import defaultdict
+from collections import Counter, defaultdict
 from datetime import timedelta
 from typing import Dict, List, Set
 
@@ -78,7 +78,7 @@ from bkuser.apps.tenant.models import (
     TenantUser,
     TenantUserValidityPeriodConfig,
 )
-from bkuser.apps.tenant.utils import TenantUserIDGenerator, is_username_frozen
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler, TenantUserIDGenerator, is_username_frozen
 from bkuser.biz.auditor import (
     TenantUserAccountExpiredAtUpdateAuditor,
     TenantUserCreateAuditor,
@@ -232,31 +232,29 @@ class TenantUserListCreateApi(CurrentUserTenantDataSourceMixin, generics.ListAPI
             tenant_id=cur_tenant_id, data_source=data_source
         )
         if kw := params.get("keyword"):
-            queryset = queryset.filter(
-                Q(data_source_user__username__icontains=kw)
-                | Q(data_source_user__full_name__icontains=kw)
-                | Q(data_source_user__email__icontains=kw)
-                | Q(data_source_user__phone__icontains=kw)
-            )
+            # 使用归一化的搜索关键字（username / full_name / email / phone）匹配，可走 (data_source, search_key) 索引
+            data_source_users = DataSourceUser.objects.filter(data_source=data_source, search_key__contains=kw.lower())
+            queryset = queryset.filter(data_source_user_id__in=data_source_users.values("id"))
 
         # 指定具体的部门的情况
         if params["department_id"]:
             tenant_dept = TenantDepartment.objects.get(id=params["department_id"], tenant_id=cur_tenant_id)
 
-            filter_dept_ids = [tenant_dept.data_source_department_id]
-            # 如果指定递归查询，则需要找出所有子部门的 ID，用于后续过滤
+            dept_user_relations = DataSourceDepartmentUserRelation.objects.filter(
+                department_id=tenant_dept.data_source_department_id
+            )
+            # 如果指定递归查询，则通过 MPTT 的 (tree_id, lft, rght) 范围关联所有子部门，避免物化所有子部门 ID
             if params["recursive"]:
                 dept_relation = DataSourceDepartmentRelation.objects.get(
                     department_id=tenant_dept.data_source_department_id
                 )
-                filter_dept_ids = list(
-                    dept_relation.get_descendants(include_self=True).values_list("department_id", flat=True)
+                dept_user_relations = DataSourceDepartmentUserRelation.objects.filter(
+                    department__department_relation__tree_id=dept_relation.tree_id,
+                    department__department_relation__lft__gte=dept_relation.lft,
+                    department__department_relation__rght__lte=dept_relation.rght,
                 )
 
-            data_source_user_ids = DataSourceDepartmentUserRelation.objects.filter(
-                department_id__in=filter_dept_ids
-            ).values_list("user_id", flat=True)
-            queryset = queryset.filter(data_source_user_id__in=data_source_user_ids)
+            queryset = queryset.filter(data_source_user_id__in=dept_user_relations.values("user_id"))
         # 不指定部门 & 不指定递归查询 -> 查询租户下的游离用户（没有部门）
         elif not params["recursive"]:
             dept_user_relations = DataSourceDepartmentUserRelation.objects.filter(data_source=data_source)
@@ -399,6 +397,10 @@ class TenantUserListCreateApi(CurrentUserTenantDataSourceMixin, generics.ListAPI
             if collaboration_tenant_users:
                 TenantUser.objects.bulk_create(collaboration_tenant_users)
 
+            # 更新数据源关联资源数量统计
+            for tenant_id in [cur_tenant_id, *[u.tenant_id for u in collaboration_tenant_users]]:
+                DataSourceResourceStatsHandler.incr(data_source, tenant_id, user_delta=1)
+
         # 对新增的用户进行账密信息初始化 & 发送密码通知
         initialize_identity_info_and_send_notification.delay(data_source.id)
         return Response(TenantUserCreateOutputSLZ(tenant_user).data, status=status.HTTP_201_CREATED)
@@ -568,6 +570,10 @@ class TenantUserRetrieveUpdateDestroyApi(
             DataSourceUserLeaderRelation.objects.filter(leader=data_source_user).delete()
             data_source_user.delete()
 
+            # 更新数据源关联资源数量统计
+            for tenant_id in {cur_tenant_id, *[u.tenant_id for u in data_before_tenant_users]}:
+                DataSourceResourceStatsHandler.incr(data_source, tenant_id, user_delta=-1)
+
         # 【审计】将审计记录保存至数据库
         auditor.record()
 
@@ -923,6 +929,12 @@ class TenantUserBatchCreateApi(CurrentUserTenantDataSourceMixin, generics.Create
         if collaboration_tenant_users:
             TenantUser.objects.bulk_create(collaboration_tenant_users, batch_size=self.bulk_create_batch_size)
 
+        # 更新数据源关联资源数量统计
+        tenant_user_counts = Counter(u.tenant_id for u in collaboration_tenant_users)
+        tenant_user_counts[cur_tenant_id] += len(tenant_users)
+        for tenant_id, cnt in tenant_user_counts.items():
+            DataSourceResourceStatsHandler.incr(data_source, tenant_id, user_delta=cnt)
+
 
 class TenantUserBatchCreatePreviewApi(CurrentUserTenantDataSourceMixin, generics.CreateAPIView):
     """批量创建租户用户 - 预览"""
@@ -1001,6 +1013,12 @@ class TenantUserBatchDeleteApi(CurrentUserTenantDataSourceMixin, generics.Destro
             # 最后才是批量回收数据源用户
             DataSourceUser.objects.filter(id__in=data_source_user_ids).delete()
 
+            # 更新数据源关联资源数量统计（数据源所属租户统计的是数据源用户数量）
+            tenant_user_counts = Counter(u.tenant_id for u in data_before_tenant_users if u.tenant_id != cur_tenant_id)
+            tenant_user_counts[cur_tenant_id] += len(data_source_user_ids)
+            for tenant_id, cnt in tenant_user_counts.items():
+                DataSourceResourceStatsHandler.incr(data_source, tenant_id, user_delta=-cnt)
+
         # 【审计】保存记录至数据库
         auditor.record()
 
@@ -36,6 +36,7 @@ from bkuser.apps.sync.tasks import initialize_identity_info_and_send_notificatio
 from bkuser.apps.tenant.constants import DEFAULT_TENANT_USER_VALIDITY_PERIOD_CONFIG, TenantStatus
 from bkuser.apps.tenant.models import (
     CollaborationStrategy,
+    DataSourceResourceStats,
     Tenant,
     TenantDepartment,
     TenantManager,
@@ -280,6 +281,7 @@ class TenantRetrieveUpdateDestroyApi(ExcludePatchAPIViewMixin, generics.Retrieve
             # 删除剩余的，通过协同创建的租户用户 / 部门（本租户数据源同步所得的，已经在删除数据源时候删除）
             TenantUser.objects.filter(tenant=tenant).delete()
             TenantDepartment.objects.filter(tenant=tenant).delete()
+            DataSourceResourceStats.objects.filter(tenant=tenant).delete()
             # 最后再删除租户
             tenant.delete()
 
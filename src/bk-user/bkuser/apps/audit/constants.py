@@ -18,6 +18,9 @@
 from blue_krill.data_types.enum import EnumField, StrStructuredEnum
 from django.utils.translation import gettext_lazy as _
 
+# 单个归档批次的审计记录数量（即单条归档记录包含的审计记录数量）
+AUDIT_RECORD_ARCHIVE_BATCH_SIZE = 500
+
 
 class ObjectTypeEnum(StrStructuredEnum):
     """操作对象类型"""
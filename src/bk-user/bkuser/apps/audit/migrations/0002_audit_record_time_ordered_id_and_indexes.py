@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+# Generated by Django 4.2.18 on 2026-10-19 15:39
+
+import bkuser.utils.uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='operationauditrecord',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AlterField(
+            model_name='operationauditrecord',
+            name='id',
+            field=models.CharField(default=bkuser.utils.uuid.generate_time_ordered_uuid, max_length=64, primary_key=True, serialize=False),
+        ),
+        migrations.AddIndex(
+            model_name='operationauditrecord',
+            index=models.Index(fields=['tenant_id', 'created_at'], name='audit_opera_tenant__168b6e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operationauditrecord',
+            index=models.Index(fields=['tenant_id', 'operation', 'created_at'], name='audit_opera_tenant__997662_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operationauditrecord',
+            index=models.Index(fields=['tenant_id', 'object_type', 'created_at'], name='audit_opera_tenant__2ddd76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operationauditrecord',
+            index=models.Index(fields=['tenant_id', 'creator', 'created_at'], name='audit_opera_tenant__d4c79c_idx'),
+        ),
+    ]
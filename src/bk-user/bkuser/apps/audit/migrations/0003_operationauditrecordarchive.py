@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+# Generated by Django 4.2.18 on 2026-10-19 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_audit_record_time_ordered_id_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationAuditRecordArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant_id', models.CharField(max_length=128, verbose_name='租户 ID')),
+                ('record_count', models.IntegerField(verbose_name='审计记录数量')),
+                ('earliest_created_at', models.DateTimeField(verbose_name='最早创建时间')),
+                ('latest_created_at', models.DateTimeField(verbose_name='最晚创建时间')),
+                ('content', models.BinaryField(verbose_name='压缩后的审计记录')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='归档时间')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tenant_id', 'latest_created_at'], name='audit_opera_tenant__ea2aa4_idx')],
+            },
+        ),
+    ]
@@ -15,16 +15,22 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import json
+import zlib
+from typing import Any, Dict, List
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 from bkuser.common.models import AuditedModel
-from bkuser.utils.uuid import generate_uuid
+from bkuser.utils.uuid import generate_time_ordered_uuid, generate_uuid
 
 
 class OperationAuditRecord(AuditedModel):
     """SaaS 审计操作记录"""
 
-    id = models.CharField(primary_key=True, max_length=64, default=generate_uuid)
+    # 注：使用时间有序的 ID，避免批量写入审计记录时，随机主键导致的 B+ 树页分裂
+    id = models.CharField(primary_key=True, max_length=64, default=generate_time_ordered_uuid)
     # 若操作记录具有相同的事件 ID，则表示这些记录由同一个事件触发，特别是批量操作
     event_id = models.CharField("事件 ID", max_length=64, default=generate_uuid)
     # 操作对象所属的租户 ID
@@ -41,4 +47,41 @@ class OperationAuditRecord(AuditedModel):
     extras = models.JSONField("额外信息", default=dict)
 
     class Meta:
-        ordering = ["-created_at"]
+        # 注：created_at 可能相同，使用 id 保证排序稳定（新记录的 id 按时间有序）
+        ordering = ["-created_at", "-id"]
+        # 与审计记录列表的过滤条件 & 排序匹配，避免对租户全量记录进行排序
+        indexes = [
+            models.Index(fields=["tenant_id", "created_at"]),
+            models.Index(fields=["tenant_id", "operation", "created_at"]),
+            models.Index(fields=["tenant_id", "object_type", "created_at"]),
+            models.Index(fields=["tenant_id", "creator", "created_at"]),
+        ]
+
+
+class OperationAuditRecordArchive(models.Model):
+    """
+    SaaS 审计操作记录归档
+
+    超过保留期限的审计记录会按批次压缩（JSON + zlib）后转存到该表，一条归档记录对应一批审计记录
+    """
+
+    tenant_id = models.CharField("租户 ID", max_length=128)
+    record_count = models.IntegerField("审计记录数量")
+    # 该批次审计记录的创建时间范围
+    earliest_created_at = models.DateTimeField("最早创建时间")
+    latest_created_at = models.DateTimeField("最晚创建时间")
+    content = models.BinaryField("压缩后的审计记录")
+    archived_at = models.DateTimeField("归档时间", auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tenant_id", "latest_created_at"]),
+        ]
+
+    @staticmethod
+    def compress(records: List[Dict[str, Any]]) -> bytes:
+        return zlib.compress(json.dumps(records, cls=DjangoJSONEncoder).encode("utf-8"))
+
+    def get_records(self) -> List[Dict[str, Any]]:
+        """解压获取归档的审计记录"""
+        return json.loads(zlib.decompress(self.content))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import logging
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.utils import timezone
+
+from bkuser.apps.audit.constants import AUDIT_RECORD_ARCHIVE_BATCH_SIZE
+from bkuser.apps.audit.models import OperationAuditRecord, OperationAuditRecordArchive
+from bkuser.celery import app
+from bkuser.common.task import BaseTask
+
+logger = logging.getLogger(__name__)
+
+
+def _get_retention_days(tenant_id: str) -> int:
+    """获取租户的审计记录保留天数"""
+    if tenant_id in settings.TENANT_AUDIT_RECORD_RETENTION_DAYS:
+        return int(settings.TENANT_AUDIT_RECORD_RETENTION_DAYS[tenant_id])
+
+    return settings.AUDIT_RECORD_RETENTION_DAYS
+
+
+def _archive_tenant_expired_audit_records(tenant_id: str, expired_before: datetime) -> int:
+    """将租户下早于指定时间的审计记录分批压缩归档，返回归档的记录数量"""
+    expired_records = OperationAuditRecord.objects.filter(tenant_id=tenant_id, created_at__lt=expired_before).order_by(
+        "created_at", "id"
+    )
+
+    archived_count = 0
+    while records := list(expired_records[:AUDIT_RECORD_ARCHIVE_BATCH_SIZE]):
+        # 每个批次单独提交事务，避免长事务 & 大量行锁
+        with transaction.atomic():
+            OperationAuditRecordArchive.objects.create(
+                tenant_id=tenant_id,
+                record_count=len(records),
+                earliest_created_at=records[0].created_at,
+                latest_created_at=records[-1].created_at,
+                content=OperationAuditRecordArchive.compress(
+                    [{**model_to_dict(r), "created_at": r.created_at, "updated_at": r.updated_at} for r in records]
+                ),
+            )
+            OperationAuditRecord.objects.filter(id__in=[r.id for r in records]).delete()
+
+        archived_count += len(records)
+
+    return archived_count
+
+
+@app.task(base=BaseTask, ignore_result=True)
+def archive_expired_audit_records():
+    """定时任务：将超过保留期限的审计记录压缩归档"""
+    logger.info("[celery] receive task: archive_expired_audit_records")
+
+    now = timezone.now()
+    # 注：distinct 可以利用 (tenant_id, created_at) 联合索引，不需要扫描全表
+    tenant_ids = list(OperationAuditRecord.objects.order_by().values_list("tenant_id", flat=True).distinct())
+    for tenant_id in tenant_ids:
+        retention_days = _get_retention_days(tenant_id)
+        # 保留天数小于等于 0 表示永久保留
+        if retention_days <= 0:
+            continue
+
+        archived_count = _archive_tenant_expired_audit_records(tenant_id, now - timedelta(days=retention_days))
+        if archived_count:
+            logger.info("archived %d expired audit records of tenant %s", archived_count, tenant_id)
@@ -21,6 +21,10 @@ from bkuser.plugins.local.constants import USERNAME_REGEX as DATA_SOURCE_USERNAM
 
 # 批量更新数据源用户自定义字段单次操作数量
 USER_EXTRAS_UPDATE_BATCH_SIZE = 250
+# 数据源用户 Extras 数据迁移进度的保留时间（单位：秒）
+USER_EXTRAS_MIGRATION_CHECKPOINT_TIMEOUT = 60 * 60 * 24
+# 数据源用户 Extras 数据迁移任务失败的最大重试次数
+USER_EXTRAS_MIGRATION_MAX_RETRIES = 3
 
 
 class FieldMappingOperation(StrStructuredEnum):
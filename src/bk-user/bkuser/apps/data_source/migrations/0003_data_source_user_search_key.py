@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+# Generated by Django 4.2.18 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+# 每批回填的用户数量
+BACKFILL_BATCH_SIZE = 1000
+
+
+def forwards_func(apps, schema_editor):
+    """回填存量数据源用户的搜索关键字"""
+    DataSourceUser = apps.get_model("data_source", "DataSourceUser")
+
+    last_id = 0
+    while True:
+        users = list(
+            DataSourceUser.objects.filter(id__gt=last_id).order_by("id").only(
+                "id", "username", "full_name", "email", "phone"
+            )[:BACKFILL_BATCH_SIZE]
+        )
+        if not users:
+            break
+
+        for u in users:
+            u.search_key = "\n".join((v or "").lower() for v in [u.username, u.full_name, u.email, u.phone])
+
+        DataSourceUser.objects.bulk_update(users, fields=["search_key"])
+        last_id = users[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_source', '0002_init_builtin_data_source_plugin'),
+        # 默认租户初始化时会创建数据源用户，需要在其之后回填
+        ('tenant', '0003_init_default_tenant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datasourceuser',
+            name='search_key',
+            field=models.CharField(blank=True, default='', max_length=600, verbose_name='搜索关键字'),
+        ),
+        migrations.AddIndex(
+            model_name='datasourceuser',
+            index=models.Index(fields=['data_source', 'search_key'], name='data_source_data_so_66c39d_idx'),
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop),
+    ]
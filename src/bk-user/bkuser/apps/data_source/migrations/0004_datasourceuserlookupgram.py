@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+# Generated by Django 4.2.18 on 2026-10-19 17:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from bkuser.utils.ngram import split_ngrams
+
+# 每批回填的用户数量
+BACKFILL_BATCH_SIZE = 1000
+
+
+def forwards_func(apps, schema_editor):
+    """回填存量数据源用户的模糊搜索 gram"""
+    DataSourceUser = apps.get_model("data_source", "DataSourceUser")
+    DataSourceUserLookupGram = apps.get_model("data_source", "DataSourceUserLookupGram")
+
+    last_id = 0
+    while True:
+        users = list(
+            DataSourceUser.objects.filter(id__gt=last_id).order_by("id").only(
+                "id", "full_name", "email", "phone"
+            )[:BACKFILL_BATCH_SIZE]
+        )
+        if not users:
+            break
+
+        grams = [
+            DataSourceUserLookupGram(user_id=u.id, field=field, gram=gram)
+            for u in users
+            for field in ["full_name", "email", "phone"]
+            for gram in split_ngrams(getattr(u, field))
+        ]
+        DataSourceUserLookupGram.objects.bulk_create(grams, batch_size=BACKFILL_BATCH_SIZE)
+        last_id = users[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_source', '0003_data_source_user_search_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataSourceUserLookupGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=32, verbose_name='字段名称')),
+                ('gram', models.CharField(max_length=3, verbose_name='gram')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='lookup_grams', to='data_source.datasourceuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'gram', 'user'], name='data_source_field_79777a_idx')],
+            },
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop),
+    ]
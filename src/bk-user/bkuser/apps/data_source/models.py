@@ -15,12 +15,18 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import copy
+import hashlib
+import json
+from typing import Dict, List, Optional
+
 from blue_krill.models.fields import EncryptField
 from django.conf import settings
 from django.db import models, transaction
 from mptt.models import MPTTModel, TreeForeignKey
 
 from bkuser.apps.data_source.constants import DataSourceTypeEnum
+from bkuser.common.cache import Cache, CacheEnum, CacheKeyPrefixEnum
 from bkuser.common.constants import SENSITIVE_MASK
 from bkuser.common.hashers.shortcuts import check_password
 from bkuser.common.models import AuditedModel, TimestampedModel
@@ -28,6 +34,8 @@ from bkuser.plugins.base import get_plugin_cfg_cls
 from bkuser.plugins.constants import DataSourcePluginEnum
 from bkuser.plugins.models import BasePluginConfig
 from bkuser.utils import dictx
+from bkuser.utils.ngram import NGRAM_SIZE, split_ngrams
+from bkuser.utils.std_iter import chunked
 from bkuser.utils.uuid import generate_uuid
 
 
@@ -43,6 +51,12 @@ class DataSourcePlugin(models.Model):
     logo = models.TextField("Logo", null=True, blank=True, default="")
 
 
+# 数据源插件配置（含敏感信息）缓存，仅使用进程内缓存
+_plugin_cfg_cache = Cache(CacheEnum.DEFAULT, CacheKeyPrefixEnum.DATA_SOURCE_PLUGIN_CONFIG)
+# 数据源插件配置缓存时间（单位：秒）
+_PLUGIN_CFG_CACHE_TIMEOUT = 60 * 5
+
+
 class DataSourceQuerySet(models.QuerySet):
     """数据源 QuerySet 类"""
 
@@ -105,7 +119,24 @@ class DataSource(AuditedModel):
         注意：使用该方法获取到的配置将会包含敏感信息，不适合通过 API 暴露出去，仅可用于内部逻辑流转
         API 要获取插件配置请使用 data_source.plugin_config，其中的敏感信息将会被 ******* 取代
         """
-        plugin_cfg = self.plugin_config
+        # Q: 为什么使用进程内缓存而不是 Redis 缓存？
+        # A: 插件配置中包含解密后的敏感信息，不适合存放到共享的外部缓存中
+        #
+        # Q: 缓存如何失效？
+        # A: 缓存 Key 包含插件配置摘要 & 数据源更新时间，插件配置变更后 Key 随之变化；
+        #    敏感信息只会通过 set_plugin_cfg 更新，该方法最后会保存数据源（更新 updated_at），因此也会失效
+        cache_key = self._get_plugin_cfg_cache_key()
+        plugin_cfg = _plugin_cfg_cache.get(cache_key)
+        if plugin_cfg is None:
+            plugin_cfg = self._build_plugin_cfg()
+            _plugin_cfg_cache.set(cache_key, plugin_cfg, timeout=_PLUGIN_CFG_CACHE_TIMEOUT)
+
+        return plugin_cfg
+
+    def _build_plugin_cfg(self) -> BasePluginConfig:
+        """从 DB 中读取敏感信息，构建插件配置"""
+        # 注：需要深拷贝，避免敏感信息被回填到 self.plugin_config 中
+        plugin_cfg = copy.deepcopy(self.plugin_config)
         for info in DataSourceSensitiveInfo.objects.filter(data_source=self):
             # 嵌套路径中可能某层的值为 None，此时应该跳过
             if not dictx.exist_key(plugin_cfg, info.key):
@@ -113,9 +144,16 @@ class DataSource(AuditedModel):
 
             dictx.set_items(plugin_cfg, info.key, info.value)
 
-        PluginCfgCls = get_plugin_cfg_cls(self.plugin.id)  # noqa: N806
+        PluginCfgCls = get_plugin_cfg_cls(self.plugin_id)  # noqa: N806
         return PluginCfgCls(**plugin_cfg)
 
+    def _get_plugin_cfg_cache_key(self) -> str:
+        cfg_digest = hashlib.md5(
+            json.dumps(self.plugin_config, sort_keys=True, default=str).encode("utf-8"), usedforsecurity=False
+        ).hexdigest()
+        updated_at = self.updated_at.timestamp() if self.updated_at else 0
+        return f"{self.id}:{self.plugin_id}:{updated_at}:{cfg_digest}"
+
     def set_plugin_cfg(self, cfg: BasePluginConfig) -> None:
         """设置插件配置，注意：该方法包含 DB 数据更新，需要在事务中执行"""
         plugin_cfg = cfg.model_dump()
@@ -136,6 +174,52 @@ class DataSource(AuditedModel):
         self.save(update_fields=["plugin_config", "updated_at"])
 
 
+class DataSourceUserQuerySet(models.QuerySet):
+    """数据源用户 QuerySet 类"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create 不会调用 save 方法，需要手动刷新搜索关键字
+        for obj in objs:
+            obj.refresh_search_key()
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+
+        # 同理，模糊搜索 gram 也需要手动创建
+        # Note: MySQL 批量创建后不会回填主键，因此需要根据 (data_source, code) 查询用户 ID
+        code_to_id_map: Dict[str, int] = {}
+        if any(obj.pk is None for obj in objs):
+            for data_source_id in {obj.data_source_id for obj in objs}:
+                code_to_id_map.update(
+                    DataSourceUser.objects.filter(
+                        data_source_id=data_source_id,
+                        code__in=[obj.code for obj in objs if obj.data_source_id == data_source_id],
+                    ).values_list("code", "id")
+                )
+
+        DataSourceUserLookupGram.create_grams({obj.pk or code_to_id_map[obj.code]: obj for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # 若更新了搜索关键字的来源字段，则搜索关键字也需要一并刷新 & 更新
+        if set(fields) & set(DataSourceUser.search_key_source_fields):
+            for obj in objs:
+                obj.refresh_search_key()
+
+            fields = [*fields, "search_key"]
+
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+
+        # 若更新了模糊搜索 gram 的来源字段，则 gram 也需要重建
+        if set(fields) & set(DataSourceUserLookupGram.source_fields):
+            DataSourceUserLookupGram.rebuild_grams({obj.pk: obj for obj in objs})
+
+        return rows
+
+
+# 数据源用户管理器类
+DataSourceUserManager = models.Manager.from_queryset(DataSourceUserQuerySet)
+
+
 class DataSourceUser(TimestampedModel):
     data_source = models.ForeignKey(DataSource, on_delete=models.PROTECT, db_constraint=False)
     code = models.CharField("用户标识", max_length=128, default=generate_uuid)
@@ -156,12 +240,93 @@ class DataSourceUser(TimestampedModel):
     # ----------------------- 状态相关 -----------------------
     # TODO: (1) 用户管理里涉及的功能状态 （2）企业本身的员工状态
 
+    # ----------------------- 搜索相关 -----------------------
+    # 冗余字段，由 username / full_name / email / phone 归一化（转小写）后拼接而成，用于关键字搜索
+    # 注：该字段在 save / bulk_create / bulk_update 时自动维护，不应该直接修改
+    search_key = models.CharField("搜索关键字", max_length=600, blank=True, default="")
+
+    objects = DataSourceUserManager()
+
+    # 搜索关键字的来源字段
+    search_key_source_fields = ["username", "full_name", "email", "phone"]
+    # 搜索关键字中各字段的分隔符（不会出现在关键字中，避免跨字段匹配）
+    search_key_separator = "\n"
+
     class Meta:
         ordering = ["id"]
         unique_together = [
             ("code", "data_source"),
             ("username", "data_source"),
         ]
+        indexes = [
+            models.Index(fields=["data_source", "search_key"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.refresh_search_key()
+        # 若只更新部分字段，且包含搜索关键字的来源字段，则搜索关键字也需要一并更新
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.search_key_source_fields):
+            kwargs["update_fields"] = [*update_fields, "search_key"]
+
+        super().save(*args, **kwargs)
+
+        # 若保存的字段包含模糊搜索 gram 的来源字段，则 gram 也需要重建
+        if update_fields is None or set(update_fields) & set(DataSourceUserLookupGram.source_fields):
+            DataSourceUserLookupGram.rebuild_grams({self.pk: self})
+
+    def refresh_search_key(self) -> None:
+        """根据来源字段刷新搜索关键字"""
+        self.search_key = self.build_search_key(*[getattr(self, field) for field in self.search_key_source_fields])
+
+    @classmethod
+    def build_search_key(cls, *values: Optional[str]) -> str:
+        return cls.search_key_separator.join((v or "").lower() for v in values)
+
+
+class DataSourceUserLookupGram(models.Model):
+    """
+    数据源用户模糊搜索 gram，由 full_name / email / phone 归一化后切分而来，用于加速模糊查询
+
+    Q: 为什么需要该表？
+    A: 模糊查询（icontains）会被转换为 LIKE '%xxx%'，前导通配符导致无法使用索引，只能全表扫描，
+       而 gram 的前缀 / 等值匹配可以走 (field, gram, user) 索引，快速圈定候选用户后再复核原始条件
+
+    注：该表在 DataSourceUser save / bulk_create / bulk_update 时自动维护，不应该直接修改
+    """
+
+    user = models.ForeignKey(
+        DataSourceUser, on_delete=models.CASCADE, db_constraint=False, related_name="lookup_grams"
+    )
+    field = models.CharField("字段名称", max_length=32)
+    gram = models.CharField("gram", max_length=NGRAM_SIZE)
+
+    # 切分 gram 的来源字段
+    source_fields = ["full_name", "email", "phone"]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["field", "gram", "user"]),
+        ]
+
+    @classmethod
+    def create_grams(cls, users: Dict[int, DataSourceUser]) -> None:
+        """为指定的数据源用户创建 gram，users 格式为 {user_id: user}"""
+        grams: List[DataSourceUserLookupGram] = [
+            cls(user_id=user_id, field=field, gram=gram)
+            for user_id, user in users.items()
+            for field in cls.source_fields
+            for gram in split_ngrams(getattr(user, field))
+        ]
+        cls.objects.bulk_create(grams, batch_size=1000)
+
+    @classmethod
+    def rebuild_grams(cls, users: Dict[int, DataSourceUser]) -> None:
+        """重建指定数据源用户的 gram，users 格式为 {user_id: user}"""
+        for user_ids in chunked(users.keys(), 1000):
+            cls.objects.filter(user_id__in=user_ids).delete()
+
+        cls.create_grams(users)
 
 
 class LocalDataSourceIdentityInfo(TimestampedModel):
@@ -14,18 +14,78 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+import hashlib
+import json
 import logging
-from typing import Dict
+from typing import Callable, Dict, Generator, List
 
-from bkuser.apps.data_source.constants import USER_EXTRAS_UPDATE_BATCH_SIZE
+from django.db import DatabaseError, transaction
+
+from bkuser.apps.data_source.constants import (
+    USER_EXTRAS_MIGRATION_CHECKPOINT_TIMEOUT,
+    USER_EXTRAS_MIGRATION_MAX_RETRIES,
+    USER_EXTRAS_UPDATE_BATCH_SIZE,
+)
 from bkuser.apps.data_source.models import DataSource, DataSourceUser
 from bkuser.celery import app
+from bkuser.common.cache import Cache, CacheEnum, CacheKeyPrefixEnum
 from bkuser.common.task import BaseTask
 from bkuser.plugins.constants import DataSourcePluginEnum
 
 logger = logging.getLogger(__name__)
 
 
+class UserExtrasMigrator:
+    """
+    数据源用户 Extras 数据迁移器
+
+    按主键顺序分批处理用户，每批单独提交事务并记录进度（最后处理的用户 ID），
+    任务失败重试时，将从上次记录的进度继续，不会重复处理已完成的批次
+
+    Note: 进度以任务 ID（celery 重试时任务 ID 不变）区分，重试耗尽后再次下发的同样操作是新的任务，
+          会从头开始处理，避免沿用过期的进度而跳过部分用户
+    """
+
+    def __init__(self, tenant_id: str, field_name: str, scene: str, task_id: str | None):
+        self.tenant_id = tenant_id
+        self.field_name = field_name
+        self.checkpoint_key = f"{scene}:{tenant_id}:{field_name}:{task_id}"
+        self.cache = Cache(CacheEnum.REDIS, CacheKeyPrefixEnum.USER_EXTRAS_MIGRATION_CHECKPOINT)
+
+    def migrate(self, handle_user: Callable[[DataSourceUser], None]):
+        """对租户下所有 Extras 中存在指定字段的数据源用户执行 handle_user 并保存"""
+        for users in self._iter_user_chunks(self.cache.get(self.checkpoint_key, 0)):
+            for u in users:
+                handle_user(u)
+
+            with transaction.atomic():
+                DataSourceUser.objects.bulk_update(users, fields=["extras", "updated_at"])
+
+            # Q: 为什么进度记录不和数据变更在同一个事务中？
+            # A: 进度记录在 Redis 中，无法与 DB 事务保证原子性，仅在批次提交后、记录进度前
+            #    出现异常的极端情况下，会重复处理单个批次
+            self.cache.set(self.checkpoint_key, users[-1].id, timeout=USER_EXTRAS_MIGRATION_CHECKPOINT_TIMEOUT)
+
+        # 全部处理完成，清理进度记录
+        self.cache.delete(self.checkpoint_key)
+
+    def _iter_user_chunks(self, start_user_id: int) -> Generator[List[DataSourceUser], None, None]:
+        """按主键顺序分批获取需要处理的数据源用户"""
+        queryset = DataSourceUser.objects.filter(
+            data_source__owner_tenant_id=self.tenant_id,
+            extras__has_key=self.field_name,
+        ).order_by("id")
+
+        last_user_id = start_user_id
+        while True:
+            users = list(queryset.filter(id__gt=last_user_id)[:USER_EXTRAS_UPDATE_BATCH_SIZE])
+            if not users:
+                return
+
+            yield users
+            last_user_id = users[-1].id
+
+
 @app.task(base=BaseTask, ignore_result=True)
 def remove_dropped_field_in_data_source_field_mapping(tenant_id: str, field_name: str):
     """删除租户某个用户自定义字段后，需要将各数据源的 FieldMapping 中的该字段一并清除"""
@@ -36,23 +96,30 @@ def remove_dropped_field_in_data_source_field_mapping(tenant_id: str, field_name
     DataSource.objects.bulk_update(data_sources, fields=["field_mapping", "updated_at"])
 
 
-@app.task(base=BaseTask, ignore_result=True)
-def remove_dropped_field_in_user_extras(tenant_id: str, field_name: str):
+@app.task(
+    base=BaseTask,
+    bind=True,
+    ignore_result=True,
+    autoretry_for=(DatabaseError,),
+    max_retries=USER_EXTRAS_MIGRATION_MAX_RETRIES,
+    retry_backoff=True,
+)
+def remove_dropped_field_in_user_extras(self, tenant_id: str, field_name: str):
     """删除租户某个用户自定义字段后，会将数据源用户 Extras 中的数据也一并清除"""
-    users = DataSourceUser.objects.filter(
-        data_source__owner_tenant_id=tenant_id,
-        extras__has_key=field_name,
-    )
-    for u in users:
-        u.extras.pop(field_name)
-
-    DataSourceUser.objects.bulk_update(
-        users, fields=["extras", "updated_at"], batch_size=USER_EXTRAS_UPDATE_BATCH_SIZE
+    UserExtrasMigrator(tenant_id, field_name, scene="remove", task_id=self.request.id).migrate(
+        lambda u: u.extras.pop(field_name, None)
     )
 
 
-@app.task(base=BaseTask, ignore_result=True)
-def migrate_user_extras_with_mapping(tenant_id: str, field_name: str, mapping: Dict):
+@app.task(
+    base=BaseTask,
+    bind=True,
+    ignore_result=True,
+    autoretry_for=(DatabaseError,),
+    max_retries=USER_EXTRAS_MIGRATION_MAX_RETRIES,
+    retry_backoff=True,
+)
+def migrate_user_extras_with_mapping(self, tenant_id: str, field_name: str, mapping: Dict):
     """
     更新租户用户自定义字段后，可能需要处理存量的数据
 
@@ -63,11 +130,7 @@ def migrate_user_extras_with_mapping(tenant_id: str, field_name: str, mapping: D
     if not mapping:
         return
 
-    users = DataSourceUser.objects.filter(
-        data_source__owner_tenant_id=tenant_id,
-        extras__has_key=field_name,
-    )
-    for u in users:
+    def _migrate(u: DataSourceUser):
         value = u.extras[field_name]
         if isinstance(value, list):
             # 先 set 后 list，避免出现映射后重复的情况
@@ -75,6 +138,10 @@ def migrate_user_extras_with_mapping(tenant_id: str, field_name: str, mapping: D
         elif isinstance(value, str):
             u.extras[field_name] = mapping.get(value, value)
 
-    DataSourceUser.objects.bulk_update(
-        users, fields=["extras", "updated_at"], batch_size=USER_EXTRAS_UPDATE_BATCH_SIZE
+    # 注：映射不是幂等的（如 a -> b, b -> c），因此进度需要区分不同的映射，且已完成的批次不能重复处理
+    mapping_digest = hashlib.md5(
+        json.dumps(mapping, sort_keys=True).encode("utf-8"), usedforsecurity=False
+    ).hexdigest()
+    UserExtrasMigrator(tenant_id, field_name, scene=f"mapping:{mapping_digest}", task_id=self.request.id).migrate(
+        _migrate
     )
@@ -36,3 +36,17 @@ class NotificationScene(StrStructuredEnum):
     SEND_VERIFICATION_CODE = EnumField("send_verification_code", label=_("发送验证码"))
     TENANT_USER_EXPIRING = EnumField("tenant_user_expiring", label=_("租户用户即将过期"))
     TENANT_USER_EXPIRED = EnumField("tenant_user_expired", label=_("租户用户已过期"))
+
+
+# 定时批量通知时，每个分片任务负责的接收者数量
+NOTIFICATION_SHARD_SIZE = 1000
+
+# 定时批量通知时，分片任务的最大延迟执行时间（秒）
+# 注：需要小于 Celery Redis Broker 的 visibility_timeout（默认 1 小时），否则任务会被重复投递，导致重复通知
+NOTIFICATION_SHARD_MAX_COUNTDOWN = 30 * 60
+
+# 批量发送通知时，每批次处理的用户数量（预取上下文数据 & 渲染模板）
+NOTIFICATION_BATCH_SIZE = 500
+
+# 批量发送通知时，内容完全相同的短信通知会合并发送，单次调用的最大接收者数量（邮件会暴露接收者，不合并）
+NOTIFICATION_MAX_RECEIVERS_PER_SEND = 100
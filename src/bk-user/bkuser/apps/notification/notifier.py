@@ -15,20 +15,28 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 import logging
-from typing import Dict, List
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
 
+from django.db.models import QuerySet
 from django.template import Context, Template
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from bkuser import settings
 from bkuser.apps.data_source.models import DataSource, LocalDataSourceIdentityInfo
-from bkuser.apps.notification.constants import NotificationMethod, NotificationScene
+from bkuser.apps.notification.constants import (
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_MAX_RECEIVERS_PER_SEND,
+    NotificationMethod,
+    NotificationScene,
+)
 from bkuser.apps.notification.data_models import NotificationTemplate
 from bkuser.apps.notification.helpers import gen_reset_password_url
 from bkuser.apps.tenant.models import TenantUser, TenantUserValidityPeriodConfig
 from bkuser.component import cmsi
 from bkuser.plugins.local.models import LocalDataSourcePluginConfig
+from bkuser.utils.std_iter import chunked
 
 logger = logging.getLogger(__name__)
 
@@ -217,8 +225,13 @@ class TmplContextGenerator:
 
     def _gen_passwd_expiring_ctx(self) -> Dict[str, str]:
         """密码即将过期"""
-        identify_info = LocalDataSourceIdentityInfo.objects.get(user_id=self.user.data_source_user_id)
-        valid_time = identify_info.password_expired_at - timezone.now()
+        # 批量发送时，密码过期时间会被预先批量查询好，无需逐个用户查询
+        password_expired_at = self.scene_kwargs.get("password_expired_at")
+        if password_expired_at is None:
+            identify_info = LocalDataSourceIdentityInfo.objects.get(user_id=self.user.data_source_user_id)
+            password_expired_at = identify_info.password_expired_at
+
+        valid_time = password_expired_at - timezone.now()
         return {
             "valid_days": str(valid_time.days + 1),
             **self._gen_base_ctx(),
@@ -267,32 +280,72 @@ class TenantUserNotifier:
         """
         self.scene = scene
         self.templates = NotificationTmplsGetter().get(scene, **scene_kwargs)
+        # 同一场景下的模板是固定的，编译结果按模板内容缓存，避免逐个用户重复编译
+        self._compiled_tmpls: Dict[str, Template] = {}
 
-    def batch_send(self, users: List[TenantUser], **kwargs) -> None:
+    def batch_send(self, users: Iterable[TenantUser], **kwargs) -> None:
         """
         批量发送通知
 
         :param users: 租户用户列表
         :param user_passwd_map: {数据源用户ID: 密码} 映射表，密码初始化/重置场景必须
         """
-        for u in users:
-            try:
-                self.send(u, **self._gen_scene_kwargs(u, **kwargs))
-            except Exception:  # noqa: PERF203
-                logger.exception("send notification to user %s, scene %s failed", u.id, self.scene)
+        if isinstance(users, QuerySet):
+            # Q：为什么使用 iterator 而不是直接遍历 QuerySet？
+            # A：定时任务中可能涉及数万用户，直接遍历会把所有用户缓存在 QuerySet 中，
+            #    这里按批次流式读取，同时通过 select_related 避免渲染模板时逐个查询数据源用户
+            users = users.select_related("data_source_user").iterator(chunk_size=NOTIFICATION_BATCH_SIZE)
+
+        for batch_users in chunked(users, NOTIFICATION_BATCH_SIZE):
+            self._batch_send(batch_users, **kwargs)
 
     def send(self, user: TenantUser, **scene_kwargs) -> None:
+        ctx = TmplContextGenerator(user=user, scene=self.scene, **scene_kwargs).gen()
         for tmpl in self.templates:
-            content = self._render_tmpl(user, tmpl.content, **scene_kwargs)
-            if tmpl.method == NotificationMethod.EMAIL:
-                cmsi.send_mail(user.id, tmpl.sender, tmpl.title, content)  # type: ignore
+            content = self._get_compiled_tmpl(tmpl.content).render(Context(ctx))
+            self._dispatch(tmpl, user.id, content)
 
-            elif tmpl.method == NotificationMethod.SMS:
-                cmsi.send_sms(user.id, content)
+    def _batch_send(self, users: List[TenantUser], **kwargs) -> None:
+        """对一批用户渲染模板，并将内容完全相同的短信通知合并发送"""
+        kwargs.update(self._prefetch_scene_kwargs(users))
 
-            logger.info("send %s to user %s, scene %s", tmpl.method.value, user.id, self.scene)
+        # {(模板下标, 渲染后的内容): [租户用户 ID]}
+        grouped_receivers: Dict[Tuple[int, str], List[str]] = defaultdict(list)
+        for u in users:
+            try:
+                ctx = TmplContextGenerator(user=u, scene=self.scene, **self._gen_scene_kwargs(u, **kwargs)).gen()
+                for idx, tmpl in enumerate(self.templates):
+                    content = self._get_compiled_tmpl(tmpl.content).render(Context(ctx))
+                    grouped_receivers[(idx, content)].append(u.id)
+            except Exception:  # noqa: PERF203
+                logger.exception("render notification for user %s, scene %s failed", u.id, self.scene)
+
+        # Q：为什么要合并发送？
+        # A：部分模板（如不包含用户名等个人信息的模板）对不同用户的渲染结果是一致的，
+        #    cmsi 支持单次向多个接收者（逗号分隔）发送，合并后可以大幅减少 API 调用次数
+        # Q：为什么邮件不合并发送？
+        # A：合并发送的邮件，所有接收者都可以看到其他接收者的邮箱地址，因此邮件仍需逐个用户发送，
+        #    只有不暴露接收者的渠道（如短信）才会合并
+        for (idx, content), user_ids in grouped_receivers.items():
+            tmpl = self.templates[idx]
+            max_receivers = NOTIFICATION_MAX_RECEIVERS_PER_SEND if tmpl.method == NotificationMethod.SMS else 1
+            for receivers in chunked(user_ids, max_receivers):
+                try:
+                    self._dispatch(tmpl, ",".join(receivers), content)
+                except Exception:  # noqa: PERF203
+                    logger.exception("send notification to users %s, scene %s failed", receivers, self.scene)
+
+    def _prefetch_scene_kwargs(self, users: List[TenantUser]) -> Dict[str, Any]:
+        """批量预取渲染模板上下文所需的数据，确保每批次的查询次数为常数"""
+        if self.scene == NotificationScene.PASSWORD_EXPIRING:
+            identity_infos = LocalDataSourceIdentityInfo.objects.filter(
+                user_id__in=[u.data_source_user_id for u in users]
+            ).values_list("user_id", "password_expired_at")
+            return {"user_passwd_expired_at_map": dict(identity_infos)}
 
-    def _gen_scene_kwargs(self, user, **kwargs) -> Dict[str, str]:
+        return {}
+
+    def _gen_scene_kwargs(self, user, **kwargs) -> Dict[str, Any]:
         if self.scene in [
             NotificationScene.USER_INITIALIZE,
             NotificationScene.MANAGER_RESET_PASSWORD,
@@ -302,8 +355,23 @@ class TenantUserNotifier:
 
             return {"passwd": kwargs["user_passwd_map"][user.data_source_user.id]}
 
+        if self.scene == NotificationScene.PASSWORD_EXPIRING:
+            return {"password_expired_at": kwargs["user_passwd_expired_at_map"][user.data_source_user_id]}
+
         return {}
 
-    def _render_tmpl(self, user: TenantUser, tmpl_content: str, **scene_kwargs) -> str:
-        ctx = TmplContextGenerator(user=user, scene=self.scene, **scene_kwargs).gen()
-        return Template(tmpl_content).render(Context(ctx))
+    def _dispatch(self, tmpl: NotificationTemplate, receivers: str, content: str) -> None:
+        """调用 cmsi 发送通知，receivers 为租户用户 ID，多个以逗号分隔"""
+        if tmpl.method == NotificationMethod.EMAIL:
+            cmsi.send_mail(receivers, tmpl.sender, tmpl.title, content)  # type: ignore
+
+        elif tmpl.method == NotificationMethod.SMS:
+            cmsi.send_sms(receivers, content)
+
+        logger.info("send %s to users %s, scene %s", tmpl.method.value, receivers, self.scene)
+
+    def _get_compiled_tmpl(self, tmpl_content: str) -> Template:
+        if tmpl_content not in self._compiled_tmpls:
+            self._compiled_tmpls[tmpl_content] = Template(tmpl_content)
+
+        return self._compiled_tmpls[tmpl_content]
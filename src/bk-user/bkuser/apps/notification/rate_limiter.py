@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import time
+
+from bkuser.common.cache import Cache, CacheEnum, CacheKeyPrefixEnum
+
+
+class NotificationRateLimiter:
+    """
+    批量通知发送速率限制器（固定窗口，窗口大小为 1 秒）
+
+    基于 Redis 计数，所有 worker 中的分片任务共享同一个速率上限，确保整体的发送速率不超过上限
+    """
+
+    # 计数 Key 的过期时间（秒），只需要覆盖当前窗口即可
+    counter_timeout = 5
+
+    def __init__(self, rate_limit: int):
+        """
+        :param rate_limit: 每秒最多发送的接收者数量，小于等于 0 表示不限速
+        """
+        self.rate_limit = rate_limit
+        self.cache = Cache(CacheEnum.REDIS, CacheKeyPrefixEnum.NOTIFICATION_RATE_LIMIT)
+
+    def acquire(self, count: int) -> float:
+        """
+        尝试在当前窗口中获取指定数量接收者的发送配额
+
+        :param count: 接收者数量，需要不超过 rate_limit
+        :return: 获取成功返回 0，否则返回需要等待的时间（秒），即到下一个窗口的时间
+        """
+        if self.rate_limit <= 0:
+            return 0
+
+        now = time.time()
+        key = str(int(now))
+        self.cache.add(key, 0, timeout=self.counter_timeout)
+        if self.cache.incr(key, count) <= self.rate_limit:
+            return 0
+
+        # 超出上限，归还配额，等待下一个窗口
+        self.cache.decr(key, count)
+        return int(now) + 1 - now
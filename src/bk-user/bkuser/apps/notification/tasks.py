@@ -18,17 +18,25 @@ import logging
 import operator
 from datetime import timedelta
 from functools import reduce
+from typing import List
 
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Q, QuerySet
 
 from bkuser.apps.data_source.models import DataSource, DataSourceUser, LocalDataSourceIdentityInfo
-from bkuser.apps.notification.constants import NotificationScene
+from bkuser.apps.notification.constants import (
+    NOTIFICATION_SHARD_MAX_COUNTDOWN,
+    NOTIFICATION_SHARD_SIZE,
+    NotificationScene,
+)
 from bkuser.apps.notification.notifier import TenantUserNotifier
+from bkuser.apps.notification.rate_limiter import NotificationRateLimiter
 from bkuser.apps.tenant.constants import TenantStatus
 from bkuser.apps.tenant.models import Tenant, TenantUser, TenantUserValidityPeriodConfig
 from bkuser.celery import app
 from bkuser.common.task import BaseTask
 from bkuser.plugins.constants import DataSourcePluginEnum
+from bkuser.utils.std_iter import chunked
 from bkuser.utils.time import get_midnight
 
 logger = logging.getLogger(__name__)
@@ -44,6 +52,61 @@ def send_reset_password_to_user(data_source_user_id: int, new_password: str):
     TenantUserNotifier(NotificationScene.MANAGER_RESET_PASSWORD).send(tenant_user, passwd=new_password)
 
 
+@app.task(base=BaseTask, ignore_result=True)
+def notify_tenant_users_shard(scene: str, tenant_user_ids: List[str], **scene_kwargs):
+    """
+    对某个分片内的租户用户发送通知
+
+    分片内的接收者按速率上限分批发送，每批发送前需要从限速器获取配额，获取失败时，
+    剩余的接收者会作为新的分片任务，在下一个限速窗口再发送，不会长时间阻塞 worker
+    """
+    logger.info("[celery] receive task: notify_tenant_users_shard, scene %s, %d users", scene, len(tenant_user_ids))
+
+    limiter = NotificationRateLimiter(settings.NOTIFICATION_SEND_RATE_LIMIT)
+    # 不限速时，整个分片作为一批发送
+    batch_size = limiter.rate_limit if limiter.rate_limit > 0 else len(tenant_user_ids)
+    notifier = TenantUserNotifier(NotificationScene(scene), **scene_kwargs)
+
+    for start in range(0, len(tenant_user_ids), batch_size):
+        batch_user_ids = tenant_user_ids[start : start + batch_size]
+        if wait_seconds := limiter.acquire(len(batch_user_ids)):
+            notify_tenant_users_shard.apply_async(
+                args=(scene, tenant_user_ids[start:]), kwargs=scene_kwargs, countdown=wait_seconds
+            )
+            return
+
+        notifier.batch_send(TenantUser.objects.filter(id__in=batch_user_ids))
+
+
+def _dispatch_notify_shards(scene: NotificationScene, tenant_users: QuerySet[TenantUser], **scene_kwargs) -> int:
+    """
+    将接收者切分为固定大小的分片，每个分片由独立的任务发送通知，返回分片数量
+
+    Q：为什么要切分分片？
+    A：单个数据源 / 租户的接收者可能多达数万，若在同一个任务中发送，会长时间占用 worker，
+       切分后可以由多个 worker 并行处理，实际的发送速率由分片任务中的限速器（全局共享）控制
+
+    :param scene: 通知场景
+    :param tenant_users: 需要通知的租户用户
+    :param scene_kwargs: 获取通知模板所需的参数，如 data_source_id / tenant_id
+    """
+    rate_limit = settings.NOTIFICATION_SEND_RATE_LIMIT
+
+    shard_count = 0
+    tenant_user_ids = tenant_users.order_by("id").values_list("id", flat=True).iterator()
+    for idx, shard in enumerate(chunked(tenant_user_ids, NOTIFICATION_SHARD_SIZE)):
+        # 按发送速率上限错开分片任务的执行时间，避免大量分片任务同时等待限速配额；
+        # 延迟时间需要有上限，超过 Broker 的 visibility_timeout 会导致任务被重复投递
+        countdown = (
+            min(idx * NOTIFICATION_SHARD_SIZE / rate_limit, NOTIFICATION_SHARD_MAX_COUNTDOWN) if rate_limit > 0 else 0
+        )
+        notify_tenant_users_shard.apply_async(args=(scene.value, shard), kwargs=scene_kwargs, countdown=countdown)
+        shard_count += 1
+
+    logger.info("dispatch %d shard tasks for scene %s, scene kwargs %s", shard_count, scene, scene_kwargs)
+    return shard_count
+
+
 @app.task(base=BaseTask, ignore_result=True)
 def notify_password_expiring_users(data_source_id: int):
     """对密码即将过期的用户发送通知"""
@@ -75,7 +138,7 @@ def notify_password_expiring_users(data_source_id: int):
     logger.info(
         "data source %s send password expiring notification to %d users...", data_source_id, tenant_users.count()
     )
-    TenantUserNotifier(NotificationScene.PASSWORD_EXPIRING, data_source_id=data_source_id).batch_send(tenant_users)
+    _dispatch_notify_shards(NotificationScene.PASSWORD_EXPIRING, tenant_users, data_source_id=data_source_id)
 
 
 @app.task(base=BaseTask, ignore_result=True)
@@ -113,7 +176,7 @@ def notify_password_expired_users(data_source_id: int):
     logger.info(
         "data source %s send password expired notification to %d users...", data_source_id, tenant_users.count()
     )
-    TenantUserNotifier(NotificationScene.PASSWORD_EXPIRED, data_source_id=data_source_id).batch_send(tenant_users)
+    _dispatch_notify_shards(NotificationScene.PASSWORD_EXPIRED, tenant_users, data_source_id=data_source_id)
 
 
 @app.task(base=BaseTask, ignore_result=True)
@@ -159,7 +222,7 @@ def notify_expiring_tenant_users(tenant_id: str):
         return
 
     logger.info("tenant %s send expiring notification to %d users...", tenant_id, tenant_users.count())
-    TenantUserNotifier(NotificationScene.TENANT_USER_EXPIRING, tenant_id=tenant_id).batch_send(tenant_users)
+    _dispatch_notify_shards(NotificationScene.TENANT_USER_EXPIRING, tenant_users, tenant_id=tenant_id)
 
 
 @app.task(base=BaseTask, ignore_result=True)
@@ -193,7 +256,7 @@ def notify_expired_tenant_users(tenant_id: str):
         return
 
     logger.info("tenant %s send expired notification to %d users...", tenant_id, tenant_users.count())
-    TenantUserNotifier(NotificationScene.TENANT_USER_EXPIRED, tenant_id=tenant_id).batch_send(tenant_users)
+    _dispatch_notify_shards(NotificationScene.TENANT_USER_EXPIRED, tenant_users, tenant_id=tenant_id)
 
 
 @app.task(base=BaseTask, ignore_result=True)
@@ -24,6 +24,15 @@ from bkuser.plugins.local.constants import USERNAME_REGEX as DATA_SOURCE_USERNAM
 
 EMAIL_REGEX = re.compile(r"^[\w.-]+@[\w.-]+\.[A-Za-z]{2,6}$")
 
+# 同步日志缓冲区达到该长度（字符数）时，会被写入 DB 并清空缓冲区
+SYNC_LOG_FLUSH_THRESHOLD = 64 * 1024
+# 单个同步任务的日志长度上限（字符数），超过后只会继续记录 ERROR 级别日志
+SYNC_LOG_MAX_SIZE = 8 * 1024 * 1024
+# 同步日志超过长度上限时，追加的截断标记
+SYNC_LOG_TRUNCATED_MARKER = (
+    "WARNING logs exceed the max size limit, subsequent INFO / WARNING logs are truncated...\n\n"
+)
+
 
 class DataSourceSyncPeriod(IntStructuredEnum):
     """数据源自动同步周期"""
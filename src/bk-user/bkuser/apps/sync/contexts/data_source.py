@@ -19,10 +19,11 @@
 # ruff: noqa: G003, G004
 import logging
 import traceback
-from typing import List
+from typing import List, Tuple
 
 from celery.exceptions import SoftTimeLimitExceeded
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from bkuser.apps.data_source.models import DataSourceDepartment, DataSourceUser
@@ -30,8 +31,13 @@ from bkuser.apps.sync.constants import DataSourceSyncObjectType, SyncOperation,
 from bkuser.apps.sync.exceptions import DataSourceSyncInterrupted
 from bkuser.apps.sync.locks import DataSourceSyncTaskLock
 from bkuser.apps.sync.loggers import TaskLogger
-from bkuser.apps.sync.models import DataSourceDepartmentChangeLog, DataSourceSyncTask, DataSourceUserChangeLog
-from bkuser.apps.sync.recorders import ChangeLogRecorder
+from bkuser.apps.sync.models import (
+    DataSourceDepartmentChangeLog,
+    DataSourceSyncTask,
+    DataSourceSyncTaskLog,
+    DataSourceUserChangeLog,
+)
+from bkuser.apps.sync.recorders import ChangeLogRecorder, fill_created_record_ids
 
 logger = logging.getLogger(__name__)
 
@@ -43,8 +49,11 @@ class DataSourceSyncTaskContext:
 
     def __init__(self, task: DataSourceSyncTask):
         self.task = task
-        self.logger = TaskLogger()
-        self.recorder = ChangeLogRecorder()
+        # 同步日志会分批写入 DB，而不是在同步结束后一次性写入
+        self.logger = TaskLogger(flush_func=self._flush_logs)
+        self._log_seq = 0
+        # 变更记录会按批次写入 DB，而不是在同步结束后一次性写入
+        self.recorder = ChangeLogRecorder(flush_func=self._store_records_into_db)
         self.synced_obj_types: set[DataSourceSyncObjectType] = set()
 
         timeout = task.extras.get("timeout", settings.DATA_SOURCE_SYNC_DEFAULT_TIMEOUT)
@@ -76,7 +85,7 @@ class DataSourceSyncTaskContext:
         if exc_type is None:
             self.logger.info("data source sync task success!")
             self._update_task(SyncTaskStatus.SUCCESS)
-            self._store_records_into_db()
+            self.recorder.flush()
             self._store_logs_into_db()
             return
 
@@ -90,6 +99,8 @@ class DataSourceSyncTaskContext:
             + f"Exception: {''.join(traceback.format_exception(exc_type, exc_val, exc_tb))}"
         )
         self._update_task(SyncTaskStatus.FAILED)
+        # 变更记录都是在对应的数据变更提交后才添加的，因此即使任务失败，也需要记录下来
+        self.recorder.flush()
         self._store_logs_into_db()
 
     def _update_task(self, status: SyncTaskStatus):
@@ -105,83 +116,75 @@ class DataSourceSyncTaskContext:
 
         self.task.save(update_fields=update_fields)
 
-    def _store_records_into_db(self):
-        """将变更记录存入数据库"""
-        # 用户变更记录
-        if created_users := self.recorder.get(SyncOperation.CREATE, DataSourceSyncObjectType.USER):
-            DataSourceUserChangeLog.objects.bulk_create(
-                self._build_user_change_logs(SyncOperation.CREATE, created_users), batch_size=self.batch_size
-            )
+    def _store_records_into_db(
+        self, operation: SyncOperation, type: DataSourceSyncObjectType, records: List[Tuple]
+    ) -> None:
+        """将一批变更记录存入数据库"""
+        data_source = self.task.data_source
 
-        if deleted_users := self.recorder.get(SyncOperation.DELETE, DataSourceSyncObjectType.USER):
-            DataSourceUserChangeLog.objects.bulk_create(
-                self._build_user_change_logs(SyncOperation.DELETE, deleted_users), batch_size=self.batch_size
-            )
+        # 用户变更记录
+        if type == DataSourceSyncObjectType.USER:
+            if operation == SyncOperation.CREATE:
+                records = fill_created_record_ids(
+                    DataSourceUser.objects.filter(data_source=data_source), "code", records
+                )
 
-        if updated_users := self.recorder.get(SyncOperation.UPDATE, DataSourceSyncObjectType.USER):
             DataSourceUserChangeLog.objects.bulk_create(
-                self._build_user_change_logs(SyncOperation.UPDATE, updated_users), batch_size=self.batch_size
+                [
+                    DataSourceUserChangeLog(
+                        task=self.task,
+                        data_source=data_source,
+                        operation=operation,
+                        user_id=user_id,
+                        user_code=code,
+                        username=username,
+                        full_name=full_name,
+                    )
+                    for user_id, code, username, full_name in records
+                ],
+                batch_size=self.batch_size,
             )
 
         # 部门变更记录
-        if created_depts := self.recorder.get(SyncOperation.CREATE, DataSourceSyncObjectType.DEPARTMENT):
-            DataSourceDepartmentChangeLog.objects.bulk_create(
-                self._build_dept_change_logs(SyncOperation.CREATE, created_depts), batch_size=self.batch_size
-            )
+        elif type == DataSourceSyncObjectType.DEPARTMENT:
+            if operation == SyncOperation.CREATE:
+                records = fill_created_record_ids(
+                    DataSourceDepartment.objects.filter(data_source=data_source), "code", records
+                )
 
-        if deleted_depts := self.recorder.get(SyncOperation.DELETE, DataSourceSyncObjectType.DEPARTMENT):
             DataSourceDepartmentChangeLog.objects.bulk_create(
-                self._build_dept_change_logs(SyncOperation.DELETE, deleted_depts), batch_size=self.batch_size
+                [
+                    DataSourceDepartmentChangeLog(
+                        task=self.task,
+                        data_source=data_source,
+                        operation=operation,
+                        department_id=dept_id,
+                        department_code=code,
+                        department_name=name,
+                    )
+                    for dept_id, code, name in records
+                ],
+                batch_size=self.batch_size,
             )
 
-        if updated_depts := self.recorder.get(SyncOperation.UPDATE, DataSourceSyncObjectType.DEPARTMENT):
-            DataSourceDepartmentChangeLog.objects.bulk_create(
-                self._build_dept_change_logs(SyncOperation.UPDATE, updated_depts), batch_size=self.batch_size
-            )
+    def _flush_logs(self, logs: str) -> bool:
+        """同步过程中，将缓冲区中的日志写入 DB"""
+        # Q：为什么在事务中不写入日志？
+        # A：同步的部分步骤是在事务中执行的，若事务回滚，事务中写入的日志也会一起被回滚，
+        #    因此在事务中不写入，日志继续保留在缓冲区中，等事务结束后再写入
+        if transaction.get_connection().in_atomic_block:
+            return False
 
-    def _build_user_change_logs(
-        self, operation: SyncOperation, users: List[DataSourceUser]
-    ) -> List[DataSourceUserChangeLog]:
-        if operation == SyncOperation.CREATE:
-            # 由于 bulk_create 不会返回 id，因此当 operation 为 create 时候，需要通过查询获取真实的 ID
-            users = DataSourceUser.objects.filter(code__in=[u.code for u in users], data_source=self.task.data_source)
-
-        return [
-            DataSourceUserChangeLog(
-                task=self.task,
-                data_source=self.task.data_source,
-                operation=operation,
-                user_id=u.id,
-                user_code=u.code,
-                username=u.username,
-                full_name=u.full_name,
-            )
-            for u in users
-        ]
-
-    def _build_dept_change_logs(
-        self, operation: SyncOperation, depts: List[DataSourceDepartment]
-    ) -> List[DataSourceDepartmentChangeLog]:
-        if operation == SyncOperation.CREATE:
-            # 由于 bulk_create 不会返回 id，因此当 operation 为 create 时候，需要通过查询获取真实的 ID
-            depts = DataSourceDepartment.objects.filter(
-                code__in=[d.code for d in depts], data_source=self.task.data_source
-            )
+        self._save_log_chunk(logs)
+        return True
 
-        return [
-            DataSourceDepartmentChangeLog(
-                task=self.task,
-                data_source=self.task.data_source,
-                operation=operation,
-                department_id=d.id,
-                department_code=d.code,
-                department_name=d.name,
-            )
-            for d in depts
-        ]
+    def _save_log_chunk(self, logs: str):
+        if not logs:
+            return
+
+        DataSourceSyncTaskLog.objects.create(task=self.task, seq=self._log_seq, content=logs)
+        self._log_seq += 1
 
     def _store_logs_into_db(self):
-        """将步骤日志存入数据库"""
-        sync_task_logs = self.logger.logs.strip()
-        self.task.logs = sync_task_logs
-        self.task.save(update_fields=["logs", "updated_at"])
+        """将缓冲区中剩余的步骤日志存入数据库"""
+        self._save_log_chunk(self.logger.drain())
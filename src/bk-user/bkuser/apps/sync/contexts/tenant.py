@@ -19,7 +19,7 @@
 # ruff: noqa: G003, G004
 import logging
 import traceback
-from typing import List
+from typing import List, Tuple
 
 from celery.exceptions import SoftTimeLimitExceeded
 from django.utils import timezone
@@ -29,8 +29,8 @@ from bkuser.apps.sync.exceptions import TenantSyncInterrupted
 from bkuser.apps.sync.locks import TenantSyncTaskLock
 from bkuser.apps.sync.loggers import TaskLogger
 from bkuser.apps.sync.models import TenantDepartmentChangeLog, TenantSyncTask, TenantUserChangeLog
-from bkuser.apps.sync.recorders import ChangeLogRecorder
-from bkuser.apps.tenant.models import TenantDepartment, TenantUser
+from bkuser.apps.sync.recorders import ChangeLogRecorder, fill_created_record_ids
+from bkuser.apps.tenant.models import TenantDepartment
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +43,8 @@ class TenantSyncTaskContext:
     def __init__(self, task: TenantSyncTask):
         self.task = task
         self.logger = TaskLogger()
-        self.recorder = ChangeLogRecorder()
+        # 变更记录会按批次写入 DB，而不是在同步结束后一次性写入
+        self.recorder = ChangeLogRecorder(flush_func=self._store_records_into_db)
         self.lock = TenantSyncTaskLock(task.tenant_id, task.data_source_id)
 
     def __enter__(self):
@@ -75,7 +76,7 @@ class TenantSyncTaskContext:
         if exc_type is None:
             self.logger.info("tenant sync task success!")
             self._update_task(SyncTaskStatus.SUCCESS)
-            self._store_records_into_db()
+            self.recorder.flush()
             self._store_logs_into_db()
             return
 
@@ -88,6 +89,8 @@ class TenantSyncTaskContext:
             f"Exception: {''.join(traceback.format_exception(exc_type, exc_val, exc_tb))}"
         )
         self._update_task(SyncTaskStatus.FAILED)
+        # 变更记录都是在对应的数据变更提交后才添加的，因此即使任务失败，也需要记录下来
+        self.recorder.flush()
         self._store_logs_into_db()
 
     def _update_task(self, status: SyncTaskStatus):
@@ -101,81 +104,64 @@ class TenantSyncTaskContext:
             self.task.has_warning = self.logger.has_warning
             self.task.summary = {
                 "user": {
-                    "create": len(self.recorder.get(SyncOperation.CREATE, TenantSyncObjectType.USER)),
-                    "delete": len(self.recorder.get(SyncOperation.DELETE, TenantSyncObjectType.USER)),
+                    "create": self.recorder.count(SyncOperation.CREATE, TenantSyncObjectType.USER),
+                    "delete": self.recorder.count(SyncOperation.DELETE, TenantSyncObjectType.USER),
                 },
                 "department": {
-                    "create": len(self.recorder.get(SyncOperation.CREATE, TenantSyncObjectType.DEPARTMENT)),
-                    "delete": len(self.recorder.get(SyncOperation.DELETE, TenantSyncObjectType.DEPARTMENT)),
+                    "create": self.recorder.count(SyncOperation.CREATE, TenantSyncObjectType.DEPARTMENT),
+                    "delete": self.recorder.count(SyncOperation.DELETE, TenantSyncObjectType.DEPARTMENT),
                 },
             }
             update_fields += ["duration", "has_warning", "summary"]
 
         self.task.save(update_fields=update_fields)
 
-    def _store_records_into_db(self):
-        """将变更记录存入数据库"""
-        # 用户变更记录
-        if created_users := self.recorder.get(SyncOperation.CREATE, TenantSyncObjectType.USER):
-            TenantUserChangeLog.objects.bulk_create(
-                self._build_user_change_logs(SyncOperation.CREATE, created_users), batch_size=self.batch_size
-            )
+    def _store_records_into_db(
+        self, operation: SyncOperation, type: TenantSyncObjectType, records: List[Tuple]
+    ) -> None:
+        """将一批变更记录存入数据库"""
+        tenant, data_source = self.task.tenant, self.task.data_source
 
-        if deleted_users := self.recorder.get(SyncOperation.DELETE, TenantSyncObjectType.USER):
+        # 用户变更记录（租户用户 ID 在创建前就已经生成，无需补全）
+        if type == TenantSyncObjectType.USER:
             TenantUserChangeLog.objects.bulk_create(
-                self._build_user_change_logs(SyncOperation.DELETE, deleted_users), batch_size=self.batch_size
+                [
+                    TenantUserChangeLog(
+                        task=self.task,
+                        tenant=tenant,
+                        data_source=data_source,
+                        operation=operation,
+                        tenant_user_id=tenant_user_id,
+                        data_source_user_id=data_source_user_id,
+                    )
+                    for tenant_user_id, data_source_user_id in records
+                ],
+                batch_size=self.batch_size,
             )
 
         # 部门变更记录
-        if created_depts := self.recorder.get(SyncOperation.CREATE, TenantSyncObjectType.DEPARTMENT):
-            TenantDepartmentChangeLog.objects.bulk_create(
-                self._build_dept_change_logs(SyncOperation.CREATE, created_depts), batch_size=self.batch_size
-            )
+        elif type == TenantSyncObjectType.DEPARTMENT:
+            if operation == SyncOperation.CREATE:
+                records = fill_created_record_ids(
+                    TenantDepartment.objects.filter(tenant=tenant, data_source=data_source),
+                    "data_source_department_id",
+                    records,
+                )
 
-        if deleted_depts := self.recorder.get(SyncOperation.DELETE, TenantSyncObjectType.DEPARTMENT):
             TenantDepartmentChangeLog.objects.bulk_create(
-                self._build_dept_change_logs(SyncOperation.DELETE, deleted_depts), batch_size=self.batch_size
-            )
-
-    def _build_user_change_logs(self, operation: SyncOperation, users: List[TenantUser]) -> List[TenantUserChangeLog]:
-        if operation == SyncOperation.CREATE:
-            # 由于 bulk_create 不会返回 id，因此当 operation 为 create 时候，需要通过查询获取真实的 ID
-            users = TenantUser.objects.filter(
-                data_source_user_id__in=[u.data_source_user_id for u in users], tenant=self.task.tenant
-            )
-
-        return [
-            TenantUserChangeLog(
-                task=self.task,
-                tenant=self.task.tenant,
-                data_source=self.task.data_source,
-                operation=operation,
-                tenant_user_id=u.id,
-                data_source_user_id=u.data_source_user_id,
-            )
-            for u in users
-        ]
-
-    def _build_dept_change_logs(
-        self, operation: SyncOperation, depts: List[TenantDepartment]
-    ) -> List[TenantDepartmentChangeLog]:
-        if operation == SyncOperation.CREATE:
-            # 由于 bulk_create 不会返回 id，因此当 operation 为 create 时候，需要通过查询获取真实的 ID
-            depts = TenantDepartment.objects.filter(
-                data_source_department_id__in=[d.data_source_department_id for d in depts], tenant=self.task.tenant
-            )
-
-        return [
-            TenantDepartmentChangeLog(
-                task=self.task,
-                tenant=self.task.tenant,
-                data_source=self.task.data_source,
-                operation=operation,
-                tenant_department_id=d.id,
-                data_source_department_id=d.data_source_department_id,
+                [
+                    TenantDepartmentChangeLog(
+                        task=self.task,
+                        tenant=tenant,
+                        data_source=data_source,
+                        operation=operation,
+                        tenant_department_id=tenant_dept_id,
+                        data_source_department_id=data_source_dept_id,
+                    )
+                    for tenant_dept_id, data_source_dept_id in records
+                ],
+                batch_size=self.batch_size,
             )
-            for d in depts
-        ]
 
     def _store_logs_into_db(self):
         """将步骤日志存入数据库"""
@@ -18,32 +18,92 @@
 import io
 import logging
 from functools import partialmethod
-from typing import Callable
+from typing import Callable, Optional
 
-from bkuser.apps.sync.constants import SyncLogLevel
+from bkuser.apps.sync.constants import (
+    SYNC_LOG_FLUSH_THRESHOLD,
+    SYNC_LOG_MAX_SIZE,
+    SYNC_LOG_TRUNCATED_MARKER,
+    SyncLogLevel,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class TaskLogger:
-    """任务日志记录器"""
+    """任务日志记录器
+
+    若指定 flush_func，则缓冲区中的日志达到阈值时，会交由 flush_func 持久化并清空缓冲区，
+    flush_func 返回 False 表示当前无法持久化（如处于事务中），日志会继续保留在缓冲区，待下次达到阈值时再尝试
+    """
 
     has_warning: bool
+    truncated: bool
     _buffer: io.StringIO
 
-    def __init__(self):
+    def __init__(
+        self,
+        flush_func: Optional[Callable[[str], bool]] = None,
+        flush_threshold: int = SYNC_LOG_FLUSH_THRESHOLD,
+        max_size: int = SYNC_LOG_MAX_SIZE,
+    ):
+        """
+        :param flush_func: 持久化日志的函数，参数为待持久化的日志，返回是否持久化成功
+        :param flush_threshold: 缓冲区日志长度达到该值时，尝试持久化
+        :param max_size: 日志长度上限，超过后只会继续记录 ERROR 级别日志
+        """
         self.has_warning = False
+        self.truncated = False
         self._buffer = io.StringIO()
+        self._flush_func = flush_func
+        self._flush_threshold = flush_threshold
+        self._next_flush_at = flush_threshold
+        self._max_size = max_size
+        # 已记录的日志总长度（包含已经持久化的部分）
+        self._size = 0
 
     @property
     def logs(self):
+        """缓冲区中（尚未持久化）的日志"""
         return self._buffer.getvalue()
 
+    def drain(self) -> str:
+        """取出缓冲区中的日志，并清空缓冲区"""
+        logs = self._buffer.getvalue()
+        self._reset_buffer()
+        return logs
+
     def _log(self, level: SyncLogLevel, msg: str):
         if level == SyncLogLevel.WARNING:
             self.has_warning = True
 
-        self._buffer.write(f"{level.value} {msg}\n\n")
+        record = f"{level.value} {msg}\n\n"
+        # Q：为什么 ERROR 级别的日志不受长度上限限制？
+        # A：ERROR 日志一般是同步失败的原因（且数量很少），即使日志已经被截断，也需要记录下来，方便排查问题
+        if level != SyncLogLevel.ERROR and self._size + len(record) > self._max_size:
+            if self.truncated:
+                return
+
+            self.truncated = True
+            record = SYNC_LOG_TRUNCATED_MARKER
+
+        self._buffer.write(record)
+        self._size += len(record)
+
+        if self._flush_func and self._buffer.tell() >= self._next_flush_at:
+            self._flush()
+
+    def _flush(self):
+        if self._flush_func(self._buffer.getvalue()):  # type: ignore
+            self._reset_buffer()
+            return
+
+        # 持久化失败，则等缓冲区再增加一个阈值的日志后再尝试，避免每条日志都触发一次持久化
+        self._next_flush_at += self._flush_threshold
+
+    def _reset_buffer(self):
+        self._buffer = io.StringIO()
+        self._next_flush_at = self._flush_threshold
 
     # TODO (su) 支持 debug 级别的日志？但只能通过 shell 组装的 task 才能触发？
     info: Callable = partialmethod(_log, SyncLogLevel.INFO)  # type: ignore
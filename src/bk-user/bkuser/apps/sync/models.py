@@ -15,6 +15,7 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 from datetime import timedelta
+from typing import Tuple
 
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -56,6 +57,37 @@ class DataSourceSyncTask(TimestampedModel):
         # 同步模式
         return _("数据源导入成功") if self.status == SyncTaskStatus.SUCCESS else _("数据源导入失败")
 
+    def read_logs(self, offset: int = 0) -> Tuple[str, int]:
+        """
+        读取同步日志，支持从指定分片开始增量读取
+
+        :param offset: 起始日志分片序号
+        :return: (日志内容, 下次读取的起始分片序号)
+        """
+        chunks = list(self.log_chunks.filter(seq__gte=offset).values_list("seq", "content"))
+        if not chunks:
+            # 兼容日志直接存储在 logs 字段中的任务（历史任务 / 未进入同步流程就失败的任务）
+            return (self.logs if offset == 0 else ""), offset
+
+        return "".join(content for _, content in chunks), chunks[-1][0] + 1
+
+
+class DataSourceSyncTaskLog(TimestampedModel):
+    """数据源同步任务日志分片
+
+    同步过程中日志会分批写入（仅追加），避免日志全部堆积在内存中，也便于在同步过程中查看日志
+    """
+
+    task = models.ForeignKey(
+        DataSourceSyncTask, on_delete=models.CASCADE, db_constraint=False, related_name="log_chunks"
+    )
+    seq = models.IntegerField("分片序号")
+    content = models.TextField("日志内容")
+
+    class Meta:
+        ordering = ["seq"]
+        unique_together = [("task", "seq")]
+
 
 class DataSourceUserChangeLog(TimestampedModel):
     """数据源用户变更日志"""
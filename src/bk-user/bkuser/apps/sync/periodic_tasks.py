@@ -18,7 +18,7 @@
 import logging
 from datetime import timedelta
 
-from django.db.models import F, Value
+from django.db.models import F, Max, Value
 from django.db.models.functions import Concat
 from django.utils import timezone
 
@@ -26,7 +26,7 @@ from bkuser.apps.data_source.models import DataSource
 from bkuser.apps.sync.constants import SyncTaskStatus, SyncTaskTrigger
 from bkuser.apps.sync.data_models import DataSourceSyncOptions
 from bkuser.apps.sync.managers import DataSourceSyncManager
-from bkuser.apps.sync.models import DataSourceSyncTask, TenantSyncTask
+from bkuser.apps.sync.models import DataSourceSyncTask, DataSourceSyncTaskLog, TenantSyncTask
 from bkuser.celery import app
 from bkuser.common.task import BaseTask
 
@@ -65,14 +65,29 @@ def mark_running_sync_task_as_failed_if_exceed_one_day():
     time_now = timezone.now()
     error_msg = "\n\nERROR sync task runs more than one day, consider it as failed."
 
-    DataSourceSyncTask.objects.filter(
+    data_source_sync_tasks = DataSourceSyncTask.objects.filter(
         status__in=[SyncTaskStatus.PENDING, SyncTaskStatus.RUNNING],
         start_at__lt=time_now - timedelta(days=1),
-    ).update(
+    )
+    # Q：为什么还需要额外写入一个日志分块？
+    # A：已经写入过日志分块的任务，read_logs 只会读取分块而不会读取 logs 字段，
+    #    若只追加到 logs 字段，前端将看不到任务被标记为失败的原因，因此需要以下一个 seq 追加一个分块
+    last_log_seqs = dict(
+        data_source_sync_tasks.annotate(last_log_seq=Max("log_chunks__seq"))
+        .filter(last_log_seq__isnull=False)
+        .values_list("id", "last_log_seq")
+    )
+    data_source_sync_tasks.update(
         status=SyncTaskStatus.FAILED,
         logs=Concat(F("logs"), Value(error_msg)),
         updated_at=time_now,
     )
+    DataSourceSyncTaskLog.objects.bulk_create(
+        [
+            DataSourceSyncTaskLog(task_id=task_id, seq=last_seq + 1, content=error_msg)
+            for task_id, last_seq in last_log_seqs.items()
+        ]
+    )
 
     TenantSyncTask.objects.filter(
         status__in=[SyncTaskStatus.PENDING, SyncTaskStatus.RUNNING],
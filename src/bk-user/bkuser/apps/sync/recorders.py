@@ -17,7 +17,10 @@
 
 import logging
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from operator import attrgetter
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from django.db.models import Model, QuerySet
 
 from bkuser.apps.data_source.models import DataSourceDepartment, DataSourceUser
 from bkuser.apps.sync.constants import DataSourceSyncObjectType, SyncOperation, TenantSyncObjectType
@@ -25,29 +28,112 @@ from bkuser.apps.tenant.models import TenantDepartment, TenantUser
 
 logger = logging.getLogger(__name__)
 
-# 二元组对象，用于以何种方式，操作某类对象
-SyncOperationObjectType = Tuple[SyncOperation, DataSourceSyncObjectType | TenantSyncObjectType]
+# 同步对象类型（数据源同步 / 租户同步各自使用不同的对象类型枚举）
+SyncObjectType = TypeVar("SyncObjectType", DataSourceSyncObjectType, TenantSyncObjectType)
+
+# 变更记录只保留生成变更日志所需的字段（元组），而不是完整的对象，以减少内存占用
+# 注：第一个字段必须是对象 ID（若 DB 不支持 bulk_create 返回自增 ID，则新建对象的 ID 为 None）
+CHANGE_LOG_RECORD_FIELDS: Dict[Type[Model], Tuple[str, ...]] = {
+    DataSourceUser: ("id", "code", "username", "full_name"),
+    DataSourceDepartment: ("id", "code", "name"),
+    TenantUser: ("id", "data_source_user_id"),
+    TenantDepartment: ("id", "data_source_department_id"),
+}
+
+# 变更记录写入存储的函数，参数为 (操作类型, 对象类型, 变更记录列表)
+ChangeLogFlushFunc = Callable[[SyncOperation, SyncObjectType, List[Tuple]], None]
 
 
-class ChangeLogRecorder:
-    """变更日志记录器"""
+class ChangeLogRecorder(Generic[SyncObjectType]):
+    """变更日志记录器
 
-    records: Dict[SyncOperationObjectType, List]
+    若指定 flush_func，则某类变更记录累计达到 batch_size 时，会交由 flush_func 写入存储并清空，
+    否则变更记录会一直保留在内存中，直到调用 flush 方法
+    """
 
-    def __init__(self):
+    # 键为二元组 (操作类型, 对象类型)，用于以何种方式，操作某类对象
+    records: Dict[Tuple[SyncOperation, SyncObjectType], List[Tuple]]
+    counts: Dict[Tuple[SyncOperation, SyncObjectType], int]
+    _flush_func: Optional[ChangeLogFlushFunc[SyncObjectType]]
+
+    def __init__(self, flush_func: Optional[ChangeLogFlushFunc[SyncObjectType]] = None, batch_size: int = 1000):
         self.records = defaultdict(list)
+        self.counts = defaultdict(int)
+        self._flush_func = flush_func
+        self._batch_size = batch_size
+
+    @staticmethod
+    def compact(items: Iterable[Model]) -> Iterator[Tuple]:
+        """将对象转换成变更记录（只保留必要字段的元组）"""
+        # QuerySet 直接查询必要字段，避免加载完整的对象
+        if isinstance(items, QuerySet):
+            yield from items.values_list(*CHANGE_LOG_RECORD_FIELDS[items.model]).iterator()
+            return
+
+        for item in items:
+            yield attrgetter(*CHANGE_LOG_RECORD_FIELDS[type(item)])(item)
 
     def add(
         self,
         operation: SyncOperation,
-        type: DataSourceSyncObjectType | TenantSyncObjectType,
-        items: List[DataSourceUser | DataSourceDepartment | TenantUser | TenantDepartment],
+        type: SyncObjectType,
+        items: Iterable[DataSourceUser | DataSourceDepartment | TenantUser | TenantDepartment],
     ):
         """添加某类型某操作的变更日志"""
-        self.records[(operation, type)].extend(items)
+        self.add_records(operation, type, self.compact(items))
+
+    def add_records(
+        self,
+        operation: SyncOperation,
+        type: SyncObjectType,
+        records: Iterable[Tuple],
+    ):
+        """添加某类型某操作的变更记录（已经通过 compact 转换过的）"""
+        key = (operation, type)
+        for record in records:
+            self.records[key].append(record)
+            self.counts[key] += 1
 
-    def get(
-        self, operation: SyncOperation, type: DataSourceSyncObjectType | TenantSyncObjectType
-    ) -> List[DataSourceUser | DataSourceDepartment | TenantUser | TenantDepartment]:
-        """获取某类型某操作的变更日志"""
+            if self._flush_func and len(self.records[key]) >= self._batch_size:
+                self._flush(key)
+
+    def get(self, operation: SyncOperation, type: SyncObjectType) -> List[Tuple]:
+        """获取某类型某操作的变更记录（尚未写入存储的部分）"""
         return self.records[(operation, type)]
+
+    def count(self, operation: SyncOperation, type: SyncObjectType) -> int:
+        """获取某类型某操作的变更记录总数（包含已经写入存储的部分）"""
+        return self.counts[(operation, type)]
+
+    def flush(self):
+        """将所有剩余的变更记录写入存储"""
+        if not self._flush_func:
+            return
+
+        for key in list(self.records.keys()):
+            self._flush(key)
+
+    def _flush(self, key: Tuple[SyncOperation, SyncObjectType]):
+        if self._flush_func and (records := self.records.pop(key, None)):
+            self._flush_func(*key, records)
+
+
+def fill_created_record_ids(queryset: QuerySet, lookup_field: str, records: List[Tuple]) -> List[Tuple]:
+    """
+    补全新建对象变更记录中缺失的 ID
+
+    Q：为什么新建对象的 ID 可能为空？
+    A：PostgreSQL / MariaDB 等 DB 在 bulk_create 后会回填自增 ID，无需再查询，
+       但 MySQL 不支持，此时需要根据变更记录的第二个字段（如 code）批量查询对应的 ID（只查询必要字段）
+
+    :param queryset: 新建对象所在的 QuerySet（需限定好数据源 / 租户等范围）
+    :param lookup_field: 变更记录中第二个字段对应的模型字段名
+    :param records: 变更记录列表
+    :return: 补全 ID 后的变更记录列表（DB 中不存在的对象会被忽略）
+    """
+    missing_id_values = [r[1] for r in records if r[0] is None]
+    if not missing_id_values:
+        return records
+
+    id_map = dict(queryset.filter(**{f"{lookup_field}__in": missing_id_values}).values_list(lookup_field, "id"))
+    return [(id_map[r[1]], *r[1:]) if r[0] is None else r for r in records if r[0] is not None or r[1] in id_map]
@@ -35,6 +35,7 @@ from bkuser.apps.sync.syncers import (
 from bkuser.apps.sync.validators import DataSourceUserExtrasUniqueValidator
 from bkuser.apps.tenant.constants import TenantStatus
 from bkuser.apps.tenant.models import Tenant
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler
 from bkuser.plugins.base import get_plugin_cls
 
 logger = logging.getLogger(__name__)
@@ -52,12 +53,16 @@ class DataSourceSyncTaskRunner:
         if self._need_skip_sync():
             return
 
-        with DataSourceSyncTaskContext(self.task) as ctx:
-            self._initial_plugin(ctx, self.plugin_init_extra_kwargs)
-            self._sync_departments(ctx)
-            self._sync_users(ctx)
-            self._validate_unique_fields(ctx)
-            self._send_signal(ctx)
+        try:
+            with DataSourceSyncTaskContext(self.task) as ctx:
+                self._initial_plugin(ctx, self.plugin_init_extra_kwargs)
+                self._sync_departments(ctx)
+                self._sync_users(ctx)
+                self._validate_unique_fields(ctx)
+                self._send_signal(ctx)
+        finally:
+            # 同步失败也可能有部分数据已经变更，因此无论成功与否都需要按实际数据刷新统计
+            self._refresh_resource_stats()
 
     def _need_skip_sync(self) -> bool:
         """租户不是启用状态，需要跳过同步"""
@@ -136,6 +141,10 @@ class DataSourceSyncTaskRunner:
         """对有唯一性要求的自定义字段的校验"""
         DataSourceUserExtrasUniqueValidator(self.data_source, ctx.logger).validate()
 
+    def _refresh_resource_stats(self):
+        """刷新数据源在所属租户下的资源数量统计"""
+        DataSourceResourceStatsHandler.refresh(self.data_source, self.data_source.owner_tenant_id)
+
     def _send_signal(self, ctx: DataSourceSyncTaskContext):
         """若符合准出条件，则发送数据源同步完成信号，触发后续流程
 
@@ -24,6 +24,7 @@ from bkuser.apps.sync.signals import post_sync_tenant
 from bkuser.apps.sync.syncers import TenantDepartmentSyncer, TenantUserSyncer
 from bkuser.apps.tenant.constants import TenantStatus
 from bkuser.apps.tenant.models import Tenant
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler
 
 logger = logging.getLogger(__name__)
 
@@ -40,9 +41,13 @@ class TenantSyncTaskRunner:
         if self._need_skip_sync():
             return
 
-        with TenantSyncTaskContext(self.task) as ctx:
-            self._sync_departments(ctx)
-            self._sync_users(ctx)
+        try:
+            with TenantSyncTaskContext(self.task) as ctx:
+                self._sync_departments(ctx)
+                self._sync_users(ctx)
+        finally:
+            # 同步失败也可能有部分数据已经变更，因此无论成功与否都需要按实际数据刷新统计
+            self._refresh_resource_stats()
 
         self._send_signal()
 
@@ -74,6 +79,13 @@ class TenantSyncTaskRunner:
         """同步用户信息"""
         TenantUserSyncer(ctx, self.data_source, self.tenant).sync()
 
+    def _refresh_resource_stats(self):
+        """刷新数据源在当前租户下的资源数量统计（所属租户的统计以数据源数据为准，由数据源同步负责）"""
+        if self.data_source.owner_tenant_id == self.tenant.id:
+            return
+
+        DataSourceResourceStatsHandler.refresh(self.data_source, self.tenant.id)
+
     def _send_signal(self):
         """发送租户同步完成信号，触发后续流程"""
         post_sync_tenant.send(sender=self.__class__, tenant=self.tenant, data_source=self.data_source)
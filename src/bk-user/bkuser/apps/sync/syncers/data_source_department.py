@@ -78,6 +78,8 @@ class DataSourceDepartmentSyncer:
         waiting_delete_depts = self._get_waiting_delete_departments(waiting_delete_dept_codes)
         waiting_update_depts = self._get_waiting_update_departments(self.raw_departments, waiting_update_dept_codes)
         waiting_create_depts = self._get_waiting_create_departments(self.raw_departments, waiting_create_dept_codes)
+        # 删除后就无法再查询到这些部门，因此需要提前获取变更记录
+        deleted_dept_records = list(self.ctx.recorder.compact(waiting_delete_depts))
 
         with transaction.atomic():
             # Q: 为什么这里的顺序应该是 1. 删除 2. 更新 3. 创建
@@ -90,8 +92,8 @@ class DataSourceDepartmentSyncer:
             DataSourceDepartment.objects.bulk_create(waiting_create_depts, batch_size=self.batch_size)
 
         # 数据源部门同步相关日志
-        self.ctx.logger.info(f"delete {len(waiting_delete_depts)} departments")
-        self.ctx.recorder.add(SyncOperation.DELETE, DataSourceSyncObjectType.DEPARTMENT, waiting_delete_depts)
+        self.ctx.logger.info(f"delete {len(deleted_dept_records)} departments")
+        self.ctx.recorder.add_records(SyncOperation.DELETE, DataSourceSyncObjectType.DEPARTMENT, deleted_dept_records)
 
         self.ctx.logger.info(f"update {len(waiting_update_depts)} departments")
         self.ctx.recorder.add(SyncOperation.UPDATE, DataSourceSyncObjectType.DEPARTMENT, waiting_update_depts)
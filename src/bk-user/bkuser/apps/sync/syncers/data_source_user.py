@@ -81,6 +81,8 @@ class DataSourceUserSyncer:
         waiting_delete_users = self._get_waiting_delete_users(waiting_delete_user_codes)
         waiting_update_users = self._get_waiting_update_users(self.raw_users, waiting_update_user_codes)
         waiting_create_users = self._get_waiting_create_users(self.raw_users, waiting_create_user_codes)
+        # 删除后就无法再查询到这些用户，因此需要提前获取变更记录
+        deleted_user_records = list(self.ctx.recorder.compact(waiting_delete_users))
 
         with transaction.atomic():
             # Q: 为什么这里的顺序应该是 1. 删除 2. 更新 3. 创建
@@ -94,8 +96,8 @@ class DataSourceUserSyncer:
             )
             DataSourceUser.objects.bulk_create(waiting_create_users, batch_size=self.batch_size)
 
-        self.ctx.logger.info(f"delete {len(waiting_delete_users)} users")
-        self.ctx.recorder.add(SyncOperation.DELETE, DataSourceSyncObjectType.USER, waiting_delete_users)
+        self.ctx.logger.info(f"delete {len(deleted_user_records)} users")
+        self.ctx.recorder.add_records(SyncOperation.DELETE, DataSourceSyncObjectType.USER, deleted_user_records)
 
         self.ctx.logger.info(f"update {len(waiting_update_users)} users")
         self.ctx.recorder.add(SyncOperation.UPDATE, DataSourceSyncObjectType.USER, waiting_update_users)
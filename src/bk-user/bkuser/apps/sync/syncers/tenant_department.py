@@ -60,6 +60,9 @@ class TenantDepartmentSyncer:
             for dept in waiting_sync_data_source_departments
         ]
 
+        # 删除后就无法再查询到这些租户部门，因此需要提前获取变更记录
+        deleted_tenant_dept_records = list(self.ctx.recorder.compact(waiting_delete_tenant_departments))
+
         # 统一在事务中对租户部门进行变更，先删除再增加
         with transaction.atomic():
             waiting_delete_tenant_departments.delete()
@@ -81,8 +84,10 @@ class TenantDepartmentSyncer:
             TenantDepartmentIDRecord.objects.bulk_create(records, batch_size=self.batch_size, ignore_conflicts=True)
 
         # 记录删除日志，变更记录
-        self.ctx.logger.info(f"delete {len(waiting_delete_tenant_departments)} tenant departments")
-        self.ctx.recorder.add(SyncOperation.DELETE, TenantSyncObjectType.DEPARTMENT, waiting_delete_tenant_departments)
+        self.ctx.logger.info(f"delete {len(deleted_tenant_dept_records)} tenant departments")
+        self.ctx.recorder.add_records(
+            SyncOperation.DELETE, TenantSyncObjectType.DEPARTMENT, deleted_tenant_dept_records
+        )
 
         # 记录创建日志，变更记录
         self.ctx.logger.info(f"create {len(waiting_create_tenant_departments)} tenant departments")
@@ -65,14 +65,17 @@ class TenantUserSyncer:
             for user in waiting_sync_data_source_users
         ]
 
+        # 删除后就无法再查询到这些租户用户，因此需要提前获取变更记录
+        deleted_tenant_user_records = list(self.ctx.recorder.compact(waiting_delete_tenant_users))
+
         # 统一在事务中对租户用户进行变更，先删除再增加
         with transaction.atomic():
             waiting_delete_tenant_users.delete()
             TenantUser.objects.bulk_create(waiting_create_tenant_users, batch_size=self.batch_size)
 
         # 记录删除日志，变更记录
-        self.ctx.logger.info(f"delete {len(waiting_delete_tenant_users)} tenant users")
-        self.ctx.recorder.add(SyncOperation.DELETE, TenantSyncObjectType.USER, waiting_delete_tenant_users)
+        self.ctx.logger.info(f"delete {len(deleted_tenant_user_records)} tenant users")
+        self.ctx.recorder.add_records(SyncOperation.DELETE, TenantSyncObjectType.USER, deleted_tenant_user_records)
         # 记录创建日志，变更记录
         self.ctx.logger.info(f"create {len(waiting_create_tenant_users)} tenant users")
         self.ctx.recorder.add(SyncOperation.CREATE, TenantSyncObjectType.USER, waiting_create_tenant_users)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+from typing import Callable, Set, TypeVar
+
+from bkuser.common.cache import Cache, CacheEnum, CacheKeyPrefixEnum
+
+T = TypeVar("T")
+
+# 租户元数据（默认租户，协同策略，租户用户 ID 生成配置等）缓存，仅使用进程内缓存
+_tenant_metadata_cache = Cache(CacheEnum.DEFAULT, CacheKeyPrefixEnum.TENANT_METADATA)
+# 租户元数据缓存时间（单位：秒）
+_TENANT_METADATA_CACHE_TIMEOUT = 60
+# 当前进程中已写入缓存的 Key，用于主动失效
+_cached_keys: Set[str] = set()
+# 用于区分 "未缓存" 与 "缓存值为 None"
+_MISSING = object()
+
+
+def get_or_set_tenant_metadata(key: str, func: Callable[[], T]) -> T:
+    """
+    获取租户元数据，缓存不存在时，通过 func 获取并写入缓存
+
+    Q: 为什么租户元数据可以缓存？
+    A: 默认租户，协同策略，租户用户 ID 生成配置等变更频率很低，但是兼容 API 每次调用都需要读取，
+       写入路径（模型 save / delete）会主动失效当前进程的缓存；其他进程则最长在缓存过期后感知到变更
+    """
+    value = _tenant_metadata_cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = func()
+        _tenant_metadata_cache.set(key, value, timeout=_TENANT_METADATA_CACHE_TIMEOUT)
+        _cached_keys.add(key)
+
+    return value
+
+
+def invalidate_tenant_metadata() -> None:
+    """失效当前进程中所有的租户元数据缓存"""
+    for key in list(_cached_keys):
+        _tenant_metadata_cache.delete(key)
+
+    _cached_keys.clear()
@@ -24,6 +24,13 @@ TENANT_ID_REGEX = re.compile(r"^[a-z][a-z0-9-]{1,30}[a-z0-9]$")
 # 自定义字段英文标识命名规则
 TENANT_USER_CUSTOM_FIELD_NAME_REGEX = re.compile(r"^[a-zA-Z][a-zA-Z0-9_]{1,30}[a-zA-Z0-9]$")
 
+# 批量更新租户用户状态单次操作数量
+TENANT_USER_STATUS_UPDATE_BATCH_SIZE = 500
+# 删除协同策略时，清理协同产生的租户用户 / 部门单次操作数量
+COLLABORATION_STRATEGY_CLEAN_BATCH_SIZE = 1000
+# 删除协同策略任务失败的最大重试次数
+COLLABORATION_STRATEGY_CLEAN_MAX_RETRIES = 3
+
 
 class UserFieldDataType(StrStructuredEnum):
     """租户用户自定义字段数据类型"""
@@ -148,6 +155,8 @@ class CollaborationStrategyStatus(StrStructuredEnum):
     DISABLED = EnumField("disabled", label=_("禁用"))
     # 注：未确认只有接受方会有这个状态
     UNCONFIRMED = EnumField("unconfirmed", label=_("未确认"))
+    # 注：删除中只有分享方会有这个状态，策略产生的租户用户 & 部门清理完成后，策略会被删除
+    DELETING = EnumField("deleting", label=_("删除中"))
 
 
 class CollaborationScopeType(StrStructuredEnum):
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bkuser.apps.tenant.caches import invalidate_tenant_metadata
+from bkuser.apps.tenant.models import CollaborationStrategy, Tenant, TenantUserIDGenerateConfig
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+@receiver(post_save, sender=CollaborationStrategy)
+@receiver(post_delete, sender=CollaborationStrategy)
+@receiver(post_save, sender=TenantUserIDGenerateConfig)
+@receiver(post_delete, sender=TenantUserIDGenerateConfig)
+def invalidate_tenant_metadata_after_modify(sender, **kwargs):
+    """
+    租户，协同策略，租户用户 ID 生成配置变更后，需要失效租户元数据缓存
+
+    Note: 除了立即失效外，还需要在事务提交后再失效一次，避免事务提交前有请求将旧数据重新写入缓存
+    Note: QuerySet.update 不会触发信号，此类变更只能等待缓存过期
+    """
+    invalidate_tenant_metadata()
+    transaction.on_commit(invalidate_tenant_metadata)
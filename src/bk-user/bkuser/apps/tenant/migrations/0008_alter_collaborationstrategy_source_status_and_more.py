@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+# Generated by Django 4.2.18 on 2026-10-19 17:16
+
+import bkuser.apps.tenant.constants
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenant', '0007_tenantuser_status_account_expired_at_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='collaborationstrategy',
+            name='source_status',
+            field=models.CharField(choices=[('enabled', '启用'), ('disabled', '禁用'), ('unconfirmed', '未确认'), ('deleting', '删除中')], default=bkuser.apps.tenant.constants.CollaborationStrategyStatus['ENABLED'], max_length=32, verbose_name='策略状态（分享方）'),
+        ),
+        migrations.AlterField(
+            model_name='collaborationstrategy',
+            name='target_status',
+            field=models.CharField(choices=[('enabled', '启用'), ('disabled', '禁用'), ('unconfirmed', '未确认'), ('deleting', '删除中')], default=bkuser.apps.tenant.constants.CollaborationStrategyStatus['UNCONFIRMED'], max_length=32, verbose_name='策略状态（接受方）'),
+        ),
+    ]
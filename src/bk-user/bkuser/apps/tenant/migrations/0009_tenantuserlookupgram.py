@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+# Generated by Django 4.2.18 on 2026-10-19 17:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Q
+
+from bkuser.utils.ngram import split_ngrams
+
+# 每批回填的用户数量
+BACKFILL_BATCH_SIZE = 1000
+
+
+def forwards_func(apps, schema_editor):
+    """回填存量租户用户（自定义邮箱 / 手机号）的模糊搜索 gram"""
+    TenantUser = apps.get_model("tenant", "TenantUser")
+    TenantUserLookupGram = apps.get_model("tenant", "TenantUserLookupGram")
+
+    # 只有填写了自定义邮箱 / 手机号的租户用户才需要回填
+    tenant_users = TenantUser.objects.exclude(
+        Q(custom_email__isnull=True) | Q(custom_email=""), Q(custom_phone__isnull=True) | Q(custom_phone="")
+    )
+
+    last_id = ""
+    while True:
+        users = list(
+            tenant_users.filter(id__gt=last_id).order_by("id").only("id", "custom_email", "custom_phone")[
+                :BACKFILL_BATCH_SIZE
+            ]
+        )
+        if not users:
+            break
+
+        grams = [
+            TenantUserLookupGram(tenant_user_id=u.id, field=field, gram=gram)
+            for u in users
+            for field, source_field in [("email", "custom_email"), ("phone", "custom_phone")]
+            for gram in split_ngrams(getattr(u, source_field))
+        ]
+        TenantUserLookupGram.objects.bulk_create(grams, batch_size=BACKFILL_BATCH_SIZE)
+        last_id = users[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenant', '0008_alter_collaborationstrategy_source_status_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantUserLookupGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=32, verbose_name='字段名称')),
+                ('gram', models.CharField(max_length=3, verbose_name='gram')),
+                ('tenant_user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='lookup_grams', to='tenant.tenantuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['field', 'gram', 'tenant_user'], name='tenant_tena_field_dd09c3_idx')],
+            },
+        ),
+        migrations.RunPython(forwards_func, migrations.RunPython.noop),
+    ]
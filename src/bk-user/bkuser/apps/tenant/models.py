@@ -15,7 +15,7 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 from django.conf import settings
 from django.db import models
@@ -31,6 +31,8 @@ from bkuser.apps.tenant.constants import (
 )
 from bkuser.common.constants import PERMANENT_TIME, TIME_ZONE_CHOICES, BkLanguageEnum
 from bkuser.common.models import AuditedModel, TimestampedModel
+from bkuser.utils.ngram import NGRAM_SIZE, split_ngrams
+from bkuser.utils.std_iter import chunked
 
 
 class Tenant(AuditedModel):
@@ -50,6 +52,12 @@ class Tenant(AuditedModel):
 class TenantUserManager(models.Manager):
     """TenantUser DB 模型管理器"""
 
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        # bulk_create 不会调用 save 方法，需要手动创建自定义邮箱 / 手机号的模糊搜索 gram
+        TenantUserLookupGram.create_grams({obj.id: obj for obj in objs})
+        return objs
+
     def filter_by_email(self, tenant_id: str, email: str) -> QuerySet["TenantUser"]:
         return self.filter(tenant_id=tenant_id).filter(
             Q(is_inherited_email=False, custom_email=email) | Q(is_inherited_email=True, data_source_user__email=email)
@@ -120,6 +128,18 @@ class TenantUser(AuditedModel):
         unique_together = [
             ("data_source_user", "tenant"),
         ]
+        indexes = [
+            # 用于定时任务查询已过期但状态未更新的用户
+            models.Index(fields=["status", "account_expired_at"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # 若保存的字段包含模糊搜索 gram 的来源字段，则 gram 也需要重建
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or set(update_fields) & set(TenantUserLookupGram.source_fields.values()):
+            TenantUserLookupGram.rebuild_grams({self.id: self})
 
     @property
     def email(self) -> str:
@@ -134,6 +154,50 @@ class TenantUser(AuditedModel):
         )
 
 
+class TenantUserLookupGram(models.Model):
+    """
+    租户用户模糊搜索 gram，由自定义邮箱 / 手机号归一化后切分而来，用于加速模糊查询
+
+    Note: 继承数据源的邮箱 / 手机号使用的是 DataSourceUserLookupGram，这里只维护自定义的部分，
+    查询时再根据 is_inherited_email / is_inherited_phone 选择对应的 gram 表，即可覆盖生效的邮箱 / 手机号
+
+    注：该表在 TenantUser save / bulk_create 时自动维护，不应该直接修改
+    """
+
+    tenant_user = models.ForeignKey(
+        TenantUser, on_delete=models.CASCADE, db_constraint=False, related_name="lookup_grams"
+    )
+    field = models.CharField("字段名称", max_length=32)
+    gram = models.CharField("gram", max_length=NGRAM_SIZE)
+
+    # 切分 gram 的来源字段 {field: 来源字段}
+    source_fields = {"email": "custom_email", "phone": "custom_phone"}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["field", "gram", "tenant_user"]),
+        ]
+
+    @classmethod
+    def create_grams(cls, tenant_users: Dict[str, TenantUser]) -> None:
+        """为指定的租户用户创建 gram，tenant_users 格式为 {tenant_user_id: tenant_user}"""
+        grams: List[TenantUserLookupGram] = [
+            cls(tenant_user_id=tenant_user_id, field=field, gram=gram)
+            for tenant_user_id, tenant_user in tenant_users.items()
+            for field, source_field in cls.source_fields.items()
+            for gram in split_ngrams(getattr(tenant_user, source_field))
+        ]
+        cls.objects.bulk_create(grams, batch_size=1000)
+
+    @classmethod
+    def rebuild_grams(cls, tenant_users: Dict[str, TenantUser]) -> None:
+        """重建指定租户用户的 gram，tenant_users 格式为 {tenant_user_id: tenant_user}"""
+        for tenant_user_ids in chunked(tenant_users.keys(), 1000):
+            cls.objects.filter(tenant_user_id__in=tenant_user_ids).delete()
+
+        cls.create_grams(tenant_users)
+
+
 class TenantDepartment(TimestampedModel):
     """
     租户部门即蓝鲸部门
@@ -286,3 +350,24 @@ class TenantDepartmentIDRecord(TimestampedModel):
 
     class Meta:
         unique_together = [("tenant", "data_source", "code")]
+
+
+class DataSourceResourceStats(TimestampedModel):
+    """
+    数据源关联资源数量统计（计数器）
+
+    Q：为什么需要有这个表？
+    A：数据源删除前需要展示关联的部门 / 用户数量，大数据源每次都 COUNT 的代价过高，因此维护计数器
+       - tenant 为数据源所属租户时，统计的是数据源部门 / 用户数量
+       - tenant 为其他租户时，统计的是数据源分享（同步）到该租户的租户部门 / 用户数量
+
+    注：计数器由同步任务 & Web 变更维护，可能存在的偏差会被定时任务校准
+    """
+
+    data_source = models.ForeignKey(DataSource, on_delete=models.DO_NOTHING, db_constraint=False)
+    tenant = models.ForeignKey(Tenant, on_delete=models.DO_NOTHING, db_constraint=False)
+    department_count = models.IntegerField("部门数量", default=0)
+    user_count = models.IntegerField("用户数量", default=0)
+
+    class Meta:
+        unique_together = [("data_source", "tenant")]
@@ -15,11 +15,29 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 import logging
+from typing import Callable, List
 
+from django.db import DatabaseError
+from django.db.models import QuerySet
 from django.utils import timezone
 
-from bkuser.apps.tenant.constants import TenantUserStatus
-from bkuser.apps.tenant.models import CollaborationStrategy, TenantUser
+from bkuser.apps.data_source.models import DataSource
+from bkuser.apps.tenant.constants import (
+    COLLABORATION_STRATEGY_CLEAN_BATCH_SIZE,
+    COLLABORATION_STRATEGY_CLEAN_MAX_RETRIES,
+    TENANT_USER_STATUS_UPDATE_BATCH_SIZE,
+    CollaborationStrategyStatus,
+    TenantUserStatus,
+)
+from bkuser.apps.tenant.models import (
+    CollaborationStrategy,
+    DataSourceResourceStats,
+    TenantDepartment,
+    TenantManager,
+    TenantUser,
+    TenantUserLookupGram,
+)
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler
 from bkuser.celery import app
 from bkuser.common.task import BaseTask
 
@@ -53,22 +71,110 @@ def update_expired_tenant_user_status():
 
     now = timezone.now()
 
+    # 注：查询条件命中 (status, account_expired_at) 联合索引
     expired_users = TenantUser.objects.filter(
         status=TenantUserStatus.ENABLED,
         account_expired_at__lte=now,
     )
 
-    expired_count = expired_users.count()
+    # Q: 为什么不直接使用 expired_users.update(...)
+    # A: 为避免单条 update 语句锁定 / 更新的数据量过大，这里按批次获取 ID 后再执行 UPDATE ... WHERE id IN (...)
+    #    每个批次固定为 1 次查询 + 1 次更新，更新后的用户不再满足查询条件，因此每次取前 N 个即可
+    expired_count = 0
+    while user_ids := list(expired_users.values_list("id", flat=True)[:TENANT_USER_STATUS_UPDATE_BATCH_SIZE]):
+        expired_count += TenantUser.objects.filter(id__in=user_ids, status=TenantUserStatus.ENABLED).update(
+            status=TenantUserStatus.EXPIRED, updated_at=now
+        )
 
     if expired_count == 0:
         logger.info("No expired users found.")
         return
 
-    # Q: 为什么不直接使用 expired_users.update(...)
-    # A: 为避免 update 数据量过大，这里直接使用 bulk_update 支持 batch_size 分批量处理
-    for user in expired_users:
-        user.status = TenantUserStatus.EXPIRED
-        user.updated_at = now
-
-    TenantUser.objects.bulk_update(expired_users, fields=["status", "updated_at"], batch_size=500)
     logger.info("Updated %d expired users to EXPIRED status.", expired_count)
+
+
+@app.task(base=BaseTask, ignore_result=True)
+def reconcile_data_source_resource_stats():
+    """定时任务：按实际数据校准数据源关联资源数量统计，避免增量更新导致的计数偏差"""
+    logger.info("[celery] receive task: reconcile_data_source_resource_stats")
+
+    for data_source in DataSource.objects.all():
+        try:
+            DataSourceResourceStatsHandler.refresh_all(data_source)
+        except Exception:  # noqa: PERF203
+            logger.exception("failed to reconcile resource stats of data source %s", data_source.id)
+
+
+def _delete_in_batches(queryset: QuerySet, delete_dependents: Callable[[List], None] | None = None) -> int:
+    """
+    按批次删除查询集中的数据（每批次按主键删除），返回删除的数据量
+
+    Q: 为什么不使用 QuerySet.delete()？
+    A: QuerySet.delete() 会通过 Collector 将级联的数据加载到内存中逐个处理，数据量大时开销很大，
+       这里由调用方显式删除依赖的数据（delete_dependents）后，直接执行 DELETE ... WHERE id IN (...)
+    """
+    deleted_count = 0
+    while ids := list(queryset.values_list("id", flat=True)[:COLLABORATION_STRATEGY_CLEAN_BATCH_SIZE]):
+        if delete_dependents:
+            delete_dependents(ids)
+
+        batch = queryset.model.objects.filter(id__in=ids)
+        batch._raw_delete(batch.db)
+        deleted_count += len(ids)
+
+    return deleted_count
+
+
+class DeleteCollaborationStrategyTask(BaseTask):
+    """删除协同策略任务，重试耗尽仍失败时，将策略恢复为停用状态，以便在页面上重新发起删除"""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        strategy_id = args[0] if args else kwargs["strategy_id"]
+        CollaborationStrategy.objects.filter(
+            id=strategy_id, source_status=CollaborationStrategyStatus.DELETING
+        ).update(source_status=CollaborationStrategyStatus.DISABLED, updated_at=timezone.now())
+        super().on_failure(exc, task_id, args, kwargs, einfo)
+
+
+@app.task(
+    base=DeleteCollaborationStrategyTask,
+    ignore_result=True,
+    autoretry_for=(DatabaseError,),
+    max_retries=COLLABORATION_STRATEGY_CLEAN_MAX_RETRIES,
+    retry_backoff=True,
+)
+def delete_collaboration_strategy(strategy_id: int):
+    """删除协同策略：分批清理通过该策略产生的租户用户 & 租户部门，最后删除策略"""
+    logger.info("[celery] receive task: delete_collaboration_strategy, strategy %s", strategy_id)
+
+    strategy = CollaborationStrategy.objects.filter(
+        id=strategy_id, source_status=CollaborationStrategyStatus.DELETING
+    ).first()
+    if not strategy:
+        logger.warning("collaboration strategy %s not exists or not in deleting status, skip...", strategy_id)
+        return
+
+    data_source_ids = list(
+        DataSource.objects.filter(owner_tenant_id=strategy.source_tenant_id).values_list("id", flat=True)
+    )
+    filters = {"tenant_id": strategy.target_tenant_id, "data_source_id__in": data_source_ids}
+
+    def _delete_tenant_user_dependents(tenant_user_ids: List[str]):
+        # 租户用户可能是租户管理员，需要先删除对应的管理员记录，以及模糊搜索 gram
+        TenantManager.objects.filter(tenant_user_id__in=tenant_user_ids).delete()
+        TenantUserLookupGram.objects.filter(tenant_user_id__in=tenant_user_ids).delete()
+
+    user_count = _delete_in_batches(
+        TenantUser.objects.filter(**filters), delete_dependents=_delete_tenant_user_dependents
+    )
+    dept_count = _delete_in_batches(TenantDepartment.objects.filter(**filters))
+    DataSourceResourceStats.objects.filter(**filters).delete()
+    # 最后才是删除策略
+    strategy.delete()
+
+    logger.info(
+        "collaboration strategy %s deleted, cleaned %d tenant users and %d tenant departments",
+        strategy_id,
+        user_count,
+        dept_count,
+    )
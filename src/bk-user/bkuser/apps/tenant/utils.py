@@ -18,9 +18,18 @@
 import logging
 from typing import Dict, Tuple
 
+from django.db.models import Count, F
+
 from bkuser.apps.data_source.models import DataSource, DataSourceDepartment, DataSourceUser
 from bkuser.apps.tenant.constants import TenantUserIdRuleEnum
-from bkuser.apps.tenant.models import TenantDepartmentIDRecord, TenantUserIDGenerateConfig, TenantUserIDRecord
+from bkuser.apps.tenant.models import (
+    DataSourceResourceStats,
+    TenantDepartment,
+    TenantDepartmentIDRecord,
+    TenantUser,
+    TenantUserIDGenerateConfig,
+    TenantUserIDRecord,
+)
 from bkuser.utils.uuid import generate_uuid
 
 logger = logging.getLogger(__name__)
@@ -125,3 +134,98 @@ class TenantDeptIDGenerator:
                 return record.tenant_department_id
 
         return None
+
+
+class DataSourceResourceStatsHandler:
+    """数据源关联资源数量统计（计数器）维护"""
+
+    @classmethod
+    def get(cls, data_source: DataSource) -> Dict[str, int]:
+        """获取数据源关联资源数量统计"""
+        stats = list(DataSourceResourceStats.objects.filter(data_source=data_source))
+        # 数据源所属租户的统计不存在（如存量数据），则需要先全量计算一次
+        if not any(s.tenant_id == data_source.owner_tenant_id for s in stats):
+            cls.refresh_all(data_source)
+            stats = list(DataSourceResourceStats.objects.filter(data_source=data_source))
+
+        own_stats = next(s for s in stats if s.tenant_id == data_source.owner_tenant_id)
+        shared_stats = [
+            s
+            for s in stats
+            if s.tenant_id != data_source.owner_tenant_id and (s.department_count > 0 or s.user_count > 0)
+        ]
+        return {
+            # own
+            "own_department_count": own_stats.department_count,
+            "own_user_count": own_stats.user_count,
+            # shared to
+            "shared_to_tenant_count": len(shared_stats),
+            "shared_to_department_count": sum(s.department_count for s in shared_stats),
+            "shared_to_user_count": sum(s.user_count for s in shared_stats),
+        }
+
+    @staticmethod
+    def refresh(data_source: DataSource, tenant_id: str) -> None:
+        """按实际数据，刷新数据源在指定租户下的资源数量统计"""
+        if tenant_id == data_source.owner_tenant_id:
+            dept_count = DataSourceDepartment.objects.filter(data_source=data_source).count()
+            user_count = DataSourceUser.objects.filter(data_source=data_source).count()
+        else:
+            dept_count = TenantDepartment.objects.filter(data_source=data_source, tenant_id=tenant_id).count()
+            user_count = TenantUser.objects.filter(data_source=data_source, tenant_id=tenant_id).count()
+
+        DataSourceResourceStats.objects.update_or_create(
+            data_source=data_source,
+            tenant_id=tenant_id,
+            defaults={"department_count": dept_count, "user_count": user_count},
+        )
+
+    @classmethod
+    def refresh_all(cls, data_source: DataSource) -> None:
+        """按实际数据，刷新数据源在所有租户下的资源数量统计"""
+        # 其他租户的部门 / 用户数量：{tenant_id: count}
+        shared_dept_counts = dict(
+            TenantDepartment.objects.filter(data_source=data_source)
+            .exclude(tenant_id=data_source.owner_tenant_id)
+            .values("tenant_id")
+            .annotate(cnt=Count("id"))
+            .values_list("tenant_id", "cnt")
+        )
+        shared_user_counts = dict(
+            TenantUser.objects.filter(data_source=data_source)
+            .exclude(tenant_id=data_source.owner_tenant_id)
+            .values("tenant_id")
+            .annotate(cnt=Count("id"))
+            .values_list("tenant_id", "cnt")
+        )
+        shared_tenant_ids = set(shared_dept_counts) | set(shared_user_counts)
+
+        # 已经不再关联的租户，统计直接删除即可
+        DataSourceResourceStats.objects.filter(data_source=data_source).exclude(
+            tenant_id__in=[data_source.owner_tenant_id, *shared_tenant_ids]
+        ).delete()
+
+        cls.refresh(data_source, data_source.owner_tenant_id)
+        for tenant_id in shared_tenant_ids:
+            DataSourceResourceStats.objects.update_or_create(
+                data_source=data_source,
+                tenant_id=tenant_id,
+                defaults={
+                    "department_count": shared_dept_counts.get(tenant_id, 0),
+                    "user_count": shared_user_counts.get(tenant_id, 0),
+                },
+            )
+
+    @classmethod
+    def incr(cls, data_source: DataSource, tenant_id: str, department_delta: int = 0, user_delta: int = 0) -> None:
+        """增量更新数据源在指定租户下的资源数量统计，需要在变更数据后调用（delta 可为负数）"""
+        if not (department_delta or user_delta):
+            return
+
+        updated = DataSourceResourceStats.objects.filter(data_source=data_source, tenant_id=tenant_id).update(
+            department_count=F("department_count") + department_delta,
+            user_count=F("user_count") + user_delta,
+        )
+        # 统计记录不存在（如存量数据），则需要按实际数据全量计算
+        if not updated:
+            cls.refresh_all(data_source)
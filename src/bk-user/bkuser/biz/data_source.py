@@ -26,6 +26,7 @@ from bkuser.apps.data_source.models import (
     DepartmentRelationMPTTTree,
 )
 from bkuser.apps.tenant.models import (
+    DataSourceResourceStats,
     TenantDepartment,
     TenantDepartmentIDRecord,
     TenantUser,
@@ -50,6 +51,8 @@ class DataSourceHandler:
         TenantUserIDRecord.objects.filter(data_source=data_source).delete()
         # 5. 删除租户部门 ID 映射记录
         TenantDepartmentIDRecord.objects.filter(data_source=data_source).delete()
+        # 6. 删除数据源关联资源数量统计
+        DataSourceResourceStats.objects.filter(data_source=data_source).delete()
 
         # ======== 删除数据源相关模型数据 ========
         # 1. 删除部门 - 用户关系
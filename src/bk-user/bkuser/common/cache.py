@@ -47,6 +47,14 @@ class CacheKeyPrefixEnum(StrStructuredEnum):
     RESET_PASSWORD_TOKEN = "rpt"
     # Workbook 临时存储
     WORKBOOK_TEMPORARY_STORE = "wts"
+    # 数据源插件配置（含敏感信息）
+    DATA_SOURCE_PLUGIN_CONFIG = "dspc"
+    # 用户自定义字段数据迁移进度
+    USER_EXTRAS_MIGRATION_CHECKPOINT = "uemc"
+    # 租户元数据（默认租户，协同策略，租户用户 ID 生成配置等）
+    TENANT_METADATA = "tmd"
+    # 批量通知发送速率限制计数
+    NOTIFICATION_RATE_LIMIT = "nrl"
 
 
 def _default_key_function(*args, **kwargs):
@@ -141,6 +149,18 @@ class Cache:
         key = self._make_key(key)
         self.cache.delete(key, version)
 
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        key = self._make_key(key)
+        return self.cache.add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None) -> int:
+        key = self._make_key(key)
+        return self.cache.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None) -> int:
+        key = self._make_key(key)
+        return self.cache.decr(key, delta, version)
+
     def get_many(self, keys, version=None):
         if not keys:
             return {}
@@ -18,12 +18,13 @@
 # ignore custom logger must use %s string format in this file
 # ruff: noqa: G004
 from collections import Counter
-from typing import List
+from typing import Any, Dict, Iterable, List, Set, Tuple
 
 import phonenumbers
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from openpyxl.workbook import Workbook
+from phonenumbers import NumberParseException
 
 from bkuser.plugins.base import PluginLogger
 from bkuser.plugins.local.constants import USERNAME_REGEX
@@ -34,6 +35,7 @@ from bkuser.plugins.local.exceptions import (
     InvalidLeader,
     InvalidOrganization,
     InvalidUsername,
+    LocalDataSourcePluginError,
     RequiredFieldIsEmpty,
     SheetColumnsNotMatch,
     UserSheetNotExists,
@@ -51,10 +53,6 @@ class LocalDataSourceDataParser:
     col_name_row_idx = 2
     # 第三行开始，才是用户数据（1-based)
     user_data_min_row_idx = 3
-    # 用户名索引（0-based）
-    username_idx_in_row = 0
-    # 组织列索引（0-based）
-    organization_idx_in_row = 4
 
     # 内建字段列名
     builtin_col_names = [
@@ -94,10 +92,15 @@ class LocalDataSourceDataParser:
         self.is_parsed = False
 
     def parse(self):
-        """预解析部门 & 用户数据"""
-        self._validate_and_prepare()
-        self._parse_departments()
-        self._parse_users()
+        """预解析部门 & 用户数据
+
+        NOTE: 用户表数据只会被遍历一次，校验，部门收集，用户构建均在同一次遍历中完成
+        """
+        self._validate_sheet()
+        self._validate_columns()
+        self._parse_rows(
+            self.sheet.iter_rows(min_row=self.user_data_min_row_idx, max_col=self.valid_col_length, values_only=True)
+        )
         self.is_parsed = True
 
     def get_departments(self) -> List[RawDataSourceDepartment]:
@@ -106,12 +109,6 @@ class LocalDataSourceDataParser:
     def get_users(self) -> List[RawDataSourceUser]:
         return self.users
 
-    def _validate_and_prepare(self):
-        """检查表格格式，确保后续可正常解析"""
-        self._validate_sheet()
-        self._validate_columns()
-        self._validate_users()
-
     def _validate_sheet(self):
         # 确保用户表确实存在
         if self.user_sheet_name not in self.workbook.sheetnames:
@@ -150,38 +147,66 @@ class LocalDataSourceDataParser:
         if duplicate_col_names := [n for n, cnt in Counter(sheet_col_names).items() if cnt > 1]:
             raise DuplicateColumnName(_("待导入文件中存在重复列名：{}").format(", ".join(duplicate_col_names)))
 
-    def _validate_users(self):
-        all_usernames = []
-        for idx, cell_values in enumerate(
-            self.sheet.iter_rows(min_row=self.user_data_min_row_idx, max_col=self.valid_col_length, values_only=True),
-            start=self.user_data_min_row_idx,
-        ):
+    def _parse_rows(self, rows: Iterable[Tuple[Any, ...]]):
+        """单次遍历用户数据行，完成校验，部门收集与用户构建
+
+        异常会在遍历过程中被收集，遍历结束后再按照 用户数据 -> 用户名重复 -> 组织路径 -> 用户构建 的优先级抛出，
+        以保证与分多次遍历时的校验结果一致；若存在异常，则不会写入任何部门 / 用户数据
+        """
+        user_errors: List[LocalDataSourcePluginError] = []
+        org_errors: List[LocalDataSourcePluginError] = []
+        build_errors: List[NumberParseException] = []
+
+        all_usernames: List[str] = []
+        organizations: Set[str] = set()
+        users: List[RawDataSourceUser] = []
+
+        for idx, cell_values in enumerate(rows, start=self.user_data_min_row_idx):
             if not any(cell_values):
                 self.logger.warning(f"empty row found at line {idx} in sheet, skip...")
                 continue
 
             info = dict(zip(self.all_field_names, cell_values, strict=True))
-            # 1. 检查所有必填字段是否有值（注：自定义字段必填在后续的流程中检查）
-            for field_name in self.required_field_names:
-                if not info.get(field_name):
-                    raise RequiredFieldIsEmpty(_("待导入文件中必填字段 {} 存在空值").format(field_name))
-
-            username = info["username"]
-            # 2. 检查用户名是否合法
-            if not USERNAME_REGEX.fullmatch(username):
-                raise InvalidUsername(
-                    _(
-                        "用户名 {} 不符合命名规范: 由3-32位字母、数字、下划线(_)、点(.)、连接符(-)字符组成，以字母或数字开头及结尾",  # noqa: E501
-                    ).format(username)
-                )
+            try:
+                self._validate_user(info)
+            except LocalDataSourcePluginError as e:
+                user_errors.append(e)
+                continue
+
+            all_usernames.append(info["username"].lower())
+
+            try:
+                organizations.update(self._parse_user_organizations(info))
+            except InvalidOrganization as e:
+                org_errors.append(e)
+                continue
+
+            # 已经存在异常的情况下，用户数据不会被使用，无需继续构建
+            if user_errors or org_errors or build_errors:
+                continue
+
+            try:
+                users.append(self._build_user(info))
+            except NumberParseException as e:
+                build_errors.append(e)
+
+        self._raise_first_error(user_errors, all_usernames, org_errors, build_errors)
 
-            # 3. 检查用户不能是自己的 leader
-            if (leaders := info.get("leaders")) and username in [ld.strip() for ld in leaders.split(",")]:
-                raise InvalidLeader(_("待导入文件中用户 {} 不能是自己的直接上级").format(username))
+        self.departments = self._build_departments(organizations)
+        self.users = users
 
-            all_usernames.append(username.lower())
+    @staticmethod
+    def _raise_first_error(
+        user_errors: List[LocalDataSourcePluginError],
+        all_usernames: List[str],
+        org_errors: List[LocalDataSourcePluginError],
+        build_errors: List[NumberParseException],
+    ):
+        """按优先级抛出遍历过程中收集到的首个异常"""
+        if user_errors:
+            raise user_errors[0]
 
-        # 4. 检查用户名是否有重复的（以大小写不敏感的方式检查）
+        # 检查用户名是否有重复的（以大小写不敏感的方式检查）
         if duplicate_usernames := [n for n, cnt in Counter(all_usernames).items() if cnt > 1]:
             raise DuplicateUsername(
                 _(
@@ -189,39 +214,63 @@ class LocalDataSourceDataParser:
                 ).format(", ".join(duplicate_usernames))
             )
 
-    def _parse_departments(self):
+        if org_errors:
+            raise org_errors[0]
+
+        if build_errors:
+            raise build_errors[0]
+
+    def _validate_user(self, info: Dict[str, Any]):
+        # 1. 检查所有必填字段是否有值（注：自定义字段必填在后续的流程中检查）
+        for field_name in self.required_field_names:
+            if not info.get(field_name):
+                raise RequiredFieldIsEmpty(_("待导入文件中必填字段 {} 存在空值").format(field_name))
+
+        username = info["username"]
+        # 2. 检查用户名是否合法
+        if not USERNAME_REGEX.fullmatch(username):
+            raise InvalidUsername(
+                _(
+                    "用户名 {} 不符合命名规范: 由3-32位字母、数字、下划线(_)、点(.)、连接符(-)字符组成，以字母或数字开头及结尾",  # noqa: E501
+                ).format(username)
+            )
+
+        # 3. 检查用户不能是自己的 leader
+        if (leaders := info.get("leaders")) and username in [ld.strip() for ld in leaders.split(",")]:
+            raise InvalidLeader(_("待导入文件中用户 {} 不能是自己的直接上级").format(username))
+
+    def _parse_user_organizations(self, info: Dict[str, Any]) -> Set[str]:
+        """获取用户所属的组织路径（包含所有的父组织）"""
+        username, user_orgs = info["username"], info["organizations"]
+        if not user_orgs:
+            self.logger.info(f"username {username} not provide organization, skip...")
+            return set()
+
         organizations = set()
-        for cell_values in self.sheet.iter_rows(
-            min_row=self.user_data_min_row_idx, max_col=self.valid_col_length, values_only=True
-        ):
-            if not any(cell_values):
-                continue
+        for org in user_orgs.split(","):
+            cur_org = org.strip()
+            if not all(cur_org.split("/")):
+                raise InvalidOrganization(
+                    _(
+                        "用户 {} 组织路径 {} 不合法：不得以 / 开头或结尾或存在连续的 / 字符",
+                    ).format(username, cur_org)
+                )
 
-            username, user_orgs = cell_values[self.username_idx_in_row], cell_values[self.organization_idx_in_row]
-            if not user_orgs:
-                self.logger.info(f"username {username} not provide organization, skip...")
-                continue
+            organizations.add(cur_org)
+            # 所有的父部门都要被添加进来
+            while "/" in cur_org:
+                cur_org, __, __ = cur_org.rpartition("/")
+                organizations.add(cur_org.strip())
 
-            for org in user_orgs.split(","):
-                cur_org = org.strip()
-                if not all(cur_org.split("/")):
-                    raise InvalidOrganization(
-                        _(
-                            "用户 {} 组织路径 {} 不合法：不得以 / 开头或结尾或存在连续的 / 字符",
-                        ).format(username, cur_org)
-                    )
-
-                organizations.add(cur_org)
-                # 所有的父部门都要被添加进来
-                while "/" in cur_org:
-                    cur_org, __, __ = cur_org.rpartition("/")
-                    organizations.add(cur_org.strip())
+        return organizations
 
+    def _build_departments(self, organizations: Set[str]) -> List[RawDataSourceDepartment]:
         # 组织路径：本数据源部门 Code 映射表
         org_code_map = {org: gen_dept_code(org) for org in organizations}
+        departments = []
         for org in organizations:
             parent_org, __, dept_name = org.rpartition("/")
-            self.departments.append(
+            departments.append(
                 RawDataSourceDepartment(
                     code=org_code_map[org],
                     name=dept_name,
@@ -231,40 +280,34 @@ class LocalDataSourceDataParser:
                 )
             )
 
-    def _parse_users(self):
-        for cell_values in self.sheet.iter_rows(
-            min_row=self.user_data_min_row_idx, max_col=self.valid_col_length, values_only=True
-        ):
-            if not any(cell_values):
-                continue
-
-            properties = dict(zip(self.all_field_names, cell_values, strict=True))
-
-            departments, leaders = [], []
-            if organizations := properties.pop("organizations"):
-                departments = [gen_dept_code(org.strip()) for org in organizations.split(",") if org.strip()]
-
-            if leader_names := properties.pop("leaders"):
-                # xlsx 中填写的是 leader 的 username，但在本地数据源中，username 就是 code
-                leaders = [ld.strip() for ld in leader_names.split(",") if ld.strip()]
-
-            phone_number = str(properties.pop("phone_number"))
-            # 默认认为是不带国际代码的
-            phone, country_code = phone_number, settings.DEFAULT_PHONE_COUNTRY_CODE
-            if phone_number.startswith("+"):
-                ret = phonenumbers.parse(phone_number)
-                phone, country_code = str(ret.national_number), str(ret.country_code)
-
-            properties.update({"phone": phone, "phone_country_code": country_code})
-
-            # 格式化，将所有非 None 字段都转成 str 类型
-            properties = {k: str(v) for k, v in properties.items() if v is not None}
-            self.users.append(
-                RawDataSourceUser(
-                    # 本地数据源用户，code 就是 username
-                    code=properties["username"],
-                    properties=properties,
-                    leaders=leaders,
-                    departments=departments,
-                )
-            )
+        return departments
+
+    def _build_user(self, info: Dict[str, Any]) -> RawDataSourceUser:
+        properties = dict(info)
+
+        departments, leaders = [], []
+        if organizations := properties.pop("organizations"):
+            departments = [gen_dept_code(org.strip()) for org in organizations.split(",") if org.strip()]
+
+        if leader_names := properties.pop("leaders"):
+            # xlsx 中填写的是 leader 的 username，但在本地数据源中，username 就是 code
+            leaders = [ld.strip() for ld in leader_names.split(",") if ld.strip()]
+
+        phone_number = str(properties.pop("phone_number"))
+        # 默认认为是不带国际代码的
+        phone, country_code = phone_number, settings.DEFAULT_PHONE_COUNTRY_CODE
+        if phone_number.startswith("+"):
+            ret = phonenumbers.parse(phone_number)
+            phone, country_code = str(ret.national_number), str(ret.country_code)
+
+        properties.update({"phone": phone, "phone_country_code": country_code})
+
+        # 格式化，将所有非 None 字段都转成 str 类型
+        properties = {k: str(v) for k, v in properties.items() if v is not None}
+        return RawDataSourceUser(
+            # 本地数据源用户，code 就是 username
+            code=properties["username"],
+            properties=properties,
+            leaders=leaders,
+            departments=departments,
+        )
@@ -293,6 +293,14 @@ CELERY_BEAT_SCHEDULE = {
         "task": "bkuser.apps.tenant.tasks.update_expired_tenant_user_status",
         "schedule": crontab(minute="0", hour="3"),
     },
+    "periodic_archive_expired_audit_records": {
+        "task": "bkuser.apps.audit.tasks.archive_expired_audit_records",
+        "schedule": crontab(minute="0", hour="2"),
+    },
+    "periodic_reconcile_data_source_resource_stats": {
+        "task": "bkuser.apps.tenant.tasks.reconcile_data_source_resource_stats",
+        "schedule": crontab(minute="0", hour="4"),
+    },
 }
 # Celery 消息队列配置
 CELERY_BROKER_URL = env.str("BK_BROKER_URL", default="")
@@ -658,6 +666,10 @@ TENANT_PHONE_UPDATE_RESTRICTIONS = env.dict("TENANT_PHONE_UPDATE_RESTRICTIONS",
 # 值格式："tenant_id1=not_editable,tenant_id2=editable_directly,..."
 TENANT_EMAIL_UPDATE_RESTRICTIONS = env.dict("TENANT_EMAIL_UPDATE_RESTRICTIONS", default={})
 
+# 定时批量通知（密码 / 账号过期提醒）的发送速率上限，单位：接收者数 / 秒，值小于等于 0 表示不限速
+# 注：所有分片任务（不区分数据源 / 租户）共享该速率上限（基于 Redis 计数），超出上限的接收者会延迟发送
+NOTIFICATION_SEND_RATE_LIMIT = env.int("NOTIFICATION_SEND_RATE_LIMIT", 50)
+
 # 数据导入/导出配置
 # 导入文件大小限制，单位为 MB
 MAX_USER_DATA_FILE_SIZE = env.int("MAX_USER_DATA_FILE_SIZE", 10)
@@ -666,6 +678,16 @@ EXPORT_EXCEL_FILENAME_PREFIX = "bk_user_export"
 # 成员，组织信息导出模板
 EXPORT_ORG_TEMPLATE = MEDIA_ROOT / "excel/export_org_tmpl.xlsx"
 
+# 操作审计记录保留天数（环境变量 AUDIT_RECORD_RETENTION_DAYS），值小于等于 0 表示永久保留
+# 超过保留天数的记录会被每日凌晨执行的定时任务（archive_expired_audit_records）按批压缩，
+# 迁移到归档表（OperationAuditRecordArchive）中，并从审计记录表中删除
+# 注：默认永久保留（不归档），归档后的记录不会在页面 / API 中展示，需要时显式配置开启
+AUDIT_RECORD_RETENTION_DAYS = env.int("AUDIT_RECORD_RETENTION_DAYS", 0)
+# 每个租户的操作审计记录保留天数（环境变量 TENANT_AUDIT_RECORD_RETENTION_DAYS），优先于全局配置，
+# 未配置的租户使用 AUDIT_RECORD_RETENTION_DAYS，值小于等于 0 表示该租户的记录永久保留
+# 值格式："tenant_id1=90,tenant_id2=730,..."
+TENANT_AUDIT_RECORD_RETENTION_DAYS = env.dict("TENANT_AUDIT_RECORD_RETENTION_DAYS", default={})
+
 # 数据源同步默认超时时间（秒）
 DATA_SOURCE_SYNC_DEFAULT_TIMEOUT = env.int("DATA_SOURCE_SYNC_DEFAULT_TIMEOUT", 60 * 60)
 # 租户同步默认超时时间（秒）
@@ -16,9 +16,10 @@
 # to the current version of the project delivered to anyone in the future.
 
 import json
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List
 
 from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, QuerySet
 from django.forms import model_to_dict
 
 
@@ -29,3 +30,29 @@ def get_model_dict(obj) -> Dict[str, Any]:
     model_dict = model_to_dict(obj, fields=fields)
     # 使用 DjangoJSONEncoder 将字典转换为 JSON 字符串，然后再解析回字典
     return json.loads(json.dumps(model_dict, cls=DjangoJSONEncoder))
+
+
+def iter_queryset_in_batches(queryset: QuerySet, batch_size: int) -> Iterator[List[Model]]:
+    """
+    按主键顺序分批（keyset）读取 QuerySet，每批为一次独立的 `pk > 上一批最大主键 LIMIT batch_size` 查询
+
+    Q: 为什么不直接使用 QuerySet.iterator()？
+    A: MySQL 驱动（mysqlclient / PyMySQL）默认使用客户端游标，iterator() 仍会在驱动中缓存整个结果集，
+       无法降低全量读取时的内存占用；按主键分批查询则每次只加载一批数据，且可以利用主键索引
+
+    Note: 返回结果按主键排序，会覆盖 QuerySet 原有的排序规则
+
+    :param queryset: 待读取的 QuerySet
+    :param batch_size: 每批读取的数据条数
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+
+    queryset = queryset.order_by("pk")
+    batch = list(queryset[:batch_size])
+    while batch:
+        yield batch
+        if len(batch) < batch_size:
+            return
+
+        batch = list(queryset.filter(pk__gt=batch[-1].pk)[:batch_size])
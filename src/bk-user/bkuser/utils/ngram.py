@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import unicodedata
+from typing import Optional, Set
+
+# 切分的 gram 长度（三元组）
+NGRAM_SIZE = 3
+
+
+def normalize(value: Optional[str]) -> str:
+    """
+    归一化字符串：兼容分解后去除组合字符（如重音符号），再进行大小写折叠
+
+    Q: 为什么需要比数据库的大小写不敏感匹配（icontains）更宽松？
+    A: 基于 gram 的匹配只用于粗筛候选集，必须保证数据库能匹配上的记录都在候选集中，
+       而 MySQL 的 *_ci 排序规则除大小写外，通常还会忽略重音（如 é = e），因此这里一并去除
+    """
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def split_ngrams(value: Optional[str]) -> Set[str]:
+    """
+    将字符串归一化后，从每个字符开始截取至多 NGRAM_SIZE 个字符作为 gram（末尾不足 NGRAM_SIZE 的也保留）
+
+    Note: 由于末尾的短 gram 也被保留，因此任意长度不超过 NGRAM_SIZE 的子串，必定是某个 gram 的前缀
+    """
+    s = normalize(value)
+    return {s[i : i + NGRAM_SIZE] for i in range(len(s))}
+
+
+def split_full_ngrams(value: Optional[str]) -> Set[str]:
+    """
+    将字符串归一化后，切分出所有长度恰好为 NGRAM_SIZE 的 gram（长度不足 NGRAM_SIZE 时为空集合）
+
+    Note: 若字符串 A 包含字符串 B，则 B 的所有完整 gram 必定都是 A 的 gram，反之则不一定成立
+    """
+    s = normalize(value)
+    return {s[i : i + NGRAM_SIZE] for i in range(len(s) - NGRAM_SIZE + 1)}
@@ -14,8 +14,32 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+import os
+import time
 import uuid
 
 
 def generate_uuid() -> str:
     return uuid.uuid4().hex
+
+
+def generate_time_ordered_uuid() -> str:
+    """
+    生成按时间有序的 UUID（UUIDv7 格式，参考 RFC 9562）
+
+    高 48 位为毫秒级 Unix 时间戳，其余为版本号，变体及随机数，因此生成的 hex 字符串按毫秒单调递增，
+    适合作为写入量较大的表的主键，避免随机主键导致的 B+ 树页分裂
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    # version: 7
+    value |= 0x7 << 76
+    # rand_a: 12 bits
+    value |= (rand >> 62 & 0xFFF) << 64
+    # variant: 0b10
+    value |= 0b10 << 62
+    # rand_b: 62 bits
+    value |= rand & 0x3FFF_FFFF_FFFF_FFFF
+    return uuid.UUID(int=value).hex
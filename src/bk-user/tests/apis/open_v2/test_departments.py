@@ -14,11 +14,20 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+from typing import Dict, List, Tuple
+
 import pytest
+from bkuser.apps.data_source.constants import DataSourceTypeEnum
+from bkuser.apps.data_source.models import DataSource, DataSourceDepartment, DataSourceDepartmentRelation
 from bkuser.apps.tenant.models import TenantDepartment, TenantUser
+from bkuser.plugins.constants import DataSourcePluginEnum
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
+from tests.test_utils.helpers import get_streaming_response_data
+
 pytestmark = pytest.mark.django_db
 
 
@@ -54,6 +63,40 @@ class TestListDepartments:
         assert {d["name"] for d in center_ab["ancestors"]} == {"公司", "部门A"}
         assert {d["name"] for d in center_ab["children"]} == {"小组ABA"}
 
+    def test_list_not_load_whole_org(self, api_client, random_tenant, local_data_source):
+        def _list_departments() -> Tuple[int, int, List[Dict]]:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = api_client.get(
+                    reverse("open_v2.list_departments"), data={"with_ancestors": True, "page": 1, "page_size": 5}
+                )
+            assert resp.status_code == status.HTTP_200_OK
+
+            # 重新执行捕获的 SQL，统计从数据库读取的总行数
+            with connection.cursor() as cursor:
+                rows = 0
+                for query in ctx.captured_queries:
+                    cursor.execute(query["sql"])
+                    rows += len(cursor.fetchall())
+
+            return len(ctx.captured_queries), rows, resp.data["results"]
+
+        # 预热租户元数据缓存
+        _list_departments()
+        query_count, row_count, results = _list_departments()
+
+        # 其他租户数据源下新增大量部门，不影响当前页的查询次数 & 读取行数
+        data_source = DataSource.objects.create(
+            owner_tenant_id=random_tenant.id, type=DataSourceTypeEnum.REAL, plugin_id=DataSourcePluginEnum.LOCAL
+        )
+        parent = None
+        for idx in range(30):
+            dept = DataSourceDepartment.objects.create(data_source=data_source, code=f"dept-{idx}", name=f"部门{idx}")
+            parent = DataSourceDepartmentRelation.objects.create(
+                department=dept, parent=parent, data_source=data_source
+            )
+
+        assert _list_departments() == (query_count, row_count, results)
+
     @pytest.mark.parametrize(
         ("lookup_field", "lookup_value", "result_count"),
         [("name", "中心AA", 1), ("name", "小组A", 0), ("level", "0", 1), ("level", "1", 2), ("level", "2", 3)],
@@ -86,7 +129,7 @@ class TestListDepartments:
     def test_no_page(self, api_client, local_data_source):
         resp = api_client.get(reverse("open_v2.list_departments"), data={"page": 1, "page_size": 5, "no_page": True})
         assert resp.status_code == status.HTTP_200_OK
-        assert len(resp.data) == 9  # noqa: PLR2004
+        assert len(get_streaming_response_data(resp)) == 9  # noqa: PLR2004
 
 
 class TestRetrieveDepartment:
@@ -119,6 +162,22 @@ class TestRetrieveDepartment:
         assert resp.status_code == status.HTTP_200_OK
         assert resp.data.keys() == {"id", "name", "category_id", "parent", "level"}
 
+    def test_retrieve_queries_not_grow_with_level(self, api_client, default_tenant, local_data_source):
+        # 预热租户元数据（默认租户等）缓存
+        api_client.get(reverse("open_v2.retrieve_department", kwargs={"id": "404"}))
+        query_counts = []
+        # 根部门 / 二级部门 / 四级部门（祖先、子部门数量各不相同）
+        for dept_name in ["公司", "部门A", "小组ABA"]:
+            dept = TenantDepartment.objects.get(data_source_department__name=dept_name, tenant=default_tenant)
+            with CaptureQueriesContext(connection) as ctx:
+                resp = api_client.get(
+                    reverse("open_v2.retrieve_department", kwargs={"id": dept.id}), data={"with_ancestors": True}
+                )
+            assert resp.status_code == status.HTTP_200_OK
+            query_counts.append(len(ctx.captured_queries))
+
+        assert len(set(query_counts)) == 1
+
     def test_with_invalid_dept_id(self, api_client):
         resp = api_client.get(reverse("open_v2.retrieve_department", kwargs={"id": "404"}))
         assert resp.status_code == status.HTTP_404_NOT_FOUND
@@ -175,6 +234,25 @@ class TestListProfileDepartments:
         assert {d["full_name"] for d in resp.data} == {"公司/部门A/中心AB/小组ABA", "公司/部门B/中心BA"}
         assert "family" not in resp.data[0]
 
+    def test_list_queries_not_grow_with_departments(self, api_client, default_tenant, local_data_source):
+        # 预热租户元数据（默认租户等）缓存
+        api_client.get(reverse("open_v2.list_profile_departments", kwargs={"lookup_value": "404"}))
+        query_counts = []
+        # zhangsan 只属于根部门，lisi 属于两个部门，lushi 属于两个不同分支的深层部门
+        for username in ["zhangsan", "lisi", "lushi"]:
+            tenant_user = TenantUser.objects.get(
+                tenant=default_tenant, data_source=local_data_source, data_source_user__username=username
+            )
+            with CaptureQueriesContext(connection) as ctx:
+                resp = api_client.get(
+                    reverse("open_v2.list_profile_departments", kwargs={"lookup_value": tenant_user.id}),
+                    data={"lookup_field": "username", "with_ancestors": True},
+                )
+            assert resp.status_code == status.HTTP_200_OK
+            query_counts.append(len(ctx.captured_queries))
+
+        assert len(set(query_counts)) == 1
+
     def test_list_with_invalid_user(self, api_client):
         """用户不存在的情况"""
         resp = api_client.get(
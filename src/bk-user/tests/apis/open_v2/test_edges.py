@@ -15,11 +15,27 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 import pytest
-from bkuser.apps.data_source.models import DataSourceUser
-from bkuser.apps.tenant.models import TenantDepartment
+from bkuser.apis.open_v2.constants import ID_LOOKUP_CHUNK_SIZE
+from bkuser.apis.open_v2.views.edges import DepartmentProfileRelationListApi
+from bkuser.apps.data_source.constants import DataSourceTypeEnum
+from bkuser.apps.data_source.models import (
+    DataSource,
+    DataSourceDepartment,
+    DataSourceDepartmentUserRelation,
+    DataSourceUser,
+)
+from bkuser.apps.tenant.constants import CollaborationStrategyStatus
+from bkuser.apps.tenant.models import CollaborationStrategy, TenantDepartment
+from bkuser.common.cache import Cache, CacheEnum, CacheKeyPrefixEnum
+from bkuser.plugins.general.models import GeneralDataSourcePluginConfig
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
+from tests.test_utils.data_source import init_data_source_users_depts_and_relations
+from tests.test_utils.helpers import generate_random_string, get_streaming_response_data
+
 pytestmark = pytest.mark.django_db
 
 
@@ -46,7 +62,85 @@ class TestListDeptProfileRelations:
 
         assert resp.status_code == status.HTTP_200_OK
         # 不分页模式下，没有 count, results 结构
-        assert len(resp.data) == 26  # noqa: PLR2004
+        assert len(get_streaming_response_data(resp)) == 26  # noqa: PLR2004
+
+    def test_no_page_with_large_relations(self, api_client, default_tenant, local_data_source):
+        dept_count = ID_LOOKUP_CHUNK_SIZE * 2 + 100
+        depts = DataSourceDepartment.objects.bulk_create(
+            [
+                DataSourceDepartment(data_source=local_data_source, code=f"large-{i}", name=f"large-{i}")
+                for i in range(dept_count)
+            ]
+        )
+        tenant_depts = TenantDepartment.objects.bulk_create(
+            [
+                TenantDepartment(tenant=default_tenant, data_source_department=d, data_source=local_data_source)
+                for d in depts
+            ]
+        )
+        users = list(DataSourceUser.objects.filter(data_source=local_data_source))
+        DataSourceDepartmentUserRelation.objects.bulk_create(
+            [
+                DataSourceDepartmentUserRelation(
+                    department=d, user=users[idx % len(users)], data_source=local_data_source
+                )
+                for idx, d in enumerate(depts)
+            ]
+        )
+        # 避免其他单元测试写入的缓存影响结果
+        Cache(CacheEnum.REDIS, CacheKeyPrefixEnum.V2_API).delete(DepartmentProfileRelationListApi.cache_key)
+
+        with CaptureQueriesContext(connection) as ctx:
+            resp = api_client.get(reverse("open_v2.list_department_profile_relations"), data={"no_page": True})
+        assert resp.status_code == status.HTTP_200_OK
+
+        # 租户部门 ID 需要分批查询，单条 SQL 中的部门 ID 数量有上限
+        tenant_dept_queries = [q for q in ctx.captured_queries if TenantDepartment._meta.db_table in q["sql"]]
+        assert len(tenant_dept_queries) > 1
+
+        relations = get_streaming_response_data(resp)
+        # 原有 13 条部门用户关系 + 新增的关系
+        assert len(relations) == 13 + dept_count
+        # 部门 ID 需要准确地转换为租户部门 ID
+        tenant_dept_id_map = {d.data_source_department_id: d.id for d in tenant_depts}
+        expected = {
+            (tenant_dept_id_map[rel.department_id], rel.user_id)
+            for rel in DataSourceDepartmentUserRelation.objects.filter(department__in=depts)
+        }
+        assert expected <= {(r["department_id"], r["profile_id"]) for r in relations}
+
+    def test_no_page_with_unsynced_collaboration(
+        self, api_client, default_tenant, random_tenant, local_data_source, general_ds_plugin_cfg, general_ds_plugin
+    ):
+        # 协同策略已确认，但数据尚未同步到默认租户，此时数据源部门没有对应的租户部门
+        data_source = DataSource.objects.create(
+            owner_tenant_id=random_tenant.id,
+            type=DataSourceTypeEnum.REAL,
+            plugin=general_ds_plugin,
+            plugin_config=GeneralDataSourcePluginConfig(**general_ds_plugin_cfg),
+        )
+        init_data_source_users_depts_and_relations(data_source)
+        CollaborationStrategy.objects.create(
+            name=generate_random_string(),
+            source_tenant=random_tenant,
+            target_tenant=default_tenant,
+            source_status=CollaborationStrategyStatus.ENABLED,
+            target_status=CollaborationStrategyStatus.ENABLED,
+            source_config={},
+            target_config={},
+        )
+        # 避免其他单元测试写入的缓存影响结果
+        Cache(CacheEnum.REDIS, CacheKeyPrefixEnum.V2_API).delete(DepartmentProfileRelationListApi.cache_key)
+
+        resp = api_client.get(reverse("open_v2.list_department_profile_relations"), data={"no_page": True})
+        assert resp.status_code == status.HTTP_200_OK
+
+        # 未同步的协同数据源部门无法转换为租户部门 ID，需要跳过，只返回默认租户本身数据源的关系
+        relations = get_streaming_response_data(resp)
+        assert len(relations) == 13  # noqa: PLR2004
+        assert TenantDepartment.objects.filter(
+            tenant=default_tenant, id__in={r["department_id"] for r in relations}
+        ).count() == len({r["department_id"] for r in relations})
 
 
 class TestListProfileLeaderRelations:
@@ -72,4 +166,4 @@ class TestListProfileLeaderRelations:
 
         assert resp.status_code == status.HTTP_200_OK
         # 不分页模式下，没有 count, results 结构
-        assert len(resp.data) == 22  # noqa: PLR2004
+        assert len(get_streaming_response_data(resp)) == 22  # noqa: PLR2004
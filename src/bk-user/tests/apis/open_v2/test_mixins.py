@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import pytest
+from bkuser.apis.open_v2.mixins import DataSourceDomainMixin, DefaultTenantMixin
+from bkuser.apps.data_source.models import DataSource
+from bkuser.apps.tenant.constants import CollaborationStrategyStatus
+from bkuser.apps.tenant.models import CollaborationStrategy, TenantUserIDGenerateConfig
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+
+def _load_metadata():
+    """模拟单次兼容 API 请求，读取所有租户元数据"""
+    tenant_mixin = DefaultTenantMixin()
+    return (
+        tenant_mixin.default_tenant,
+        list(tenant_mixin.get_real_user_data_sources()),
+        tenant_mixin.get_collaboration_field_mapping(),
+        DataSourceDomainMixin().data_source_to_domain_map,
+    )
+
+
+class TestTenantMetadataCache:
+    def test_warm_cache_without_metadata_queries(self, default_tenant, local_data_source, collaboration_data_source):
+        TenantUserIDGenerateConfig.objects.create(
+            data_source=local_data_source, target_tenant=default_tenant, domain="domain.com"
+        )
+        cold = _load_metadata()
+
+        with CaptureQueriesContext(connection) as ctx:
+            warm = _load_metadata()
+
+        assert warm == cold
+        # 缓存预热后，只剩下数据源本身的查询，不再查询默认租户，协同策略，租户用户 ID 生成配置等
+        assert len(ctx.captured_queries) == 1
+        assert DataSource._meta.db_table in ctx.captured_queries[0]["sql"]
+
+    def test_visible_after_strategy_changed(self, default_tenant, collaboration_data_source):
+        assert DefaultTenantMixin().get_collaboration_field_mapping() == {}
+
+        strategy = CollaborationStrategy.objects.get(target_tenant=default_tenant)
+        strategy.target_config["field_mapping"] = [{"source_field": "age", "target_field": "年龄"}]
+        strategy.save(update_fields=["target_config", "updated_at"])
+
+        assert DefaultTenantMixin().get_collaboration_field_mapping() == {(strategy.source_tenant_id, "age"): "年龄"}
+
+    def test_visible_after_strategy_deleted(self, default_tenant, collaboration_data_source):
+        assert collaboration_data_source in DefaultTenantMixin().get_real_user_data_sources()
+
+        CollaborationStrategy.objects.filter(target_tenant=default_tenant).delete()
+
+        assert collaboration_data_source not in DefaultTenantMixin().get_real_user_data_sources()
+
+    def test_visible_after_id_config_changed(self, default_tenant, local_data_source):
+        assert DataSourceDomainMixin().get_domain(local_data_source.id, default_tenant.id) == ""
+
+        TenantUserIDGenerateConfig.objects.create(
+            data_source=local_data_source, target_tenant=default_tenant, domain="domain.com"
+        )
+
+        assert DataSourceDomainMixin().get_domain(local_data_source.id, default_tenant.id) == "domain.com"
+
+
+class TestGetRealUserDataSources:
+    def test_exclude_deleting_strategy(self, default_tenant, collaboration_data_source):
+        assert collaboration_data_source in DefaultTenantMixin().get_real_user_data_sources()
+
+        # 删除中的协同策略，其数据正在被分批清理，不再对外提供
+        strategy = CollaborationStrategy.objects.get(target_tenant=default_tenant)
+        strategy.source_status = CollaborationStrategyStatus.DELETING
+        strategy.save(update_fields=["source_status", "updated_at"])
+
+        assert collaboration_data_source not in DefaultTenantMixin().get_real_user_data_sources()
@@ -15,10 +15,26 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import datetime
+import operator
+import random
+from functools import reduce
+
 import pytest
-from bkuser.apps.tenant.models import TenantDepartment
+from bkuser.apis.open_v2.renderers import BkLegacyApiJSONRenderer
+from bkuser.apis.open_v2.serializers.profilers import ProfileListInputSLZ
+from bkuser.apis.open_v2.views.profilers import ProfileListApi
+from bkuser.apps.data_source.models import DataSourceUser, DataSourceUserLeaderRelation
+from bkuser.apps.tenant.models import TenantDepartment, TenantUser, TenantUserIDGenerateConfig
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.response import Response
+
+from tests.test_utils.tenant import create_tenant, sync_users_depts_to_tenant
 
 pytestmark = pytest.mark.django_db
 
@@ -30,6 +46,47 @@ class TestListProfiles:
         assert resp.data["count"] == 22
         assert len(resp.data["results"]) == 10
 
+    def test_list_queries_not_grow_with_page_size(
+        self, api_client, default_tenant, local_data_source, collaboration_data_source
+    ):
+        for idx, data_source in enumerate([local_data_source, collaboration_data_source]):
+            TenantUserIDGenerateConfig.objects.create(
+                data_source=data_source, target_tenant=default_tenant, domain=f"domain-{idx}.com"
+            )
+
+        # 预热租户元数据（默认租户，协同策略，域名配置等）缓存
+        api_client.get(reverse("open_v2.list_profiles"), data={"page": 1, "page_size": 1})
+        query_counts = []
+        for page_size in [5, 100]:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = api_client.get(reverse("open_v2.list_profiles"), data={"page": 1, "page_size": page_size})
+            assert resp.status_code == status.HTTP_200_OK
+            query_counts.append(len(ctx.captured_queries))
+
+        # 用户信息构建过程中不应存在逐行的额外查询
+        assert query_counts[0] == query_counts[1]
+        assert len(resp.data["results"]) == 22
+        assert {u["domain"] for u in resp.data["results"]} == {"domain-0.com", "domain-1.com"}
+
+    @pytest.mark.parametrize("fields", ["", "username,display_name,leader", "departments"])
+    def test_list_with_no_page(self, api_client, local_data_source, collaboration_data_source, fields):
+        params = {"fields": fields} if fields else {}
+        paged_resp = api_client.get(reverse("open_v2.list_profiles"), data={**params, "page_size": 2000})
+        streaming_resp = api_client.get(reverse("open_v2.list_profiles"), data={**params, "no_page": True})
+        assert streaming_resp.status_code == status.HTTP_200_OK
+        assert streaming_resp.streaming
+
+        # 全量拉取按主键（即 username）分批读取，因此需要将分页结果按 username 排序
+        # 注：指定 fields 时分页结果中可能不包含 username，因此需要另外获取
+        usernames = [
+            u["username"]
+            for u in api_client.get(reverse("open_v2.list_profiles"), data={"page_size": 2000}).data["results"]
+        ]
+        results = [u for _, u in sorted(zip(usernames, paged_resp.data["results"]), key=lambda x: x[0])]
+        # 全量拉取的流式输出，与非流式（BkLegacyApiJSONRenderer）渲染的结果逐字节一致
+        rendered = BkLegacyApiJSONRenderer().render(results, renderer_context={"response": Response()})
+        assert b"".join(streaming_resp.streaming_content) == rendered
+
     def test_list_with_exist_departments(self, api_client, local_data_source, collaboration_data_source):
         department_ids = TenantDepartment.objects.values_list("id", flat=True)
         resp = api_client.get(
@@ -54,3 +111,245 @@ class TestListProfiles:
         )
         assert resp.status_code == status.HTTP_400_BAD_REQUEST
         assert "unsupported fuzzy lookup field: departments" in resp.data["message"]
+
+
+class TestListProfilesFilterQueryset:
+    @staticmethod
+    def _filter_queryset(params):
+        slz = ProfileListInputSLZ(data=params)
+        slz.is_valid(raise_exception=True)
+        return ProfileListApi()._filter_queryset(slz.validated_data)
+
+    @staticmethod
+    def _gen_lookup_params(lookup_field: str, is_exact: bool, default_tenant) -> dict:
+        tenant_users = TenantUser.objects.filter(tenant=default_tenant)
+        if lookup_field == "create_time":
+            # IAM 定制的查询：从大到小，间隔一分钟的时间列表
+            now = timezone.now().astimezone(datetime.timezone.utc)
+            values = [(now + datetime.timedelta(minutes=m)).strftime("%Y-%m-%d %H:%M") for m in [1, 0, -1]]
+        elif lookup_field == "wx_userid":
+            TenantUser.objects.filter(id__in=tenant_users.values_list("id", flat=True)[:3]).update(wx_userid="wx_test")
+            values = ["wx_test"]
+        elif lookup_field == "departments":
+            # 部门 A & 中心 AA，lisi 同时属于这两个部门
+            values = TenantDepartment.objects.filter(
+                tenant=default_tenant, data_source_department__name__in=["部门A", "中心AA"]
+            ).values_list("id", flat=True)
+        else:
+            values = {
+                "id": tenant_users.values_list("data_source_user_id", flat=True)[:5],
+                "username": tenant_users.values_list("id", flat=True)[:5] if is_exact else ["a", "1"],
+                "display_name": ["张三", "李四"] if is_exact else ["王", "三"],
+                "email": ["zhangsan@m.com", "lisi@m.com"] if is_exact else ["@m.com"],
+                "telephone": ["13512345671"] if is_exact else ["135"],
+                "category_id": tenant_users.values_list("data_source_id", flat=True).distinct(),
+                "status": ["NORMAL", "DISABLED"],
+                "staff_status": ["IN"],
+                "domain": ["domain.com"],
+            }[lookup_field]
+
+        lookup_key = "exact_lookups" if is_exact else "fuzzy_lookups"
+        return {"lookup_field": lookup_field, lookup_key: ",".join(map(str, values))}
+
+    @pytest.mark.parametrize(
+        ("lookup_field", "is_exact"),
+        [
+            ("id", True),
+            ("username", True),
+            ("username", False),
+            ("display_name", True),
+            ("display_name", False),
+            ("email", True),
+            ("email", False),
+            ("telephone", True),
+            ("telephone", False),
+            ("wx_userid", True),
+            ("category_id", True),
+            ("status", True),
+            ("staff_status", True),
+            ("domain", True),
+            ("departments", True),
+            ("create_time", False),
+        ],
+    )
+    def test_results_same_as_distinct(
+        self, default_tenant, local_data_source, collaboration_data_source, lookup_field, is_exact
+    ):
+        TenantUserIDGenerateConfig.objects.create(
+            data_source=local_data_source, target_tenant=default_tenant, domain="domain.com"
+        )
+        queryset = self._filter_queryset(self._gen_lookup_params(lookup_field, is_exact, default_tenant))
+
+        assert not queryset.query.distinct
+        usernames = list(queryset.values_list("id", flat=True))
+        assert usernames
+        # 不使用 distinct 的过滤结果，与使用 distinct 的结果完全一致（不存在重复的行）
+        assert sorted(usernames) == sorted(queryset.distinct().values_list("id", flat=True))
+
+    @staticmethod
+    def _gen_random_users(rand: random.Random, default_tenant, data_source) -> None:
+        """随机生成数据源用户 & 租户用户，部分租户用户使用自定义的邮箱 / 手机号"""
+        alphabet = "abcdeABCDE_%.@-01张三李é"
+
+        def _rand_str(max_length: int) -> str:
+            return "".join(rand.choices(alphabet, k=rand.randint(0, max_length)))
+
+        data_source_users = DataSourceUser.objects.bulk_create(
+            [
+                DataSourceUser(
+                    data_source=data_source,
+                    code=f"gen-{i}",
+                    username=f"gen-{i}",
+                    full_name=_rand_str(8),
+                    email=_rand_str(12),
+                    phone="".join(rand.choices("0123456789", k=rand.randint(0, 11))),
+                )
+                for i in range(80)
+            ]
+        )
+        tenant_users = [
+            TenantUser(
+                id=f"gen-{i}",
+                tenant=default_tenant,
+                data_source=data_source,
+                data_source_user=DataSourceUser.objects.get(data_source=data_source, code=u.code),
+                is_inherited_email=rand.random() < 0.5,  # noqa: PLR2004
+                custom_email=_rand_str(12),
+                is_inherited_phone=rand.random() < 0.5,  # noqa: PLR2004
+                custom_phone="".join(rand.choices("0123456789", k=rand.randint(0, 11))),
+            )
+            for i, u in enumerate(data_source_users)
+        ]
+        # 一半通过批量创建，一半逐个创建
+        TenantUser.objects.bulk_create(tenant_users[:40])
+        for tenant_user in tenant_users[40:]:
+            tenant_user.save()
+
+    @staticmethod
+    def _gen_legacy_query(lookup_field: str, value: str) -> Q:
+        """原有的模糊查询条件（不使用 gram 粗筛）"""
+        if lookup_field == "display_name":
+            return Q(data_source_user__full_name__icontains=value)
+
+        field = "phone" if lookup_field == "telephone" else lookup_field
+        return Q(**{f"is_inherited_{field}": True, f"data_source_user__{field}__icontains": value}) | Q(
+            **{f"is_inherited_{field}": False, f"custom_{field}__icontains": value}
+        )
+
+    @pytest.mark.parametrize("lookup_field", ["display_name", "email", "telephone"])
+    def test_fuzzy_lookups_same_as_legacy(self, default_tenant, local_data_source, lookup_field):
+        rand = random.Random(f"fuzzy-{lookup_field}")
+        self._gen_random_users(rand, default_tenant, local_data_source)
+
+        # 模糊查询的关键字：从已有的值中随机截取子串（随机大小写），以及随机生成的字符串
+        tenant_users = TenantUser.objects.filter(tenant=default_tenant).select_related("data_source_user")
+        values = [
+            tu.data_source_user.full_name
+            if lookup_field == "display_name"
+            else (tu.email if lookup_field == "email" else tu.phone_info[0])
+            for tu in tenant_users
+        ]
+        keywords = []
+        for value in rand.sample([v for v in values if v], 40):
+            start = rand.randrange(len(value))
+            sub = value[start : start + rand.randint(1, 6)]
+            keywords.append("".join(c.upper() if rand.random() < 0.5 else c for c in sub))  # noqa: PLR2004
+        keywords += ["".join(rand.choices("abcAB_%.@01三é", k=rand.randint(1, 5))) for _ in range(20)]
+
+        for keyword in keywords:
+            # 单个关键字 & 多个关键字（Or 关系）的查询结果，都与原有的模糊查询结果一致
+            for lookup_values in [[keyword], [keyword, rand.choice(keywords)]]:
+                queryset = self._filter_queryset(
+                    {"lookup_field": lookup_field, "fuzzy_lookups": ",".join(lookup_values)}
+                )
+                # 使用 gram 表粗筛候选用户
+                assert "lookupgram" in str(queryset.query)
+
+                legacy_queryset = self._filter_queryset({}).filter(
+                    reduce(operator.or_, [self._gen_legacy_query(lookup_field, v) for v in lookup_values])
+                )
+                assert sorted(queryset.values_list("id", flat=True)) == sorted(
+                    legacy_queryset.values_list("id", flat=True)
+                ), lookup_values
+
+    @pytest.mark.skipif(connection.vendor != "sqlite", reason="EXPLAIN output is backend specific")
+    def test_base_query_without_temp_table(self, local_data_source, collaboration_data_source):
+        plan = self._filter_queryset({}).explain()
+        # SQLite 使用 DISTINCT 时执行计划中会出现 "USE TEMP B-TREE FOR DISTINCT"
+        assert "TEMP B-TREE" not in plan
+
+
+class TestGetLeaderMap:
+    def test_rows_not_grow_with_collaboration_tenants(self, default_tenant, collaboration_data_source):
+        # 同一个数据源同步到多个租户下（协同场景）
+        for idx in range(5):
+            sync_users_depts_to_tenant(create_tenant(f"collaboration-{idx}"), collaboration_data_source)
+
+        tenant_users = TenantUser.objects.filter(tenant=default_tenant, data_source=collaboration_data_source)
+        data_source_user_ids = [u.data_source_user_id for u in tenant_users]
+        with CaptureQueriesContext(connection) as ctx:
+            leader_map = ProfileListApi._get_leader_map(data_source_user_ids, {default_tenant.id})
+
+        # 只查询页面中用户所在租户的 Leader，查询的行数与协同租户数量无关
+        leader_ids = set(
+            DataSourceUserLeaderRelation.objects.filter(user_id__in=data_source_user_ids).values_list(
+                "leader_id", flat=True
+            )
+        )
+        leader_sql = next(q["sql"] for q in ctx.captured_queries if TenantUser._meta.db_table in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(leader_sql)
+            assert len(cursor.fetchall()) == len(leader_ids)
+
+        assert leader_map
+        assert {tenant_id for tenant_id, _ in leader_map} == {default_tenant.id}
+        assert all(
+            leader["username"] in {u.id for u in tenant_users} for leaders in leader_map.values() for leader in leaders
+        )
+
+
+class TestListDepartmentProfiles:
+    @staticmethod
+    def _get_dept_id(tenant_id: str, name: str) -> int:
+        return TenantDepartment.objects.get(tenant_id=tenant_id, data_source_department__name=name).id
+
+    @pytest.mark.parametrize(
+        ("recursive", "usernames"),
+        [
+            (False, {"lisi", "wangwu"}),
+            (True, {"lisi", "wangwu", "zhaoliu", "liuqi", "maiba", "yangjiu", "lushi", "linshiyi"}),
+        ],
+    )
+    def test_list(self, api_client, default_tenant, local_data_source, recursive, usernames):
+        dept_id = self._get_dept_id(default_tenant.id, "部门A")
+        resp = api_client.get(
+            reverse("open_v2.list_department_profiles", kwargs={"id": dept_id}),
+            data={"recursive": recursive, "page": 1, "page_size": 100},
+        )
+        assert resp.status_code == status.HTTP_200_OK
+
+        # 同时属于多个子部门的用户（lisi，wangwu，lushi）不会重复
+        expected = TenantUser.objects.filter(
+            tenant=default_tenant, data_source_user__username__in=usernames
+        ).values_list("id", flat=True)
+        assert resp.data["count"] == len(usernames)
+        assert sorted(u["username"] for u in resp.data["results"]) == sorted(expected)
+
+    def test_recursive_queries_not_grow_with_subtree(self, api_client, default_tenant, local_data_source):
+        # 预热租户元数据（协同策略，域名配置等）缓存
+        dept_id = self._get_dept_id(default_tenant.id, "小组AAA")
+        api_client.get(reverse("open_v2.list_department_profiles", kwargs={"id": dept_id}))
+
+        query_counts = []
+        for name in ["公司", "小组AAA"]:
+            dept_id = self._get_dept_id(default_tenant.id, name)
+            with CaptureQueriesContext(connection) as ctx:
+                resp = api_client.get(
+                    reverse("open_v2.list_department_profiles", kwargs={"id": dept_id}),
+                    data={"recursive": True, "page": 1, "page_size": 100},
+                )
+            assert resp.status_code == status.HTTP_200_OK
+            query_counts.append(len(ctx.captured_queries))
+
+        # 根部门（整个组织）与叶子部门的查询次数一致
+        assert query_counts[0] == query_counts[1]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import pytest
+from bkuser.apis.open_v2.renderers import BkLegacyApiJSONRenderer, make_legacy_json_streaming_response
+from rest_framework.response import Response
+
+
+def _render(data) -> bytes:
+    return BkLegacyApiJSONRenderer().render(data, renderer_context={"response": Response()})
+
+
+@pytest.mark.parametrize(
+    "items",
+    [
+        [],
+        [{"id": 1, "name": "公司"}],
+        [{"id": i, "name": f"部门-{i}", "extras": {"desc": "\u2028换行"}, "enabled": True} for i in range(7)],
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_make_legacy_json_streaming_response(items, chunk_size):
+    resp = make_legacy_json_streaming_response(iter(items), chunk_size=chunk_size)
+
+    assert resp["Content-Type"] == "application/json"
+    # 流式输出的内容需要与 BkLegacyApiJSONRenderer 渲染结果逐字节一致
+    assert b"".join(resp.streaming_content) == _render(items)
+
+
+def test_make_legacy_json_streaming_response_error(caplog):
+    def _items():
+        yield {"id": 1}
+        raise ValueError("db gone away")
+
+    resp = make_legacy_json_streaming_response(_items(), chunk_size=1)
+    streaming_content = iter(resp.streaming_content)
+    # 首批数据已经输出，异常发生后响应内容被截断
+    assert next(streaming_content) == _render([])[: _render([]).rindex(b"[]")] + b"["
+    assert next(streaming_content) == b'{"id":1}'
+    with pytest.raises(ValueError, match="db gone away"):
+        next(streaming_content)
+
+    assert "the response body is truncated" in caplog.text
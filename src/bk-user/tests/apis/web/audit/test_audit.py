@@ -15,8 +15,14 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+from datetime import timedelta
+
 import pytest
+from bkuser.apps.audit.models import OperationAuditRecord
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 
 pytestmark = pytest.mark.django_db
@@ -217,3 +223,62 @@ class TestAuditRecordListApi:
         assert resp.status_code == status.HTTP_200_OK
         assert resp.data["count"] == 4
         assert len(resp.data["results"]) == 2
+
+
+class TestAuditRecordListApiWithCursor:
+    @pytest.fixture
+    def many_audit_records(self, bk_user, default_tenant):
+        created_at = timezone.now()
+        records = [
+            OperationAuditRecord(
+                creator=bk_user.username,
+                tenant_id=default_tenant.id,
+                operation="modify_data_source",
+                object_type="data_source",
+                object_id=str(idx),
+                object_name=f"DataSource{idx}",
+            )
+            for idx in range(25)
+        ]
+        OperationAuditRecord.objects.bulk_create(records)
+        # 部分记录的创建时间相同，需要依赖 id 保证翻页不重不漏
+        for idx, record in enumerate(records):
+            OperationAuditRecord.objects.filter(id=record.id).update(
+                created_at=created_at - timedelta(seconds=idx // 3)
+            )
+        return records
+
+    def test_iterate_all_pages(self, api_client, many_audit_records):
+        object_ids, cursor = [], ""
+        with CaptureQueriesContext(connection) as ctx:
+            while True:
+                resp = api_client.get(reverse("audit.list"), data={"cursor": cursor, "page_size": 10})
+                assert resp.status_code == status.HTTP_200_OK
+                assert "count" not in resp.data
+
+                object_ids += [r["object_name"] for r in resp.data["results"]]
+                if not (cursor := resp.data["next_cursor"]):
+                    break
+
+        assert object_ids == list(
+            OperationAuditRecord.objects.filter(id__in=[r.id for r in many_audit_records])
+            .order_by("-created_at", "-id")
+            .values_list("object_name", flat=True)
+        )
+        assert len(set(object_ids)) == 25  # noqa: PLR2004
+        # 游标分页不会使用 OFFSET & COUNT
+        audit_queries = [q["sql"] for q in ctx.captured_queries if "audit_operationauditrecord" in q["sql"]]
+        assert len(audit_queries) == 3  # noqa: PLR2004
+        assert not any("OFFSET" in sql or "COUNT(" in sql for sql in audit_queries)
+
+    def test_with_filter(self, api_client, many_audit_records, audit_records):
+        resp = api_client.get(reverse("audit.list"), data={"cursor": "", "operation": "create_data_source"})
+
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.data["next_cursor"] is None
+        assert [r["object_name"] for r in resp.data["results"]] == ["DataSource1"]
+
+    def test_invalid_cursor(self, api_client, many_audit_records):
+        resp = api_client.get(reverse("audit.list"), data={"cursor": "invalid"})
+
+        assert resp.status_code == status.HTTP_400_BAD_REQUEST
@@ -14,11 +14,14 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+from unittest import mock
+
 import pytest
 from bkuser.apps.data_source.constants import DataSourceTypeEnum
 from bkuser.apps.data_source.models import DataSource
 from bkuser.apps.tenant.constants import CollaborationStrategyStatus
-from bkuser.apps.tenant.models import TenantDepartment, TenantUser
+from bkuser.apps.tenant.models import CollaborationStrategy, TenantDepartment, TenantUser
+from bkuser.apps.tenant.tasks import delete_collaboration_strategy
 from bkuser.plugins.local.models import LocalDataSourcePluginConfig
 from django.urls import reverse
 from rest_framework import status
@@ -141,11 +144,21 @@ class TestCollaborationStrategyDestroyApi:
         assert TenantUser.objects.filter(**queryset_filters).exists()
         assert TenantDepartment.objects.filter(**queryset_filters).exists()
 
-        resp = api_client.delete(
-            reverse("collaboration.to-strategy.update_destroy", kwargs={"id": collaborate_to_strategy.id})
-        )
+        with mock.patch("bkuser.apis.web.collaboration.views.delete_collaboration_strategy.delay") as delete_task:
+            resp = api_client.delete(
+                reverse("collaboration.to-strategy.update_destroy", kwargs={"id": collaborate_to_strategy.id})
+            )
         assert resp.status_code == status.HTTP_204_NO_CONTENT
 
+        # 策略被标记为删除中，数据由后台任务清理，页面上不再可见
+        collaborate_to_strategy.refresh_from_db()
+        assert collaborate_to_strategy.source_status == CollaborationStrategyStatus.DELETING
+        delete_task.assert_called_once_with(collaborate_to_strategy.id)
+        assert not api_client.get(reverse("collaboration.to-strategy.list_create")).data
+
+        delete_collaboration_strategy(collaborate_to_strategy.id)
+
+        assert not CollaborationStrategy.objects.filter(id=collaborate_to_strategy.id).exists()
         assert not TenantUser.objects.filter(**queryset_filters).exists()
         assert not TenantDepartment.objects.filter(**queryset_filters).exists()
 
@@ -23,7 +23,15 @@ from bkuser.apps.data_source.models import DataSource, DataSourceDepartment, Dat
 from bkuser.apps.idp.constants import INVALID_REAL_DATA_SOURCE_ID, IdpStatus
 from bkuser.apps.idp.models import Idp, IdpSensitiveInfo
 from bkuser.apps.sync.constants import SyncTaskStatus
-from bkuser.apps.sync.models import DataSourceSyncTask
+from bkuser.apps.sync.models import DataSourceSyncTask, DataSourceSyncTaskLog
+from bkuser.apps.tenant.constants import CollaborationScopeType, CollaborationStrategyStatus
+from bkuser.apps.tenant.models import (
+    CollaborationStrategy,
+    DataSourceResourceStats,
+    Tenant,
+    TenantDepartment,
+    TenantUser,
+)
 from bkuser.plugins.constants import DataSourcePluginEnum
 from bkuser.plugins.local.constants import PasswordGenerateMethod
 from django.conf import settings
@@ -32,7 +40,8 @@ from django.test.utils import override_settings
 from django.urls import reverse
 from rest_framework import status
 
-from tests.test_utils.tenant import sync_users_depts_to_tenant
+from tests.test_utils.helpers import generate_random_string
+from tests.test_utils.tenant import create_tenant, sync_users_depts_to_tenant
 
 pytestmark = pytest.mark.django_db
 
@@ -417,6 +426,128 @@ class TestDataSourceRelatedResourceStatsApi:
             "shared_to_user_count": 11,
         }
 
+    @pytest.fixture
+    def collaboration_tenant(self, random_tenant) -> Tenant:
+        """接受随机租户（数据源所属租户）协同的租户"""
+        tenant = create_tenant(generate_random_string())
+        CollaborationStrategy.objects.create(
+            name=generate_random_string(),
+            source_tenant=random_tenant,
+            target_tenant=tenant,
+            source_status=CollaborationStrategyStatus.ENABLED,
+            target_status=CollaborationStrategyStatus.ENABLED,
+            source_config={
+                "organization_scope_type": CollaborationScopeType.ALL,
+                "organization_scope_config": {},
+                "field_scope_type": CollaborationScopeType.ALL,
+                "field_scope_config": {},
+            },
+            target_config={
+                "organization_scope_type": CollaborationScopeType.ALL,
+                "organization_scope_config": {},
+                "field_mapping": [],
+            },
+        )
+        return tenant
+
+    @staticmethod
+    def _import_from_excel(api_client, data_source: DataSource):
+        with open(settings.BASE_DIR / "tests/assets/fake_users.xlsx", "rb") as excel_file:
+            uploaded_file = SimpleUploadedFile(
+                name="fake_users.xlsx",
+                content=excel_file.read(),
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+        resp = api_client.post(
+            reverse("data_source.import_from_excel", kwargs={"id": data_source.id}),
+            data={"overwrite": True, "incremental": True, "file": uploaded_file},
+            format="multipart",
+        )
+        assert resp.status_code == status.HTTP_200_OK
+
+    @staticmethod
+    def _assert_stats_equal_real_counts(api_client, data_source: DataSource, collaboration_tenant: Tenant):
+        """计数器（统计记录 & 接口返回）需要与各资源表的实际 COUNT(*) 完全一致"""
+        own_dept_count = DataSourceDepartment.objects.filter(data_source=data_source).count()
+        own_user_count = DataSourceUser.objects.filter(data_source=data_source).count()
+        shared_dept_count = TenantDepartment.objects.filter(
+            data_source=data_source, tenant=collaboration_tenant
+        ).count()
+        shared_user_count = TenantUser.objects.filter(data_source=data_source, tenant=collaboration_tenant).count()
+        # 前置条件：协同租户中确实存在数据，否则无法验证协同部分的计数
+        assert shared_dept_count > 0
+        assert shared_user_count > 0
+
+        stats = {
+            s.tenant_id: (s.department_count, s.user_count)
+            for s in DataSourceResourceStats.objects.filter(data_source=data_source)
+        }
+        assert stats == {
+            data_source.owner_tenant_id: (own_dept_count, own_user_count),
+            collaboration_tenant.id: (shared_dept_count, shared_user_count),
+        }
+
+        resp = api_client.get(reverse("data_source.related_resource_stats", kwargs={"id": data_source.id}))
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.data == {
+            "own_department_count": own_dept_count,
+            "own_user_count": own_user_count,
+            "shared_to_tenant_count": 1,
+            "shared_to_department_count": shared_dept_count,
+            "shared_to_user_count": shared_user_count,
+        }
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True)
+    def test_counters_match_real_counts(self, api_client, random_tenant, data_source, collaboration_tenant):
+        # 1. 首次同步（同步结束后按实际数据刷新）
+        self._import_from_excel(api_client, data_source)
+        self._assert_stats_equal_real_counts(api_client, data_source, collaboration_tenant)
+
+        # 2. 通过页面新建部门 & 用户（增量更新，协同租户也会同时新建）
+        dept_url = reverse("organization.tenant_department.list_create", kwargs={"id": random_tenant.id})
+        dept_ids = []
+        for _ in range(2):
+            resp = api_client.post(dept_url, data={"parent_department_id": 0, "name": generate_random_string()})
+            assert resp.status_code == status.HTTP_201_CREATED
+            dept_ids.append(resp.data["id"])
+
+        user_url = reverse("organization.tenant_user.list_create", kwargs={"id": random_tenant.id})
+        user_ids = []
+        for _ in range(2):
+            username = generate_random_string()
+            resp = api_client.post(
+                user_url,
+                data={
+                    "username": username,
+                    "full_name": username,
+                    "email": f"{username}@example.com",
+                    "phone": "12345678901",
+                    "phone_country_code": "86",
+                    "extras": {},
+                    "department_ids": [dept_ids[0]],
+                    "leader_ids": [],
+                },
+            )
+            assert resp.status_code == status.HTTP_201_CREATED
+            user_ids.append(resp.data["id"])
+
+        self._assert_stats_equal_real_counts(api_client, data_source, collaboration_tenant)
+
+        # 3. 通过页面删除部门 & 用户（增量更新，协同租户中的数据会连带删除）
+        resp = api_client.delete(
+            reverse("organization.tenant_user.retrieve_update_destroy", kwargs={"id": user_ids[0]})
+        )
+        assert resp.status_code == status.HTTP_204_NO_CONTENT
+        resp = api_client.delete(reverse("organization.tenant_department.update_destroy", kwargs={"id": dept_ids[1]}))
+        assert resp.status_code == status.HTTP_204_NO_CONTENT
+
+        self._assert_stats_equal_real_counts(api_client, data_source, collaboration_tenant)
+
+        # 4. 再次同步，即使计数器已经偏离实际数据，同步结束后也会按实际数据刷新
+        DataSourceResourceStats.objects.filter(data_source=data_source).update(department_count=-1, user_count=-1)
+        self._import_from_excel(api_client, data_source)
+        self._assert_stats_equal_real_counts(api_client, data_source, collaboration_tenant)
+
 
 class TestDataSourceSyncRecordApi:
     def test_list(self, api_client, data_source, data_source_sync_tasks):
@@ -446,7 +577,39 @@ class TestDataSourceSyncRecordApi:
     def test_retrieve(self, api_client, data_source_sync_tasks):
         success_task = data_source_sync_tasks[0]
         resp = api_client.get(reverse("data_source.sync_record.retrieve", kwargs={"id": success_task.id}))
-        assert set(resp.data.keys()) == {"id", "status", "has_warning", "start_at", "duration", "logs"}
+        assert set(resp.data.keys()) == {
+            "id",
+            "status",
+            "has_warning",
+            "start_at",
+            "duration",
+            "logs",
+            "next_log_offset",
+        }
+        assert resp.data["logs"] == "sync task success!"
+        assert resp.data["next_log_offset"] == 0
+
+    def test_retrieve_logs_incrementally(self, api_client, data_source_sync_tasks):
+        task = data_source_sync_tasks[0]
+        DataSourceSyncTaskLog.objects.bulk_create(
+            [DataSourceSyncTaskLog(task=task, seq=seq, content=f"INFO chunk {seq}\n\n") for seq in range(3)]
+        )
+        url = reverse("data_source.sync_record.retrieve", kwargs={"id": task.id})
+
+        resp = api_client.get(url)
+        assert resp.data["logs"] == "INFO chunk 0\n\nINFO chunk 1\n\nINFO chunk 2\n\n"
+        assert resp.data["next_log_offset"] == 3  # noqa: PLR2004
+
+        # 同步过程中新写入的日志分片，可以通过 log_offset 增量读取
+        DataSourceSyncTaskLog.objects.create(task=task, seq=3, content="INFO chunk 3\n\n")
+        resp = api_client.get(url, data={"log_offset": resp.data["next_log_offset"]})
+        assert resp.data["logs"] == "INFO chunk 3\n\n"
+        assert resp.data["next_log_offset"] == 4  # noqa: PLR2004
+
+        # 没有新的日志分片，返回空日志，偏移量不变
+        resp = api_client.get(url, data={"log_offset": 4})
+        assert resp.data["logs"] == ""
+        assert resp.data["next_log_offset"] == 4  # noqa: PLR2004
 
     def test_retrieve_other_tenant_data_source_sync_record(self, api_client, data_source_sync_tasks):
         other_tenant_task = data_source_sync_tasks[2]
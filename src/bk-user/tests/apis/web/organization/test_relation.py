@@ -113,6 +113,35 @@ class TestTenantDeptUserRelationBatchUpdatePutApi:
                 center_ab.data_source_department_id,
             }
 
+    @pytest.mark.usefixtures("_init_tenant_users_depts")
+    def test_keep_unchanged_relations(self, api_client, random_tenant):
+        wangwu = TenantUser.objects.get(data_source_user__username="wangwu", tenant=random_tenant)
+        lushi = TenantUser.objects.get(data_source_user__username="lushi", tenant=random_tenant)
+        dept_b = TenantDepartment.objects.get(data_source_department__name="部门B", tenant=random_tenant)
+        center_ab = TenantDepartment.objects.get(data_source_department__name="中心AB", tenant=random_tenant)
+
+        # wangwu 属于部门 A & 部门 B，则 wangwu - 部门 B 的关联边不应该被删除重建
+        unchanged_relation = DataSourceDepartmentUserRelation.objects.get(
+            user_id=wangwu.data_source_user_id, department_id=dept_b.data_source_department_id
+        )
+        # 不相关的用户的关联边不受影响
+        lushi_relations = DataSourceDepartmentUserRelation.objects.filter(user_id=lushi.data_source_user_id)
+        lushi_relation_ids = set(lushi_relations.values_list("id", flat=True))
+
+        resp = api_client.put(
+            reverse("organization.tenant_dept_user_relation.batch_update"),
+            data={"user_ids": [wangwu.id], "target_department_ids": [dept_b.id, center_ab.id]},
+        )
+        assert resp.status_code == status.HTTP_204_NO_CONTENT
+
+        relations = DataSourceDepartmentUserRelation.objects.filter(user_id=wangwu.data_source_user_id)
+        assert set(relations.values_list("department_id", flat=True)) == {
+            dept_b.data_source_department_id,
+            center_ab.data_source_department_id,
+        }
+        assert relations.get(department_id=dept_b.data_source_department_id).id == unchanged_relation.id
+        assert set(lushi_relations.values_list("id", flat=True)) == lushi_relation_ids
+
 
 class TestTenantDeptUserRelationBatchUpdatePatchApi:
     """测试 移至其他组织（仅删除当前部门关系）"""
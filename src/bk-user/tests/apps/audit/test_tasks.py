@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from bkuser.apps.audit.models import OperationAuditRecord, OperationAuditRecordArchive
+from bkuser.apps.audit.tasks import archive_expired_audit_records
+from django.test import override_settings
+from django.utils import timezone
+
+pytestmark = pytest.mark.django_db
+
+
+def _create_audit_record(tenant_id: str, days_ago: int, object_id: str) -> OperationAuditRecord:
+    record = OperationAuditRecord.objects.create(
+        creator="admin",
+        tenant_id=tenant_id,
+        operation="modify_data_source",
+        object_type="data_source",
+        object_id=object_id,
+        data_before={"name": "before"},
+        data_after={"name": "after"},
+    )
+    # created_at 是 auto_now_add，需要通过 update 修改
+    OperationAuditRecord.objects.filter(id=record.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+    return record
+
+
+class TestArchiveExpiredAuditRecords:
+    @override_settings(AUDIT_RECORD_RETENTION_DAYS=30, TENANT_AUDIT_RECORD_RETENTION_DAYS={"t2": "7", "t3": "0"})
+    @mock.patch("bkuser.apps.audit.tasks.AUDIT_RECORD_ARCHIVE_BATCH_SIZE", 2)
+    def test_archive(self):
+        for idx, days_ago in enumerate([1, 10, 40, 50, 60]):
+            _create_audit_record("t1", days_ago, f"t1-{idx}")
+            _create_audit_record("t2", days_ago, f"t2-{idx}")
+            _create_audit_record("t3", days_ago, f"t3-{idx}")
+
+        archive_expired_audit_records()
+
+        # t1 使用默认保留天数（30 天），t2 保留 7 天，t3 永久保留
+        assert set(OperationAuditRecord.objects.values_list("object_id", flat=True)) == {
+            "t1-0",
+            "t1-1",
+            "t2-0",
+            *[f"t3-{idx}" for idx in range(5)],
+        }
+
+        # 归档记录按批次压缩存储，且可以还原
+        t1_archives = OperationAuditRecordArchive.objects.filter(tenant_id="t1").order_by("latest_created_at")
+        assert [a.record_count for a in t1_archives] == [2, 1]
+        archived_records = [r for a in t1_archives for r in a.get_records()]
+        assert [r["object_id"] for r in archived_records] == ["t1-4", "t1-3", "t1-2"]
+        assert archived_records[0]["data_after"] == {"name": "after"}
+
+        t2_archives = OperationAuditRecordArchive.objects.filter(tenant_id="t2")
+        assert sum(a.record_count for a in t2_archives) == 4  # noqa: PLR2004
+        assert not OperationAuditRecordArchive.objects.filter(tenant_id="t3").exists()
+
+    def test_nothing_expired(self, settings):
+        settings.AUDIT_RECORD_RETENTION_DAYS = 30
+        # 记录均在保留天数内（包括临近过期的记录）
+        _create_audit_record("t1", 1, "t1-0")
+        _create_audit_record("t1", 29, "t1-1")
+
+        archive_expired_audit_records()
+
+        assert OperationAuditRecord.objects.filter(tenant_id="t1").count() == 2  # noqa: PLR2004
+        assert not OperationAuditRecordArchive.objects.exists()
+
+    def test_keep_forever_by_default(self):
+        _create_audit_record("t1", 1000, "t1-0")
+
+        archive_expired_audit_records()
+
+        # 默认永久保留，不会归档
+        assert OperationAuditRecord.objects.filter(tenant_id="t1").count() == 1
+        assert not OperationAuditRecordArchive.objects.exists()
@@ -15,7 +15,12 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 import pytest
-from bkuser.apps.data_source.models import DataSource, DataSourceSensitiveInfo
+from bkuser.apps.data_source.models import (
+    DataSource,
+    DataSourceSensitiveInfo,
+    DataSourceUser,
+    DataSourceUserLookupGram,
+)
 from bkuser.common.constants import SENSITIVE_MASK
 from bkuser.plugins.local.constants import PasswordGenerateMethod
 from bkuser.plugins.local.models import LocalDataSourcePluginConfig
@@ -44,6 +49,32 @@ def test_get_plugin_config(local_ds_with_sensitive):
     assert plugin_cfg.password_initial.fixed_password == FAKE_PASSWORD  # type: ignore
 
 
+def test_get_plugin_config_cached(local_ds_with_sensitive, django_assert_num_queries):
+    plugin_cfg = local_ds_with_sensitive.get_plugin_cfg()
+    # 第二次获取命中缓存，不再查询敏感信息
+    with django_assert_num_queries(0):
+        cached_plugin_cfg = local_ds_with_sensitive.get_plugin_cfg()
+
+    assert cached_plugin_cfg == plugin_cfg
+    # 返回的是副本，修改不会影响缓存 & 数据源配置
+    cached_plugin_cfg.password_initial.fixed_password = FAKE_PASSWORD[::-1]  # type: ignore
+    assert local_ds_with_sensitive.get_plugin_cfg().password_initial.fixed_password == FAKE_PASSWORD  # type: ignore
+    assert get_items(local_ds_with_sensitive.plugin_config, "password_initial.fixed_password") == SENSITIVE_MASK
+
+
+def test_get_plugin_config_cache_invalidated(local_ds_with_sensitive):
+    plugin_cfg = local_ds_with_sensitive.get_plugin_cfg()
+    plugin_cfg.password_initial.fixed_password = FAKE_PASSWORD[::-1]  # type: ignore
+    plugin_cfg.login_limit.force_change_at_first_login = False  # type: ignore
+    local_ds_with_sensitive.set_plugin_cfg(plugin_cfg)
+
+    # 当前实例 & 重新从 DB 查询的实例，都应该获取到最新的配置
+    for data_source in [local_ds_with_sensitive, DataSource.objects.get(id=local_ds_with_sensitive.id)]:
+        latest_plugin_cfg = data_source.get_plugin_cfg()
+        assert latest_plugin_cfg.password_initial.fixed_password == FAKE_PASSWORD[::-1]  # type: ignore
+        assert latest_plugin_cfg.login_limit.force_change_at_first_login is False  # type: ignore
+
+
 def test_set_plugin_config(local_ds_plugin_cfg, bare_local_data_source):
     """给没有敏感信息的设置下"""
     assert not DataSourceSensitiveInfo.objects.filter(data_source=bare_local_data_source).exists()
@@ -96,3 +127,99 @@ def test_set_plugin_config_empty_value(local_ds_plugin_cfg, bare_local_data_sour
     bare_local_data_source.set_plugin_cfg(plugin_cfg)
     assert get_items(bare_local_data_source.plugin_config, "password_initial.fixed_password") is None
     assert get_items(bare_local_data_source.plugin_config, "login_limit.force_change_at_first_login") is False
+
+
+class TestDataSourceUserSearchKey:
+    """数据源用户搜索关键字的维护"""
+
+    def test_save(self, bare_local_data_source):
+        user = DataSourceUser.objects.create(
+            data_source=bare_local_data_source,
+            code="ZhangSan",
+            username="ZhangSan",
+            full_name="张三",
+            email="ZhangSan@M.com",
+            phone="13512345671",
+        )
+        assert user.search_key == "zhangsan\n张三\nzhangsan@m.com\n13512345671"
+
+        user.email = "Zhang.San@M.com"
+        user.phone = None
+        user.save(update_fields=["email", "phone", "updated_at"])
+
+        user.refresh_from_db()
+        assert user.search_key == "zhangsan\n张三\nzhang.san@m.com\n"
+
+    def test_bulk_create_and_update(self, bare_local_data_source):
+        DataSourceUser.objects.bulk_create(
+            [
+                DataSourceUser(
+                    data_source=bare_local_data_source, code=f"user-{i}", username=f"User{i}", full_name="X"
+                )
+                for i in range(3)
+            ]
+        )
+        users = list(DataSourceUser.objects.filter(data_source=bare_local_data_source))
+        assert [u.search_key for u in users] == [f"user{i}\nx\n\n" for i in range(3)]
+
+        for u in users:
+            u.full_name = "Y"
+
+        DataSourceUser.objects.bulk_update(users, fields=["full_name"])
+        assert set(
+            DataSourceUser.objects.filter(data_source=bare_local_data_source).values_list("search_key", flat=True)
+        ) == {f"user{i}\ny\n\n" for i in range(3)}
+
+
+class TestDataSourceUserLookupGram:
+    """数据源用户模糊搜索 gram 的维护"""
+
+    @staticmethod
+    def _get_grams(user: DataSourceUser, field: str):
+        return set(DataSourceUserLookupGram.objects.filter(user=user, field=field).values_list("gram", flat=True))
+
+    def test_save(self, bare_local_data_source):
+        user = DataSourceUser.objects.create(
+            data_source=bare_local_data_source,
+            code="ZhangSan",
+            username="ZhangSan",
+            full_name="张三",
+            email="ZS@M.cn",
+            phone="1351",
+        )
+        assert self._get_grams(user, "full_name") == {"张三", "三"}
+        assert self._get_grams(user, "email") == {"zs@", "s@m", "@m.", "m.c", ".cn", "cn", "n"}
+        assert self._get_grams(user, "phone") == {"135", "351", "51", "1"}
+
+        user.email = "LS@M.cn"
+        user.phone = None
+        user.save(update_fields=["email", "phone", "updated_at"])
+        assert self._get_grams(user, "email") == {"ls@", "s@m", "@m.", "m.c", ".cn", "cn", "n"}
+        assert self._get_grams(user, "phone") == set()
+        # 未更新的字段，gram 保持不变
+        assert self._get_grams(user, "full_name") == {"张三", "三"}
+
+    def test_bulk_create_and_update(self, bare_local_data_source):
+        DataSourceUser.objects.bulk_create(
+            [
+                DataSourceUser(
+                    data_source=bare_local_data_source, code=f"user-{i}", username=f"User{i}", full_name=f"X{i}"
+                )
+                for i in range(3)
+            ]
+        )
+        users = list(DataSourceUser.objects.filter(data_source=bare_local_data_source))
+        assert [self._get_grams(u, "full_name") for u in users] == [{f"x{i}", f"{i}"} for i in range(3)]
+
+        for u in users:
+            u.full_name = "Y"
+
+        DataSourceUser.objects.bulk_update(users, fields=["full_name"])
+        assert [self._get_grams(u, "full_name") for u in users] == [{"y"}] * 3
+
+    def test_delete(self, bare_local_data_source):
+        user = DataSourceUser.objects.create(
+            data_source=bare_local_data_source, code="lisi", username="lisi", full_name="李四"
+        )
+        DataSourceUser.objects.filter(id=user.id).delete()
+        assert not DataSourceUserLookupGram.objects.filter(user_id=user.id).exists()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+from unittest import mock
+
+import pytest
+from bkuser.apps.data_source.models import DataSourceUser
+from bkuser.apps.data_source.tasks import migrate_user_extras_with_mapping, remove_dropped_field_in_user_extras
+from django.db import DatabaseError
+
+from tests.test_utils.helpers import generate_random_string
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def users_with_extras(bare_local_data_source):
+    """Extras 中包含枚举 / 多选枚举字段的数据源用户"""
+    users = [
+        DataSourceUser(
+            data_source=bare_local_data_source,
+            code=generate_random_string(),
+            username=generate_random_string(length=8),
+            full_name=generate_random_string(length=8),
+            extras={"gender": "a", "hobbies": ["a", "b"], "region": "sz"},
+        )
+        for _ in range(5)
+    ]
+    DataSourceUser.objects.bulk_create(users)
+    return list(DataSourceUser.objects.filter(data_source=bare_local_data_source).order_by("id"))
+
+
+class _FailOnceBulkUpdate:
+    """模拟第 N 次批量更新时失败（如 Worker 重启，DB 异常等）"""
+
+    def __init__(self, fail_at: int):
+        self.fail_at = fail_at
+        self.call_count = 0
+        self.origin_bulk_update = DataSourceUser.objects.bulk_update
+
+    def __call__(self, objs, *args, **kwargs):
+        self.call_count += 1
+        if self.call_count == self.fail_at:
+            raise DatabaseError("mock failure")
+
+        return self.origin_bulk_update(objs, *args, **kwargs)
+
+
+class TestRemoveDroppedFieldInUserExtras:
+    @mock.patch("bkuser.apps.data_source.tasks.USER_EXTRAS_UPDATE_BATCH_SIZE", 2)
+    def test_resume_after_failure(self, random_tenant, bare_local_data_source, users_with_extras):
+        bulk_update = _FailOnceBulkUpdate(fail_at=2)
+        with mock.patch.object(DataSourceUser.objects, "bulk_update", bulk_update):
+            with pytest.raises(DatabaseError):
+                remove_dropped_field_in_user_extras.run(random_tenant.id, "region")
+
+            # 第一批已经提交
+            assert [
+                u.extras.get("region")
+                for u in DataSourceUser.objects.filter(data_source=bare_local_data_source).order_by("id")
+            ] == [None, None] + ["sz"] * 3
+
+            remove_dropped_field_in_user_extras.run(random_tenant.id, "region")
+
+        # 重试时从第二批开始：1（完成）+ 1（失败）+ 2（剩余 3 个用户）
+        assert bulk_update.call_count == 4  # noqa: PLR2004
+        assert all("region" not in u.extras for u in DataSourceUser.objects.filter(data_source=bare_local_data_source))
+
+    @mock.patch("bkuser.apps.data_source.tasks.USER_EXTRAS_UPDATE_BATCH_SIZE", 2)
+    def test_new_task_not_resume_from_stale_checkpoint(self, random_tenant, bare_local_data_source, users_with_extras):
+        bulk_update = _FailOnceBulkUpdate(fail_at=2)
+        with mock.patch.object(DataSourceUser.objects, "bulk_update", bulk_update):
+            # 第一次下发的任务重试耗尽（进度停留在第一批）
+            remove_dropped_field_in_user_extras.push_request(id="task-1")
+            with pytest.raises(DatabaseError):
+                remove_dropped_field_in_user_extras.run(random_tenant.id, "region")
+            remove_dropped_field_in_user_extras.pop_request()
+
+        # 第一批已处理的用户，重新补充字段（例如：删除字段后重新添加同名字段并同步）
+        for u in DataSourceUser.objects.filter(data_source=bare_local_data_source):
+            u.extras["region"] = "sz"
+            u.save(update_fields=["extras"])
+
+        # 再次下发的同样操作为新的任务，需要从头开始处理
+        remove_dropped_field_in_user_extras.push_request(id="task-2")
+        remove_dropped_field_in_user_extras.run(random_tenant.id, "region")
+        remove_dropped_field_in_user_extras.pop_request()
+
+        assert all("region" not in u.extras for u in DataSourceUser.objects.filter(data_source=bare_local_data_source))
+
+
+class TestMigrateUserExtrasWithMapping:
+    @mock.patch("bkuser.apps.data_source.tasks.USER_EXTRAS_UPDATE_BATCH_SIZE", 2)
+    def test_resume_after_failure(self, random_tenant, bare_local_data_source, users_with_extras):
+        # 映射不是幂等的，若重复处理已完成的批次，a 会被映射成 c
+        mapping = {"a": "b", "b": "c"}
+
+        bulk_update = _FailOnceBulkUpdate(fail_at=2)
+        with mock.patch.object(DataSourceUser.objects, "bulk_update", bulk_update):
+            with pytest.raises(DatabaseError):
+                migrate_user_extras_with_mapping.run(random_tenant.id, "gender", mapping)
+
+            migrate_user_extras_with_mapping.run(random_tenant.id, "gender", mapping)
+
+        assert [u.extras["gender"] for u in DataSourceUser.objects.filter(data_source=bare_local_data_source)] == [
+            "b"
+        ] * 5
+        # 其他字段不受影响
+        assert all(
+            u.extras["hobbies"] == ["a", "b"]
+            for u in DataSourceUser.objects.filter(data_source=bare_local_data_source)
+        )
+
+    def test_migrate_multi_enum(self, random_tenant, bare_local_data_source, users_with_extras):
+        migrate_user_extras_with_mapping.run(random_tenant.id, "hobbies", {"a": "b", "b": "c"})
+
+        assert all(
+            sorted(u.extras["hobbies"]) == ["b", "c"]
+            for u in DataSourceUser.objects.filter(data_source=bare_local_data_source)
+        )
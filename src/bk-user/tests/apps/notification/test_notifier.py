@@ -14,14 +14,21 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+from datetime import timedelta
 from unittest import mock
 
 import pytest
+from bkuser.apps.data_source.models import LocalDataSourceIdentityInfo
 from bkuser.apps.notification.constants import NotificationScene
-from bkuser.apps.notification.notifier import TenantUserNotifier
+from bkuser.apps.notification.notifier import TenantUserNotifier, TmplContextGenerator
 from bkuser.apps.tenant.models import TenantUser
 from django.conf import settings
+from django.db import connection
+from django.template import Context
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
+from tests.test_utils.data_source import init_local_data_source_identity_infos
 from tests.test_utils.tenant import sync_users_depts_to_tenant
 
 pytestmark = pytest.mark.django_db
@@ -39,8 +46,9 @@ class TestTenantUserNotifier:
         notifier = TenantUserNotifier(NotificationScene.USER_INITIALIZE, data_source_id=data_source.id)
         user = TenantUser.objects.filter(tenant_id=data_source.owner_tenant_id).first()
         tmpl = "{{ username }}, {{ full_name }}, {{ password }}, {{ url }}"
+        ctx = TmplContextGenerator(user=user, scene=notifier.scene, passwd="123456").gen()
         assert (
-            notifier._render_tmpl(user, tmpl, passwd="123456")
+            notifier._get_compiled_tmpl(tmpl).render(Context(ctx))
             == f"{user.data_source_user.username}, {user.data_source_user.full_name}, 123456, {settings.BK_USER_URL}/personal-center"  # noqa: E501
         )
 
@@ -65,3 +73,64 @@ class TestTenantUserNotifier:
         notifier = TenantUserNotifier(scene=NotificationScene.MANAGER_RESET_PASSWORD)
         tenant_user = TenantUser.objects.filter(tenant_id=data_source.owner_tenant_id).first()
         notifier.send(tenant_user, passwd="123456")
+
+    @pytest.fixture
+    def passwd_expiring_data_source(self, data_source):
+        init_local_data_source_identity_infos(data_source)
+        LocalDataSourceIdentityInfo.objects.filter(data_source=data_source).update(
+            password_expired_at=timezone.now() + timedelta(days=7)
+        )
+        return data_source
+
+    @mock.patch("bkuser.component.cmsi.send_mail", return_value=None)
+    @mock.patch("bkuser.component.cmsi.send_sms", return_value=None)
+    def test_batch_send_constant_queries(self, mocked_send_sms, mocked_send_mail, passwd_expiring_data_source):
+        ds = passwd_expiring_data_source
+        notifier = TenantUserNotifier(scene=NotificationScene.PASSWORD_EXPIRING, data_source_id=ds.id)
+        tenant_users = TenantUser.objects.filter(tenant_id=ds.owner_tenant_id, data_source=ds).order_by("id")
+        user_count = tenant_users.count()
+
+        with CaptureQueriesContext(connection) as few_users_ctx:
+            notifier.batch_send(tenant_users[:2])
+
+        with CaptureQueriesContext(connection) as all_users_ctx:
+            notifier.batch_send(tenant_users)
+
+        # 查询次数与接收者数量无关（用户 + 数据源用户一次，身份信息一次）
+        assert len(few_users_ctx.captured_queries) == len(all_users_ctx.captured_queries) == 2  # noqa: PLR2004
+        # 模板内容与用户无关，短信的所有接收者合并为一次发送
+        assert mocked_send_sms.call_count == 2  # noqa: PLR2004
+        receivers = mocked_send_sms.call_args.args[0].split(",")
+        assert sorted(receivers) == sorted(tenant_users.values_list("id", flat=True))
+        assert len(receivers) == user_count
+        # 邮件会暴露接收者，每个用户单独发送
+        assert mocked_send_mail.call_count == 2 + user_count
+
+    @mock.patch("bkuser.component.cmsi.send_mail", return_value=None)
+    @mock.patch("bkuser.component.cmsi.send_sms", return_value=None)
+    def test_batch_send_mail_per_user(self, mocked_send_sms, mocked_send_mail, passwd_expiring_data_source):
+        ds = passwd_expiring_data_source
+        notifier = TenantUserNotifier(scene=NotificationScene.PASSWORD_EXPIRING, data_source_id=ds.id)
+        tenant_users = TenantUser.objects.filter(tenant_id=ds.owner_tenant_id, data_source=ds)
+        notifier.batch_send(tenant_users)
+
+        # 即使邮件内容完全相同，每封邮件也只有一个接收者
+        mail_receivers = [call.args[0] for call in mocked_send_mail.call_args_list]
+        assert sorted(mail_receivers) == sorted(tenant_users.values_list("id", flat=True))
+        assert mocked_send_sms.call_count == 1
+
+    @mock.patch("bkuser.component.cmsi.send_mail", return_value=None)
+    @mock.patch("bkuser.component.cmsi.send_sms", return_value=None)
+    def test_batch_send_personalized_tmpls(self, mocked_send_sms, mocked_send_mail, passwd_expiring_data_source):
+        ds = passwd_expiring_data_source
+        notifier = TenantUserNotifier(scene=NotificationScene.PASSWORD_EXPIRING, data_source_id=ds.id)
+        for tmpl in notifier.templates:
+            tmpl.content = "{{ username }}, {{ valid_days }}"
+
+        tenant_users = TenantUser.objects.filter(tenant_id=ds.owner_tenant_id, data_source=ds)
+        notifier.batch_send(tenant_users)
+
+        # 模板内容包含用户名，每个用户的通知都需要单独发送
+        assert mocked_send_sms.call_count == tenant_users.count()
+        contents = {call.args[1] for call in mocked_send_sms.call_args_list}
+        assert contents == {f"{u.data_source_user.username}, 7" for u in tenant_users}
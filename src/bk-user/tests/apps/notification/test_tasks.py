@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+from datetime import timedelta
+from typing import List
+from unittest import mock
+
+import pytest
+from bkuser.apps.data_source.models import LocalDataSourceIdentityInfo
+from bkuser.apps.notification.constants import NotificationScene
+from bkuser.apps.notification.rate_limiter import NotificationRateLimiter
+from bkuser.apps.notification.tasks import notify_password_expired_users, notify_tenant_users_shard
+from bkuser.apps.tenant.models import TenantUser
+from bkuser.utils.time import get_midnight
+from django.test import override_settings
+
+from tests.test_utils.data_source import init_local_data_source_identity_infos
+from tests.test_utils.tenant import sync_users_depts_to_tenant
+
+pytestmark = pytest.mark.django_db
+
+
+class TestNotifyPasswordExpiredUsers:
+    @pytest.fixture
+    def data_source(self, random_tenant, full_local_data_source):
+        sync_users_depts_to_tenant(random_tenant, full_local_data_source)
+        init_local_data_source_identity_infos(full_local_data_source)
+        LocalDataSourceIdentityInfo.objects.filter(data_source=full_local_data_source).update(
+            password_expired_at=get_midnight() - timedelta(hours=1)
+        )
+        return full_local_data_source
+
+    @pytest.mark.parametrize("shard_size", [1, 3, 4, 100])
+    @mock.patch("bkuser.component.cmsi.send_mail", return_value=None)
+    @mock.patch("bkuser.component.cmsi.send_sms", return_value=None)
+    def test_notify_by_shards(self, mocked_send_sms, mocked_send_mail, data_source, shard_size):
+        tenant_user_ids = sorted(TenantUser.objects.filter(data_source=data_source).values_list("id", flat=True))
+        expected_shards = [tenant_user_ids[i : i + shard_size] for i in range(0, len(tenant_user_ids), shard_size)]
+
+        with mock.patch("bkuser.apps.notification.tasks.NOTIFICATION_SHARD_SIZE", shard_size), override_settings(
+            CELERY_TASK_ALWAYS_EAGER=True, CELERY_TASK_EAGER_PROPAGATES=True, NOTIFICATION_SEND_RATE_LIMIT=0
+        ):
+            notify_password_expired_users(data_source.id)
+
+        # 模板内容与用户无关，每个分片内的短信接收者会被合并为一次发送
+        shards = [call.args[0].split(",") for call in mocked_send_sms.call_args_list]
+        assert sorted(sorted(s) for s in shards) == expected_shards
+        # 每个接收者只会被通知一次，邮件逐个用户发送
+        assert sorted(r for s in shards for r in s) == tenant_user_ids
+        assert sorted(call.args[0] for call in mocked_send_mail.call_args_list) == tenant_user_ids
+
+    @mock.patch("bkuser.apps.notification.tasks.notify_tenant_users_shard.apply_async")
+    def test_shard_countdown_with_rate_limit(self, mocked_apply_async, data_source):
+        with mock.patch("bkuser.apps.notification.tasks.NOTIFICATION_SHARD_SIZE", 5), override_settings(
+            NOTIFICATION_SEND_RATE_LIMIT=10
+        ):
+            notify_password_expired_users(data_source.id)
+
+        # 11 个用户，每个分片 5 个，发送速率上限 10 个/秒 -> 分片依次延迟 0 / 0.5 / 1 秒执行
+        assert [call.kwargs["countdown"] for call in mocked_apply_async.call_args_list] == [0, 0.5, 1]
+        assert [call.kwargs["kwargs"] for call in mocked_apply_async.call_args_list] == [
+            {"data_source_id": data_source.id}
+        ] * 3
+
+    @mock.patch("bkuser.apps.notification.tasks.notify_tenant_users_shard.apply_async")
+    def test_shard_without_rate_limit(self, mocked_apply_async, data_source):
+        with override_settings(NOTIFICATION_SEND_RATE_LIMIT=0):
+            notify_password_expired_users(data_source.id)
+
+        assert [call.kwargs["countdown"] for call in mocked_apply_async.call_args_list] == [0]
+
+    @mock.patch("bkuser.apps.notification.tasks.notify_tenant_users_shard.apply_async")
+    def test_shard_countdown_capped(self, mocked_apply_async, data_source):
+        with mock.patch("bkuser.apps.notification.tasks.NOTIFICATION_SHARD_SIZE", 5), mock.patch(
+            "bkuser.apps.notification.tasks.NOTIFICATION_SHARD_MAX_COUNTDOWN", 0.5
+        ), override_settings(NOTIFICATION_SEND_RATE_LIMIT=10):
+            notify_password_expired_users(data_source.id)
+
+        # 延迟时间不会超过上限（避免超过 Broker 的 visibility_timeout 导致重复投递）
+        assert [call.kwargs["countdown"] for call in mocked_apply_async.call_args_list] == [0, 0.5, 0.5]
+
+
+class TestNotifyTenantUsersShard:
+    @pytest.fixture
+    def tenant_user_ids(self, random_tenant, full_local_data_source) -> List[str]:
+        sync_users_depts_to_tenant(random_tenant, full_local_data_source)
+        return sorted(TenantUser.objects.filter(data_source=full_local_data_source).values_list("id", flat=True))
+
+    @mock.patch("bkuser.apps.notification.tasks.notify_tenant_users_shard.apply_async")
+    @mock.patch("bkuser.apps.notification.tasks.TenantUserNotifier")
+    def test_reschedule_when_rate_limited(self, mocked_notifier, mocked_apply_async, tenant_user_ids):
+        with override_settings(NOTIFICATION_SEND_RATE_LIMIT=4), mock.patch.object(
+            NotificationRateLimiter, "acquire", side_effect=[0, 0, 0.3]
+        ):
+            notify_tenant_users_shard(NotificationScene.PASSWORD_EXPIRED.value, tenant_user_ids, tenant_id="t")
+
+        # 前两批（每批 4 个）获取到配额后发送
+        sent_batches = [
+            sorted(call.args[0].values_list("id", flat=True))
+            for call in mocked_notifier.return_value.batch_send.call_args_list
+        ]
+        assert sent_batches == [tenant_user_ids[:4], tenant_user_ids[4:8]]
+        # 剩余的接收者在下一个限速窗口发送
+        mocked_apply_async.assert_called_once_with(
+            args=(NotificationScene.PASSWORD_EXPIRED.value, tenant_user_ids[8:]),
+            kwargs={"tenant_id": "t"},
+            countdown=0.3,
+        )
+
+
+class TestNotificationRateLimiter:
+    @mock.patch("bkuser.apps.notification.rate_limiter.time.time", return_value=1700000000.25)
+    def test_acquire(self, mocked_time):
+        limiter = NotificationRateLimiter(rate_limit=50)
+
+        assert limiter.acquire(30) == 0
+        # 超出当前窗口的上限，需要等待到下一个窗口
+        assert limiter.acquire(30) == 0.75  # noqa: PLR2004
+        # 获取失败的配额会被归还
+        assert limiter.acquire(20) == 0
+
+        # 下一个窗口重新计数
+        mocked_time.return_value = 1700000001.0
+        assert limiter.acquire(50) == 0
+
+    def test_without_rate_limit(self):
+        limiter = NotificationRateLimiter(rate_limit=0)
+        assert all(limiter.acquire(1000) == 0 for _ in range(10))
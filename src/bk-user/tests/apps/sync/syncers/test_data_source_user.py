@@ -25,6 +25,7 @@ from bkuser.apps.data_source.models import (
     DataSourceUser,
     DataSourceUserLeaderRelation,
 )
+from bkuser.apps.sync.constants import DataSourceSyncObjectType, SyncOperation
 from bkuser.apps.sync.contexts import DataSourceSyncTaskContext
 from bkuser.apps.sync.syncers import (
     DataSourceDepartmentRelationSyncer,
@@ -291,11 +292,16 @@ class TestSyncDataSourceUser:
 
     def test_destroy(self, data_source_sync_task_ctx, full_local_data_source):
         raw_users: List[RawDataSourceUser] = []
+        users = DataSourceUser.objects.filter(data_source=full_local_data_source)
+        expected_records = {(u.id, u.code, u.username, u.full_name) for u in users}
 
         self._sync_data_source_users(
             data_source_sync_task_ctx, full_local_data_source, raw_users, overwrite=True, incremental=False
         )
         assert DataSourceUser.objects.filter(data_source=full_local_data_source).count() == 0
+        # 被删除的用户，需要在删除前记录变更记录
+        recorder = data_source_sync_task_ctx.recorder
+        assert set(recorder.get(SyncOperation.DELETE, DataSourceSyncObjectType.USER)) == expected_records
 
     @staticmethod
     def _sync_data_source_departments(
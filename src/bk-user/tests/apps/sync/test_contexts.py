@@ -15,10 +15,13 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+from unittest import mock
+
 import pytest
 from bkuser.apps.data_source.models import DataSourceDepartment, DataSourceUser
 from bkuser.apps.sync.constants import DataSourceSyncObjectType, SyncOperation, SyncTaskStatus
 from bkuser.apps.sync.contexts import DataSourceSyncTaskContext, TenantSyncTaskContext
+from bkuser.apps.sync.loggers import TaskLogger
 from bkuser.apps.sync.models import (
     DataSourceDepartmentChangeLog,
     DataSourceUserChangeLog,
@@ -26,6 +29,7 @@ from bkuser.apps.sync.models import (
     TenantUserChangeLog,
 )
 from bkuser.apps.sync.syncers import TenantDepartmentSyncer, TenantUserSyncer
+from django.db import transaction
 
 pytestmark = pytest.mark.django_db
 
@@ -37,7 +41,7 @@ class TestDataSourceSyncTaskContext:
 
         assert data_source_sync_task.status == SyncTaskStatus.FAILED
 
-        logs = data_source_sync_task.logs
+        logs, _ = data_source_sync_task.read_logs()
         assert "INFO data source sync task started" in logs
         assert "ERROR data source sync task failed! Data modifications in this sync step will be rollback." in logs
 
@@ -48,7 +52,7 @@ class TestDataSourceSyncTaskContext:
         assert data_source_sync_task.status == SyncTaskStatus.SUCCESS
         assert not data_source_sync_task.has_warning
 
-        logs = data_source_sync_task.logs
+        logs, _ = data_source_sync_task.read_logs()
         assert "INFO data source sync task started" in logs
         assert "INFO this is info log" in logs
         assert "INFO data source sync task success!" in logs
@@ -60,7 +64,7 @@ class TestDataSourceSyncTaskContext:
 
         assert data_source_sync_task.status == SyncTaskStatus.SUCCESS
         assert data_source_sync_task.has_warning
-        assert "this is warning log" in data_source_sync_task.logs
+        assert "this is warning log" in data_source_sync_task.read_logs()[0]
 
     def test_with_records(self, data_source_sync_task):
         ds = data_source_sync_task.data_source
@@ -96,16 +100,63 @@ class TestDataSourceSyncTaskContext:
             ctx.recorder.add(operation=SyncOperation.DELETE, type=DataSourceSyncObjectType.DEPARTMENT, items=depts)
 
         user_change_logs = DataSourceUserChangeLog.objects.filter(task=data_source_sync_task)
-        # 创建类数据，会再查询一次 DB，因此 DB 中没有数据的（lisi），不会记录
+        # 创建类数据，直接使用 bulk_create 回填的 ID，不会再查询 DB
         assert set(
-            user_change_logs.filter(operation=SyncOperation.CREATE).values_list("user_code", flat=True),
-        ) == {"zhangsan"}
+            user_change_logs.filter(operation=SyncOperation.CREATE).values_list("user_id", "user_code"),
+        ) == {(str(zhangsan.id), "zhangsan"), ("2", "lisi")}
         # 更新 / 删除类的数据，给啥就记录啥
         assert set(
             user_change_logs.filter(operation=SyncOperation.UPDATE).values_list("user_code", flat=True),
         ) == {"lisi"}
         assert DataSourceDepartmentChangeLog.objects.filter(task=data_source_sync_task).count() == len(depts)
 
+    def test_with_created_records_missing_id(self, data_source_sync_task):
+        ds = data_source_sync_task.data_source
+        zhangsan = DataSourceUser.objects.create(
+            code="zhangsan", username="zhangsan", full_name="张三", email="zhangsan@m.com", data_source=ds
+        )
+        # 模拟 DB（如 MySQL）不支持 bulk_create 回填 ID 的情况，DB 中没有数据的（lisi）不会记录
+        lisi = DataSourceUser(code="lisi", username="lisi", full_name="李四", data_source=ds)
+        with DataSourceSyncTaskContext(data_source_sync_task) as ctx:
+            ctx.recorder.add_records(
+                SyncOperation.CREATE,
+                DataSourceSyncObjectType.USER,
+                [(None, u.code, u.username, u.full_name) for u in [zhangsan, lisi]],
+            )
+
+        assert list(
+            DataSourceUserChangeLog.objects.filter(task=data_source_sync_task).values_list("user_id", "user_code")
+        ) == [(str(zhangsan.id), "zhangsan")]
+
+    def test_flush_logs_during_sync(self, data_source_sync_task):
+        with DataSourceSyncTaskContext(data_source_sync_task) as ctx:
+            ctx.logger = TaskLogger(flush_func=ctx._flush_logs, flush_threshold=50)
+            # 单测运行在事务中，日志会暂存在缓冲区中，不会写入 DB
+            ctx.logger.info("this is info log, which is long enough to trigger flush")
+            assert not data_source_sync_task.log_chunks.exists()
+
+            # 模拟事务外的场景
+            with mock.patch.object(transaction.get_connection(), "in_atomic_block", False):
+                ctx.logger.info("this is another info log, which is long enough to trigger flush")
+
+            assert ctx.logger.logs == ""
+            assert data_source_sync_task.log_chunks.count() == 1
+            ctx.logger.warning("this is warning log")
+
+        assert list(data_source_sync_task.log_chunks.values_list("seq", flat=True)) == [0, 1]
+        logs, next_offset = data_source_sync_task.read_logs()
+        assert logs == (
+            "INFO this is info log, which is long enough to trigger flush\n\n"
+            "INFO this is another info log, which is long enough to trigger flush\n\n"
+            "WARNING this is warning log\n\n"
+            "INFO data source sync task success!\n\n"
+        )
+        assert next_offset == 2  # noqa: PLR2004
+        assert data_source_sync_task.read_logs(offset=1)[0] == (
+            "WARNING this is warning log\n\nINFO data source sync task success!\n\n"
+        )
+        assert data_source_sync_task.has_warning
+
 
 class TestTenantSyncTaskContext:
     def test_failed_task(self, tenant_sync_task):
@@ -16,6 +16,7 @@
 # to the current version of the project delivered to anyone in the future.
 
 import pytest
+from bkuser.apps.sync.constants import SYNC_LOG_TRUNCATED_MARKER
 from bkuser.apps.sync.loggers import TaskLogger
 
 pytestmark = pytest.mark.django_db
@@ -43,3 +44,63 @@ class TestTaskLogger:
 
         logger.warning("this is warning log")
         assert logger.has_warning
+
+    def test_flush_boundaries(self):
+        flushed = []
+        logger = TaskLogger(flush_func=lambda logs: flushed.append(logs) or True, flush_threshold=30)
+
+        # 每条日志长度为 20（"INFO " + 13 + "\n\n"），未达到阈值时不会 flush
+        logger.info("info log 0001")
+        assert flushed == []
+        assert logger.logs == "INFO info log 0001\n\n"
+
+        # 达到阈值，缓冲区中的日志会被 flush 并清空
+        logger.info("info log 0002")
+        assert flushed == ["INFO info log 0001\n\nINFO info log 0002\n\n"]
+        assert logger.logs == ""
+
+        logger.info("info log 0003")
+        assert logger.drain() == "INFO info log 0003\n\n"
+        assert logger.logs == ""
+        assert len(flushed) == 1
+
+    def test_flush_failed(self):
+        flush_results = [False, True]
+        flushed = []
+
+        def flush_func(logs: str) -> bool:
+            flushed.append(logs)
+            return flush_results.pop(0)
+
+        logger = TaskLogger(flush_func=flush_func, flush_threshold=30)
+        logger.info("info log 0001")
+        # 达到阈值，但 flush 失败，日志保留在缓冲区中
+        logger.info("info log 0002")
+        assert len(flushed) == 1
+        assert logger.logs == "INFO info log 0001\n\nINFO info log 0002\n\n"
+
+        # 缓冲区再增加一个阈值长度（30 -> 60）后才会再次尝试 flush
+        logger.info("info log 0003")
+        assert len(flushed) == 2  # noqa: PLR2004
+        assert flushed[-1] == "".join(f"INFO info log 000{i}\n\n" for i in range(1, 4))
+        assert logger.logs == ""
+
+    def test_max_size(self):
+        flushed = []
+        logger = TaskLogger(flush_func=lambda logs: flushed.append(logs) or True, flush_threshold=30, max_size=50)
+
+        logger.info("info log 0001")
+        logger.info("info log 0002")
+        # 超过上限，追加截断标记，后续 INFO / WARNING 日志都会被丢弃
+        logger.warning("warning log 1")
+        logger.info("info log 0003")
+        assert logger.truncated
+        assert logger.has_warning
+
+        # ERROR 日志不受上限影响
+        logger.error("error log 001")
+
+        logs = "".join(flushed) + logger.drain()
+        assert logs == (
+            "INFO info log 0001\n\n" "INFO info log 0002\n\n" f"{SYNC_LOG_TRUNCATED_MARKER}" "ERROR error log 001\n\n"
+        )
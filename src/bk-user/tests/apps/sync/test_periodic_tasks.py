@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+from datetime import timedelta
+
+import pytest
+from bkuser.apps.sync.constants import SyncTaskStatus
+from bkuser.apps.sync.models import DataSourceSyncTask, DataSourceSyncTaskLog
+from bkuser.apps.sync.periodic_tasks import mark_running_sync_task_as_failed_if_exceed_one_day
+from django.utils import timezone
+
+pytestmark = pytest.mark.django_db
+
+REAPED_ERROR_MSG = "ERROR sync task runs more than one day, consider it as failed."
+
+
+class TestMarkRunningSyncTaskAsFailedIfExceedOneDay:
+    def test_task_without_log_chunks(self, data_source_sync_task):
+        DataSourceSyncTask.objects.filter(id=data_source_sync_task.id).update(
+            status=SyncTaskStatus.RUNNING, start_at=timezone.now() - timedelta(days=2)
+        )
+        mark_running_sync_task_as_failed_if_exceed_one_day()
+
+        data_source_sync_task.refresh_from_db()
+        assert data_source_sync_task.status == SyncTaskStatus.FAILED
+
+        logs, _ = data_source_sync_task.read_logs()
+        assert REAPED_ERROR_MSG in logs
+
+    def test_task_with_log_chunks(self, data_source_sync_task):
+        DataSourceSyncTask.objects.filter(id=data_source_sync_task.id).update(
+            status=SyncTaskStatus.RUNNING, start_at=timezone.now() - timedelta(days=2)
+        )
+        DataSourceSyncTaskLog.objects.create(task=data_source_sync_task, seq=0, content="INFO step 1\n")
+        DataSourceSyncTaskLog.objects.create(task=data_source_sync_task, seq=1, content="INFO step 2\n")
+        # 前端已经读取过前两个分块
+        _, offset = data_source_sync_task.read_logs()
+        assert offset == 2  # noqa: PLR2004
+
+        mark_running_sync_task_as_failed_if_exceed_one_day()
+
+        data_source_sync_task.refresh_from_db()
+        assert data_source_sync_task.status == SyncTaskStatus.FAILED
+
+        logs, _ = data_source_sync_task.read_logs()
+        assert logs.startswith("INFO step 1\nINFO step 2\n")
+        assert REAPED_ERROR_MSG in logs
+        # 增量读取时，也能读取到失败原因
+        logs, offset = data_source_sync_task.read_logs(offset)
+        assert REAPED_ERROR_MSG in logs
+        assert offset == 3  # noqa: PLR2004
+
+    def test_not_exceed_one_day(self, data_source_sync_task):
+        DataSourceSyncTaskLog.objects.create(task=data_source_sync_task, seq=0, content="INFO step 1\n")
+        mark_running_sync_task_as_failed_if_exceed_one_day()
+
+        data_source_sync_task.refresh_from_db()
+        assert data_source_sync_task.status == SyncTaskStatus.PENDING
+        assert data_source_sync_task.log_chunks.count() == 1
@@ -18,7 +18,7 @@
 import pytest
 from bkuser.apps.data_source.models import DataSourceDepartment, DataSourceUser
 from bkuser.apps.sync.constants import DataSourceSyncObjectType, SyncOperation
-from bkuser.apps.sync.recorders import ChangeLogRecorder
+from bkuser.apps.sync.recorders import ChangeLogRecorder, fill_created_record_ids
 
 pytestmark = pytest.mark.django_db
 
@@ -35,4 +35,45 @@ class TestChangeLogRecorder:
         recorder.add(operation=SyncOperation.CREATE, type=DataSourceSyncObjectType.DEPARTMENT, items=departments)
 
         assert len(recorder.get(operation=SyncOperation.CREATE, type=DataSourceSyncObjectType.USER)) == len(users) * 2
-        assert recorder.get(operation=SyncOperation.CREATE, type=DataSourceSyncObjectType.DEPARTMENT) == departments
+        assert recorder.count(operation=SyncOperation.CREATE, type=DataSourceSyncObjectType.USER) == len(users) * 2
+        # 只保留生成变更日志所需的字段
+        assert recorder.get(operation=SyncOperation.CREATE, type=DataSourceSyncObjectType.DEPARTMENT) == [
+            (d.id, d.code, d.name) for d in departments
+        ]
+
+    def test_compact_queryset(self, full_general_data_source):
+        users = DataSourceUser.objects.filter(data_source=full_general_data_source)
+        assert list(ChangeLogRecorder.compact(users)) == [(u.id, u.code, u.username, u.full_name) for u in users]
+
+    def test_flush_by_batch(self, full_general_data_source):
+        users = list(DataSourceUser.objects.filter(data_source=full_general_data_source))
+        flushed = []
+
+        recorder = ChangeLogRecorder(
+            flush_func=lambda op, type, records: flushed.append((op, type, len(records))), batch_size=5
+        )
+        recorder.add(operation=SyncOperation.UPDATE, type=DataSourceSyncObjectType.USER, items=users)
+
+        # 每累计 5 条就写入一次存储，剩余的保留在内存中
+        assert flushed == [(SyncOperation.UPDATE, DataSourceSyncObjectType.USER, 5)] * (len(users) // 5)
+        remain_count = len(users) % 5
+        assert len(recorder.get(operation=SyncOperation.UPDATE, type=DataSourceSyncObjectType.USER)) == remain_count
+
+        recorder.flush()
+        assert flushed[-1] == (SyncOperation.UPDATE, DataSourceSyncObjectType.USER, remain_count)
+        assert recorder.get(operation=SyncOperation.UPDATE, type=DataSourceSyncObjectType.USER) == []
+        assert recorder.count(operation=SyncOperation.UPDATE, type=DataSourceSyncObjectType.USER) == len(users)
+
+    def test_fill_created_record_ids(self, full_general_data_source):
+        users = DataSourceUser.objects.filter(data_source=full_general_data_source)
+        zhangsan = users.get(code="zhangsan")
+        # 模拟 DB 不支持 bulk_create 回填 ID 的情况
+        records = [
+            (None, zhangsan.code, zhangsan.username, zhangsan.full_name),
+            (None, "not_exists", "not_exists", "not_exists"),
+            (100, "new_user", "new_user", "新用户"),
+        ]
+        assert fill_created_record_ids(users, "code", records) == [
+            (zhangsan.id, zhangsan.code, zhangsan.username, zhangsan.full_name),
+            (100, "new_user", "new_user", "新用户"),
+        ]
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import pytest
+from bkuser.apps.data_source.models import DataSourceUser
+from bkuser.apps.tenant.models import TenantUser, TenantUserLookupGram
+from bkuser.biz.tenant import TenantUserEmailInfo, TenantUserHandler, TenantUserPhoneInfo
+
+from tests.test_utils.helpers import generate_random_string
+
+pytestmark = pytest.mark.django_db
+
+
+class TestTenantUserLookupGram:
+    """租户用户模糊搜索 gram 的维护"""
+
+    @staticmethod
+    def _get_grams(tenant_user: TenantUser, field: str):
+        return set(
+            TenantUserLookupGram.objects.filter(tenant_user=tenant_user, field=field).values_list("gram", flat=True)
+        )
+
+    @pytest.fixture
+    def data_source_user(self, bare_local_data_source) -> DataSourceUser:
+        return DataSourceUser.objects.create(
+            data_source=bare_local_data_source, code="zhangsan", username="zhangsan", full_name="张三"
+        )
+
+    def test_save(self, random_tenant, bare_local_data_source, data_source_user):
+        tenant_user = TenantUser.objects.create(
+            id=generate_random_string(),
+            tenant=random_tenant,
+            data_source=bare_local_data_source,
+            data_source_user=data_source_user,
+        )
+        assert not TenantUserLookupGram.objects.filter(tenant_user=tenant_user).exists()
+
+        TenantUserHandler.update_tenant_user_email(
+            tenant_user, TenantUserEmailInfo(is_inherited_email=False, custom_email="ZS@M.cn")
+        )
+        TenantUserHandler.update_tenant_user_phone(
+            tenant_user,
+            TenantUserPhoneInfo(is_inherited_phone=False, custom_phone="1351", custom_phone_country_code="86"),
+        )
+        assert self._get_grams(tenant_user, "email") == {"zs@", "s@m", "@m.", "m.c", ".cn", "cn", "n"}
+        assert self._get_grams(tenant_user, "phone") == {"135", "351", "51", "1"}
+
+        tenant_user.custom_email = ""
+        tenant_user.save(update_fields=["custom_email", "updated_at"])
+        assert self._get_grams(tenant_user, "email") == set()
+        # 未更新的字段，gram 保持不变
+        assert self._get_grams(tenant_user, "phone") == {"135", "351", "51", "1"}
+
+    def test_bulk_create(self, random_tenant, bare_local_data_source, data_source_user):
+        tenant_user = TenantUser(
+            id=generate_random_string(),
+            tenant=random_tenant,
+            data_source=bare_local_data_source,
+            data_source_user=data_source_user,
+            is_inherited_email=False,
+            custom_email="a@b",
+        )
+        TenantUser.objects.bulk_create([tenant_user])
+        assert self._get_grams(tenant_user, "email") == {"a@b", "@b", "b"}
+
+    def test_delete(self, random_tenant, bare_local_data_source, data_source_user):
+        tenant_user = TenantUser.objects.create(
+            id=generate_random_string(),
+            tenant=random_tenant,
+            data_source=bare_local_data_source,
+            data_source_user=data_source_user,
+            custom_email="a@b",
+        )
+        TenantUser.objects.filter(id=tenant_user.id).delete()
+        assert not TenantUserLookupGram.objects.filter(tenant_user_id=tenant_user.id).exists()
@@ -14,9 +14,29 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+import re
+from datetime import timedelta
+from unittest import mock
+
 import pytest
-from bkuser.apps.tenant.constants import TenantUserStatus
-from bkuser.apps.tenant.tasks import update_expired_tenant_user_status
+from bkuser.apps.data_source.models import DataSourceUser
+from bkuser.apps.tenant.constants import CollaborationStrategyStatus, TenantUserStatus
+from bkuser.apps.tenant.models import (
+    CollaborationStrategy,
+    TenantDepartment,
+    TenantManager,
+    TenantUser,
+    TenantUserLookupGram,
+)
+from bkuser.apps.tenant.tasks import delete_collaboration_strategy, update_expired_tenant_user_status
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.db.models.deletion import Collector
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from tests.test_utils.helpers import generate_random_string
+from tests.test_utils.tenant import create_tenant, sync_users_depts_to_tenant
 
 pytestmark = pytest.mark.django_db
 
@@ -29,3 +49,136 @@ class TestUpdateExpiredTenantUserStatus:
 
         assert not_expired_tenant_user.status == TenantUserStatus.ENABLED
         assert expired_tenant_user.status == TenantUserStatus.EXPIRED
+
+    @mock.patch("bkuser.apps.tenant.tasks.TENANT_USER_STATUS_UPDATE_BATCH_SIZE", 100)
+    def test_large_expired_batch(
+        self, bare_local_data_source, random_tenant, not_expired_tenant_user, django_assert_max_num_queries
+    ):
+        data_source_users = DataSourceUser.objects.bulk_create(
+            [
+                DataSourceUser(
+                    data_source=bare_local_data_source,
+                    code=generate_random_string(),
+                    username=generate_random_string(length=8),
+                    full_name=generate_random_string(length=8),
+                )
+                for _ in range(1050)
+            ]
+        )
+        expired_at = timezone.now() - timedelta(days=1)
+        TenantUser.objects.bulk_create(
+            [
+                TenantUser(
+                    id=generate_random_string(),
+                    tenant=random_tenant,
+                    data_source=bare_local_data_source,
+                    data_source_user=u,
+                    status=TenantUserStatus.ENABLED,
+                    account_expired_at=expired_at,
+                )
+                for u in DataSourceUser.objects.filter(id__in=[u.id for u in data_source_users])
+            ]
+        )
+
+        # 每个批次 1 次查询 + 1 次更新，共 11 个批次，最后还有 1 次查询确认没有剩余的过期用户
+        with django_assert_max_num_queries(11 * 2 + 1):
+            update_expired_tenant_user_status()
+
+        assert not TenantUser.objects.filter(
+            status=TenantUserStatus.ENABLED, account_expired_at__lte=timezone.now()
+        ).exists()
+        assert TenantUser.objects.filter(tenant=random_tenant, status=TenantUserStatus.EXPIRED).count() == 1050  # noqa: PLR2004
+        not_expired_tenant_user.refresh_from_db()
+        assert not_expired_tenant_user.status == TenantUserStatus.ENABLED
+
+
+class TestDeleteCollaborationStrategy:
+    @pytest.fixture
+    def deleting_strategy(self, full_local_data_source, random_tenant) -> CollaborationStrategy:
+        target_tenant = create_tenant(generate_random_string())
+        sync_users_depts_to_tenant(random_tenant, full_local_data_source)
+        sync_users_depts_to_tenant(target_tenant, full_local_data_source)
+        return CollaborationStrategy.objects.create(
+            name=generate_random_string(),
+            source_tenant=random_tenant,
+            target_tenant=target_tenant,
+            source_status=CollaborationStrategyStatus.DELETING,
+            target_status=CollaborationStrategyStatus.ENABLED,
+        )
+
+    @mock.patch("bkuser.apps.tenant.tasks.COLLABORATION_STRATEGY_CLEAN_BATCH_SIZE", 3)
+    def test_delete_in_batches(self, full_local_data_source, deleting_strategy):
+        filters = {"tenant_id": deleting_strategy.target_tenant_id, "data_source": full_local_data_source}
+        assert TenantUser.objects.filter(**filters).count() == 11  # noqa: PLR2004
+        assert TenantDepartment.objects.filter(**filters).count() == 9  # noqa: PLR2004
+
+        with CaptureQueriesContext(connection) as ctx:
+            delete_collaboration_strategy(deleting_strategy.id)
+
+        assert not TenantUser.objects.filter(**filters).exists()
+        assert not TenantDepartment.objects.filter(**filters).exists()
+        assert not CollaborationStrategy.objects.filter(id=deleting_strategy.id).exists()
+        # 数据源所属租户的租户用户不受影响
+        assert TenantUser.objects.filter(tenant_id=deleting_strategy.source_tenant_id).count() == 11  # noqa: PLR2004
+
+        # 每条删除语句涉及的数据量都不超过批次大小
+        delete_sqls = [
+            q["sql"] for q in ctx.captured_queries if q["sql"].startswith("DELETE") and "tenant_tenant" in q["sql"]
+        ]
+        assert delete_sqls
+        for sql in delete_sqls:
+            if in_values := re.search(r" IN \(([^)]*)\)", sql):
+                assert len(in_values.group(1).split(",")) <= 3  # noqa: PLR2004
+
+    def test_delete_tenant_managers(self, full_local_data_source, deleting_strategy):
+        tenant_user = TenantUser.objects.filter(
+            tenant_id=deleting_strategy.target_tenant_id, data_source=full_local_data_source
+        ).first()
+        TenantManager.objects.create(tenant_id=deleting_strategy.target_tenant_id, tenant_user=tenant_user)
+
+        # 记录所有经过 Collector 处理的数据模型（与数据库后端无关）
+        collected_models = set()
+        collect = Collector.collect
+
+        def _collect(collector, objs, *args, **kwargs):
+            collected_models.add(objs.model if isinstance(objs, QuerySet) else type(objs[0]))
+            return collect(collector, objs, *args, **kwargs)
+
+        with mock.patch.object(Collector, "collect", autospec=True, side_effect=_collect):
+            delete_collaboration_strategy(deleting_strategy.id)
+
+        assert not TenantManager.objects.filter(tenant_user_id=tenant_user.id).exists()
+        # 直接按主键删除，不会通过 Collector 将租户用户 / 部门加载到内存中
+        assert TenantManager in collected_models
+        assert not collected_models & {TenantUser, TenantDepartment}
+
+    def test_delete_lookup_grams(self, full_local_data_source, deleting_strategy):
+        tenant_user = TenantUser.objects.filter(
+            tenant_id=deleting_strategy.target_tenant_id, data_source=full_local_data_source
+        ).first()
+        tenant_user.is_inherited_email = False
+        tenant_user.custom_email = "custom@m.com"
+        tenant_user.save()
+        assert TenantUserLookupGram.objects.filter(tenant_user=tenant_user).exists()
+
+        delete_collaboration_strategy(deleting_strategy.id)
+        # 租户用户是直接按主键删除的，自定义邮箱的 gram 也需要一并清理
+        assert not TenantUserLookupGram.objects.filter(tenant_user_id=tenant_user.id).exists()
+
+    def test_restore_status_when_failed(self, deleting_strategy):
+        with mock.patch.object(TenantUser.objects, "filter", side_effect=DatabaseError("mock failure")) as filter_:
+            result = delete_collaboration_strategy.apply(args=[deleting_strategy.id])
+
+        assert result.failed()
+        # 重试耗尽（1 次执行 + 3 次重试）后，策略恢复为停用状态，可以重新发起删除
+        assert filter_.call_count == 4  # noqa: PLR2004
+        deleting_strategy.refresh_from_db()
+        assert deleting_strategy.source_status == CollaborationStrategyStatus.DISABLED
+
+    def test_skip_not_deleting_strategy(self, deleting_strategy):
+        deleting_strategy.source_status = CollaborationStrategyStatus.DISABLED
+        deleting_strategy.save()
+
+        delete_collaboration_strategy(deleting_strategy.id)
+
+        assert CollaborationStrategy.objects.filter(id=deleting_strategy.id).exists()
@@ -18,10 +18,17 @@
 import pytest
 from bkuser.apps.data_source.models import DataSourceDepartment, DataSourceUser
 from bkuser.apps.tenant.constants import TenantUserIdRuleEnum
-from bkuser.apps.tenant.models import TenantDepartmentIDRecord, TenantUserIDGenerateConfig, TenantUserIDRecord
-from bkuser.apps.tenant.utils import TenantDeptIDGenerator, TenantUserIDGenerator
+from bkuser.apps.tenant.models import (
+    DataSourceResourceStats,
+    TenantDepartmentIDRecord,
+    TenantUserIDGenerateConfig,
+    TenantUserIDRecord,
+)
+from bkuser.apps.tenant.utils import DataSourceResourceStatsHandler, TenantDeptIDGenerator, TenantUserIDGenerator
 from bkuser.utils.uuid import generate_uuid
 
+from tests.test_utils.tenant import sync_users_depts_to_tenant
+
 pytestmark = pytest.mark.django_db
 
 
@@ -138,3 +145,51 @@ class TestTenantDeptIdGenerator:
         assert generator.gen(company) is None
         assert generator.gen(dept_a) is None
         assert len(generator.tenant_dept_id_map) == 0
+
+
+class TestDataSourceResourceStatsHandler:
+    """测试数据源关联资源数量统计"""
+
+    def test_get_without_stats(self, full_local_data_source, default_tenant):
+        sync_users_depts_to_tenant(default_tenant, full_local_data_source)
+        DataSourceResourceStats.objects.filter(data_source=full_local_data_source).delete()
+
+        assert DataSourceResourceStatsHandler.get(full_local_data_source) == {
+            "own_department_count": 9,
+            "own_user_count": 11,
+            "shared_to_tenant_count": 1,
+            "shared_to_department_count": 9,
+            "shared_to_user_count": 11,
+        }
+
+    def test_incr(self, full_local_data_source, default_tenant):
+        sync_users_depts_to_tenant(default_tenant, full_local_data_source)
+        DataSourceResourceStatsHandler.refresh_all(full_local_data_source)
+
+        DataSourceResourceStatsHandler.incr(full_local_data_source, full_local_data_source.owner_tenant_id, 1, -2)
+        DataSourceResourceStatsHandler.incr(full_local_data_source, default_tenant.id, user_delta=-11)
+
+        stats = DataSourceResourceStatsHandler.get(full_local_data_source)
+        assert stats["own_department_count"] == 10
+        assert stats["own_user_count"] == 9
+        assert stats["shared_to_tenant_count"] == 1
+        assert stats["shared_to_user_count"] == 0
+
+    def test_refresh_all(self, full_local_data_source, default_tenant):
+        sync_users_depts_to_tenant(default_tenant, full_local_data_source)
+        DataSourceResourceStatsHandler.incr(full_local_data_source, default_tenant.id, 5, 5)
+        # 已不再关联的租户统计应该被清理
+        DataSourceResourceStats.objects.create(
+            data_source=full_local_data_source, tenant_id=generate_uuid(), department_count=1, user_count=1
+        )
+
+        DataSourceResourceStatsHandler.refresh_all(full_local_data_source)
+
+        assert DataSourceResourceStats.objects.filter(data_source=full_local_data_source).count() == 2
+        assert DataSourceResourceStatsHandler.get(full_local_data_source) == {
+            "own_department_count": 9,
+            "own_user_count": 11,
+            "shared_to_tenant_count": 1,
+            "shared_to_department_count": 9,
+            "shared_to_user_count": 11,
+        }
@@ -21,6 +21,7 @@ from bkuser.apps.sync.handlers import (
     set_data_source_sync_periodic_task,
     sync_identity_infos_and_notify_after_modify_data_source,
 )
+from bkuser.apps.tenant.caches import invalidate_tenant_metadata
 from bkuser.apps.tenant.models import Tenant
 from bkuser.auth.models import User
 from django.db.models.signals import post_save
@@ -46,6 +47,12 @@ post_save.disconnect(set_data_source_sync_periodic_task, sender=DataSource)
 post_save.disconnect(sync_identity_infos_and_notify_after_modify_data_source, sender=DataSource)
 
 
+@pytest.fixture(autouse=True)
+def _clear_tenant_metadata_cache():
+    """租户元数据使用进程内缓存，且单元测试结束回滚数据时不会触发失效信号，因此每个单元测试前都需要清理"""
+    invalidate_tenant_metadata()
+
+
 @pytest.fixture
 def default_tenant() -> Tenant:
     """初始化默认租户"""
@@ -119,6 +119,18 @@ class TestLocalDataSourceDataParser:
         with pytest.raises(DuplicateUsername):
             LocalDataSourceDataParser(logger, user_workbook).parse()
 
+    def test_validate_case_error_priority(self, logger, user_workbook):
+        # 组织路径非法的行在前，必填字段为空的行在后，依然优先抛出用户数据的校验异常
+        user_workbook["users"]["E4"].value = "公司//部门A"
+        user_workbook["users"]["B6"].value = ""
+        parser = LocalDataSourceDataParser(logger, user_workbook)
+        with pytest.raises(RequiredFieldIsEmpty):
+            parser.parse()
+
+        assert not parser.is_parsed
+        assert parser.get_departments() == []
+        assert parser.get_users() == []
+
     def test_get_departments(self, logger, user_workbook):
         parser = LocalDataSourceDataParser(logger, user_workbook)
         parser.parse()
@@ -14,7 +14,11 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+import json
 import random
+from typing import Any
+
+from django.http import StreamingHttpResponse
 
 DFT_RANDOM_CHARACTER_SET = "abcdefghijklmnopqrstuvwxyz0123456789"
 
@@ -22,3 +26,8 @@ DFT_RANDOM_CHARACTER_SET = "abcdefghijklmnopqrstuvwxyz0123456789"
 def generate_random_string(length=16, chars=DFT_RANDOM_CHARACTER_SET):
     rand = random.SystemRandom()
     return "".join(rand.choice(chars) for _ in range(length))
+
+
+def get_streaming_response_data(resp: StreamingHttpResponse) -> Any:
+    """获取蓝鲸历史版本 API Json 格式的流式响应中的 data"""
+    return json.loads(b"".join(resp.streaming_content))["data"]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import pytest
+from bkuser.utils.django import iter_queryset_in_batches
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 10000])
+def test_iter_queryset_in_batches(batch_size):
+    queryset = ContentType.objects.order_by("-model")
+    expected = list(ContentType.objects.order_by("pk"))
+
+    batches = list(iter_queryset_in_batches(queryset, batch_size))
+
+    assert all(len(batch) <= batch_size for batch in batches)
+    # 按主键排序，且不重复，不遗漏
+    assert [obj for batch in batches for obj in batch] == expected
+
+
+def test_iter_queryset_in_batches_keyset_query():
+    with CaptureQueriesContext(connection) as ctx:
+        batches = list(iter_queryset_in_batches(ContentType.objects.all(), 2))
+
+    # 每批一次查询，若最后一批满额，则需要再查询一次确认没有更多数据
+    assert len(ctx.captured_queries) in (len(batches), len(batches) + 1)
+    # 非首批查询需要基于上一批的最大主键继续读取，而不是 OFFSET
+    assert all("OFFSET" not in q["sql"] for q in ctx.captured_queries)
+    assert all('"id" >' in q["sql"] for q in ctx.captured_queries[1:])
+
+
+def test_iter_queryset_in_batches_invalid_size():
+    with pytest.raises(ValueError, match="batch_size must be positive"):
+        list(iter_queryset_in_batches(ContentType.objects.all(), 0))
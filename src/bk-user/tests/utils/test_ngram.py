@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import pytest
+from bkuser.utils.ngram import normalize, split_full_ngrams, split_ngrams
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (None, ""),
+        ("", ""),
+        ("ZhangSan@QQ.com", "zhangsan@qq.com"),
+        ("Élodie", "elodie"),
+        ("Straße", "strasse"),
+        ("张三", "张三"),
+    ],
+)
+def test_normalize(value, expected):
+    assert normalize(value) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (None, set()),
+        ("", set()),
+        ("a", {"a"}),
+        ("AbcD", {"abc", "bcd", "cd", "d"}),
+        ("aaaa", {"aaa", "aa", "a"}),
+    ],
+)
+def test_split_ngrams(value, expected):
+    assert split_ngrams(value) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("", set()),
+        ("ab", set()),
+        ("abc", {"abc"}),
+        ("AbcD", {"abc", "bcd"}),
+    ],
+)
+def test_split_full_ngrams(value, expected):
+    assert split_full_ngrams(value) == expected
+
+
+@pytest.mark.parametrize("value", ["ZhangSan@QQ.com", "张三丰", "13512345671", "a"])
+def test_substring_grams_contained(value):
+    grams = split_ngrams(value)
+    for i in range(len(value)):
+        for j in range(i + 1, len(value) + 1):
+            sub = normalize(value[i:j])
+            # 短子串必定是某个 gram 的前缀，长子串的完整 gram 必定都存在
+            if len(sub) <= 3:
+                assert any(g.startswith(sub) for g in grams)
+            else:
+                assert split_full_ngrams(sub) <= grams
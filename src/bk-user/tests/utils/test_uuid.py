@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - 用户管理 (bk-user) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+import time
+import uuid
+from unittest import mock
+
+from bkuser.utils.uuid import generate_time_ordered_uuid
+
+
+def test_generate_time_ordered_uuid_format():
+    value = uuid.UUID(hex=generate_time_ordered_uuid())
+    assert value.version == 7  # noqa: PLR2004
+    assert value.variant == uuid.RFC_4122
+
+
+def test_generate_time_ordered_uuid_timestamp():
+    timestamp_ns = 1_700_000_000_123_456_789
+    with mock.patch.object(time, "time_ns", return_value=timestamp_ns):
+        value = generate_time_ordered_uuid()
+
+    assert int(value[:12], 16) == timestamp_ns // 1_000_000
+
+
+def test_generate_time_ordered_uuid_ordered():
+    ids = []
+    for ts_ms in range(1_700_000_000_000, 1_700_000_000_100):
+        with mock.patch.object(time, "time_ns", return_value=ts_ms * 1_000_000):
+            ids.append(generate_time_ordered_uuid())
+
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)